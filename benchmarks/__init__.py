@@ -0,0 +1 @@
+"""Micro-benchmarks for Bettit API hot paths"""
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of authentication
+
+Times validate_token and measures the heap it allocates per call, as the
+dict copy of the user it used to build next to the read-only UserView it
+returns now, then times and measures whole authenticated requests.
+
+Usage:
+    python -m benchmarks.bench_auth_request
+"""
+import tracemalloc
+
+from db import db
+from db.auth import validate_token
+from db.records import UserView
+
+from .common import api_client, format_us, time_per_call
+
+ITERATIONS = 100_000
+REQUESTS = 5_000
+ENDPOINTS = ['/api/auth/me', '/api/positions', '/api/bets/my-bets']
+
+
+def copy_user(user_id):
+    """Previous validate_token result: a dict copy of the user without its hash"""
+    user = db.get_user_by_id(user_id)
+    return {k: v for k, v in user.items() if k != 'password_hash'}
+
+
+def view_user(user_id):
+    """Current validate_token result: a view over the stored user"""
+    return UserView(db.get_user_by_id(user_id))
+
+
+def allocated_bytes(fn, count=1_000):
+    """Heap bytes allocated per call while fn runs and its result is alive"""
+    tracemalloc.start()
+    total = 0
+    for _ in range(count):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        total += tracemalloc.get_traced_memory()[1] - before
+        del result
+    tracemalloc.stop()
+    return total / count
+
+
+if __name__ == '__main__':
+    bettit_api, client, headers, user_id = api_client()
+    token = headers['Authorization'].split()[1]
+
+    print("user result per authenticated request")
+    for name, fn in (('dict copy (previous)', lambda: copy_user(user_id)), ('UserView', lambda: view_user(user_id))):
+        print(f"  {name:<22s} {format_us(time_per_call(fn, ITERATIONS))}   {allocated_bytes(fn):8.0f} bytes")
+    validate = lambda: validate_token(token)  # noqa: E731
+    print(f"  validate_token         {format_us(time_per_call(validate, ITERATIONS))}   "
+          f"{allocated_bytes(validate):8.0f} bytes")
+
+    print(f"{REQUESTS} requests per endpoint")
+    for path in ENDPOINTS:
+        request = lambda: client.get(path, headers=headers)  # noqa: E731
+        print(f"  GET {path:<20s} {format_us(time_per_call(request, REQUESTS))}   "
+              f"{allocated_bytes(request, 200):8.0f} bytes peak")
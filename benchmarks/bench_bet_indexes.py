@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark bet and transaction reads
+
+Fills the store with many bets and transactions spread over many users,
+then times the per-user reads against the full-scan-and-sort versions
+they replaced.
+
+Usage:
+    python -m benchmarks.bench_bet_indexes
+"""
+import random
+
+from db import db
+from db.money import to_micros
+
+from .common import format_us, time_per_call
+
+USERS = 10_000
+MARKETS = 1_000
+BETS = 300_000
+ITERATIONS = 200
+
+
+def scan_user_active_bets(user_id, limit=50):
+    """Previous get_user_active_bets: scan every bet, then sort"""
+    user_bets = [b for b in db._bets.values() if b['user_id'] == user_id]
+    user_bets.sort(key=lambda b: b['created_at'], reverse=True)
+    return user_bets[:limit]
+
+
+def scan_user_bets_on_market(user_id, market_id):
+    """Previous get_user_bets_on_market: scan every bet"""
+    return [b for b in db._bets.values()
+            if b['user_id'] == user_id and b['market_id'] == market_id]
+
+
+def scan_user_transactions(user_id, limit=50):
+    """Previous get_user_transactions: scan every transaction, then sort"""
+    txs = [t for t in db._transactions.values() if t['user_id'] == user_id]
+    txs.sort(key=lambda t: t['created_at'], reverse=True)
+    return txs[:limit]
+
+
+def populate():
+    """Create BETS bets, each with a matching transaction"""
+    rng = random.Random(7)
+    users = [f"user-{i}" for i in range(USERS)]
+    markets = [
+        db.create_market(f"Q{i}?", '', 'criteria', '2099-01-01T00:00:00', users[0])['id']
+        for i in range(MARKETS)
+    ]
+    for _ in range(BETS):
+        user_id, market_id = rng.choice(users), rng.choice(markets)
+        bet = db.create_bet(user_id, market_id, 'YES', to_micros(10), to_micros(15), 0.66, to_micros(15))
+        db.create_transaction(user_id, 'bet_placed', to_micros(-10), to_micros(990), market_id, bet['id'])
+    return users[1], markets[0]
+
+
+if __name__ == '__main__':
+    user_id, market_id = populate()
+    print(f"{BETS} bets / {USERS} users / {MARKETS} markets")
+    for name, indexed, scan in [
+        ('get_user_active_bets', lambda: db.get_user_active_bets(user_id), lambda: scan_user_active_bets(user_id)),
+        ('get_user_bets_on_market', lambda: db.get_user_bets_on_market(user_id, market_id),
+         lambda: scan_user_bets_on_market(user_id, market_id)),
+        ('get_user_transactions', lambda: db.get_user_transactions(user_id), lambda: scan_user_transactions(user_id)),
+    ]:
+        index_time = time_per_call(indexed, ITERATIONS)
+        scan_time = format_us(time_per_call(scan, ITERATIONS // 20))
+        print(f"  {name:24s} indexed {format_us(index_time)}   full scan {scan_time}")
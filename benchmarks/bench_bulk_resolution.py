@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk market resolution
+
+Fills the store with MARKETS markets of BETS_PER_MARKET bets each, then
+settles half of them one market at a time (resolve_market followed by
+settle_bets_for_market) and the other half with one resolve_markets call,
+reporting settle throughput in bets/sec for both.
+
+Usage:
+    python -m benchmarks.bench_bulk_resolution
+"""
+import random
+import time
+
+from db import db
+from db.money import to_micros
+
+MARKETS = 200
+BETS_PER_MARKET = 1_000
+USERS = 5_000
+
+
+def populate():
+    rng = random.Random(5)
+    user_ids = [f"user-{i}" for i in range(USERS)]
+    for user_id in user_ids:
+        db.add_user({'id': user_id, 'username': user_id, 'balance': to_micros(1000),
+                     'total_bets': 0, 'total_winnings': 0})
+    market_ids = []
+    for i in range(MARKETS):
+        market_id = db.create_market(f"Market {i}?", '', 'criteria', '2099-01-01T00:00:00', 'bench')['id']
+        for _ in range(BETS_PER_MARKET):
+            amount = to_micros(rng.randint(1, 100))
+            db.create_bet(rng.choice(user_ids), market_id, rng.choice(('YES', 'NO')), amount, amount * 3 // 2,
+                          0.66, amount * 3 // 2)
+        market_ids.append(market_id)
+    return market_ids
+
+
+if __name__ == '__main__':
+    market_ids = populate()
+    half = MARKETS // 2
+    print(f"{MARKETS} markets x {BETS_PER_MARKET} bets, {USERS} users")
+
+    start = time.perf_counter()
+    settled = 0
+    for market_id in market_ids[:half]:
+        db.resolve_market(market_id, 'YES')
+        settled += db.settle_bets_for_market(market_id, 'YES')
+    elapsed = time.perf_counter() - start
+    print(f"  one at a time  {half} markets, {settled} bets in {elapsed * 1e3:8.1f} ms"
+          f"  ({settled / elapsed:>10,.0f} bets/sec)")
+
+    start = time.perf_counter()
+    result = db.resolve_markets([(market_id, 'YES') for market_id in market_ids[half:]])
+    elapsed = time.perf_counter() - start
+    settled = sum(result['bets_settled'].values())
+    print(f"  resolve_markets {half} markets, {settled} bets in {elapsed * 1e3:8.1f} ms"
+          f"  ({settled / elapsed:>10,.0f} bets/sec, {len(result['transactions'])} payout transactions)")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Benchmark k-outcome LMSR pricing
+
+Times odds, single quotes and all-outcome quotes on CategoricalMarketMaker
+for growing outcome counts to show per-quote cost stays linear in k.
+
+Usage:
+    python -m benchmarks.bench_categorical
+"""
+from db.market_maker import CategoricalMarketMaker
+
+from .common import format_us, time_per_call
+
+OUTCOME_COUNTS = [2, 10, 50, 200, 1000]
+ITERATIONS = 2000
+
+
+def bench(k):
+    """Time pricing operations for a k-outcome market with some trading history"""
+    mm = CategoricalMarketMaker([f"outcome_{i}" for i in range(k)])
+    for i in range(0, k, max(1, k // 10)):
+        mm.execute_bet(mm.outcomes[i], 25 * (i % 7 + 1))
+
+    odds = time_per_call(mm.get_odds, ITERATIONS)
+    simulate = time_per_call(lambda: mm.simulate_bet(mm.outcomes[-1], 50), ITERATIONS)
+    quote_all = time_per_call(lambda: mm.quote_all(50), ITERATIONS)
+    return odds, simulate, quote_all
+
+
+if __name__ == '__main__':
+    print(f"{'k':>6s}  {'get_odds':>13s}  {'simulate_bet':>13s}  {'quote_all':>13s}  quote_all per outcome")
+    for k in OUTCOME_COUNTS:
+        odds, simulate, quote_all = bench(k)
+        print(f"{k:6d}  {format_us(odds)}  {format_us(simulate)}  {format_us(quote_all)}  "
+              f"{format_us(quote_all / k)}")
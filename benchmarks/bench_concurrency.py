@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Stress concurrent bet placement
+
+Runs the same random mix of buys and sells across MARKETS markets and
+USERS thinly funded users with 1 to 16 threads, then checks every
+invariant a lost update would break: each market's pool and share totals
+against its recorded bets, each user's balance against their starting
+balance and trades, and that no balance went negative. Money is integer
+micro-units, so every comparison is exact. A final run with
+the per-market and per-user locks switched off shows what they prevent.
+
+The thread switch interval is shortened so races surface in a short run.
+Throughput can only scale with threads when bets on different markets
+and users spend time outside the interpreter lock (I/O, SQLite); with the
+in-memory store the locks' job is correctness, at little cost.
+
+Usage:
+    python -m benchmarks.bench_concurrency
+"""
+import contextlib
+import random
+import sys
+import threading
+import time
+
+from db import db
+from db.money import to_dollars, to_micros
+
+from .common import api_client, create_bench_market
+
+MARKETS = 20
+USERS = 200
+STARTING_BALANCE = 200
+ORDERS = 8_000
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+
+def setup(user_id):
+    market_ids = [create_bench_market(user_id, f"Concurrency market {i}?") for i in range(MARKETS)]
+    user_ids = []
+    for i in range(USERS):
+        uid = f"stress-{time.perf_counter_ns()}-{i}"
+        db.add_user({'id': uid, 'username': uid, 'email': f"{uid}@example.com",
+                     'balance': to_micros(STARTING_BALANCE), 'total_bets': 0,
+                     'total_winnings': 0})
+        user_ids.append(uid)
+    return market_ids, user_ids
+
+
+def run(bettit_api, threads, market_ids, user_ids):
+    """Place ORDERS random orders from `threads` threads; returns (elapsed, filled)"""
+    filled = [0] * threads
+
+    def worker(index):
+        rng = random.Random(index)
+        for _ in range(ORDERS // threads):
+            market_id, user_id = rng.choice(market_ids), rng.choice(user_ids)
+            if rng.random() < 0.25:
+                order = {'user_id': user_id, 'outcome': 'YES', 'side': 'sell', 'shares': to_micros(rng.uniform(1, 20))}
+            else:
+                order = {'user_id': user_id, 'outcome': rng.choice(('YES', 'NO')), 'amount': to_micros(rng.randint(1, 40))}
+            (_, status), = bettit_api.execute_bet_orders(market_id, [order])
+            filled[index] += status == 201
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    return time.perf_counter() - start, sum(filled)
+
+
+def lost_updates(bettit_api, market_ids, user_ids):
+    """Count markets and users whose totals disagree with their bets, plus negative balances"""
+    errors = 0
+    for market_id in market_ids:
+        market = db.get_market_by_id(market_id)
+        bets = db._bets_by_market.get(market_id, [])
+        pool = sum(bet['amount'] for bet in bets)
+        yes = sum(bet['shares'] for bet in bets if bet['outcome'] == 'YES')
+        no = sum(bet['shares'] for bet in bets if bet['outcome'] == 'NO')
+        maker = bettit_api.market_makers.get(market)
+        if (market['total_pool'] != pool
+                or market['total_yes_shares'] != yes
+                or maker.no_shares != to_dollars(no)):
+            errors += 1
+    for user_id in user_ids:
+        balance = db.get_user_by_id(user_id)['balance']
+        spent = sum(bet['amount'] for bet in db._bets_by_user.get(user_id, []))
+        if to_micros(STARTING_BALANCE) - spent != balance or balance < 0:
+            errors += 1
+    return errors
+
+
+if __name__ == '__main__':
+    bettit_api, _, _, admin_id = api_client()
+    sys.setswitchinterval(1e-5)
+    print(f"{ORDERS} orders over {MARKETS} markets and {USERS} users (${STARTING_BALANCE} each)")
+
+    for threads in THREAD_COUNTS:
+        market_ids, user_ids = setup(admin_id)
+        elapsed, filled = run(bettit_api, threads, market_ids, user_ids)
+        print(f"  {threads:>2} threads  {ORDERS / elapsed:8,.0f} orders/sec  {filled:>5} filled"
+              f"  lost updates: {lost_updates(bettit_api, market_ids, user_ids)}")
+
+    # Same load with locking disabled
+    real_locks = bettit_api.locks
+    bettit_api.locks = type('NoLocks', (), {'hold': lambda self, **_: contextlib.nullcontext()})()
+    market_ids, user_ids = setup(admin_id)
+    elapsed, filled = run(bettit_api, THREAD_COUNTS[-1], market_ids, user_ids)
+    bettit_api.locks = real_locks
+    print(f"  {THREAD_COUNTS[-1]:>2} threads, no locks  {ORDERS / elapsed:8,.0f} orders/sec  {filled:>5} filled"
+          f"  lost updates: {lost_updates(bettit_api, market_ids, user_ids)}")
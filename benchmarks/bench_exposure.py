@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Benchmark the exposure tracker
+
+Times a trade update and the platform summary as the number of tracked
+markets grows; both should stay flat.
+
+Usage:
+    python -m benchmarks.bench_exposure
+"""
+from db.exposure import ExposureTracker
+
+from .common import format_us, time_per_call
+
+MARKET_COUNTS = [10, 10_000, 100_000, 1_000_000]
+ITERATIONS = 100_000
+
+
+if __name__ == '__main__':
+    print(f"{'markets':>9s}  {'record_trade':>13s}  {'summary':>13s}")
+    for count in MARKET_COUNTS:
+        tracker = ExposureTracker()
+        for i in range(count):
+            tracker.open_market(i, 100, 2)
+
+        trade = time_per_call(lambda: tracker.record_trade(count // 2, 50.0, 80.0), ITERATIONS)
+        summary = time_per_call(tracker.summary, ITERATIONS)
+        print(f"{count:9d}  {format_us(trade)}  {format_us(summary)}")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark journaling overhead and warm restart of the in-memory store
+
+Journals BETS bets (each a create_bet plus a balance update), times the
+longest single bet over BASELINE_BETS more, copies the journal aside, then
+snapshots while bets keep arriving, reporting the longest a bet took
+during the snapshot. It then journals a tail of
+TAIL_BETS more. Restart is timed in fresh processes: once from the
+snapshot plus tail, once by replaying the whole journal with no snapshot.
+Finally the same bets are timed with journaling off.
+
+Usage:
+    python -m benchmarks.bench_journal_restart
+"""
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from db.money import to_micros
+
+BETS = 1_000_000
+TAIL_BETS = 50_000
+BASELINE_BETS = 100_000
+USERS = 10_000
+MARKETS = 1_000
+
+RESTART = """
+import time
+start = time.perf_counter()
+from db import db
+db.init_pool()
+print(time.perf_counter() - start, len(db._bets))
+"""
+
+
+def restart_seconds(journal_dir):
+    """Time init_pool() restoring the store in a fresh interpreter"""
+    env = {**os.environ, 'BETTIT_JOURNAL_DIR': journal_dir, 'BETTIT_SNAPSHOT_EVERY': '0'}
+    out = subprocess.run([sys.executable, '-c', RESTART], env=env, check=True,
+                         capture_output=True, text=True).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def place_bets(db, rng, users, markets, count):
+    """Journal `count` bets with their balance updates; returns seconds per bet"""
+    start = time.perf_counter()
+    for _ in range(count):
+        user_id = rng.choice(users)
+        db.create_bet(user_id, rng.choice(markets), 'YES', to_micros(10), to_micros(15), 0.66, to_micros(15))
+        db.update_user_balance(user_id, db._users[user_id]['balance'] - to_micros(10))
+    return (time.perf_counter() - start) / count
+
+
+def longest_bet(db, rng, users, markets, keep_going):
+    """Place bets one at a time while keep_going() holds; returns (count, longest seconds)"""
+    count, longest = 0, 0.0
+    while keep_going():
+        start = time.perf_counter()
+        place_bets(db, rng, users, markets, 1)
+        longest = max(longest, time.perf_counter() - start)
+        count += 1
+    return count, longest
+
+
+def dir_mb(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_dir = os.path.join(tmp, 'journal')
+        os.environ['BETTIT_JOURNAL_DIR'] = journal_dir
+        os.environ['BETTIT_SNAPSHOT_EVERY'] = '0'
+        from db import db
+        db.init_pool()
+
+        rng = random.Random(7)
+        users = [f"user-{i}" for i in range(USERS)]
+        for user_id in users:
+            db.add_user({'id': user_id, 'username': user_id, 'email': f"{user_id}@example.com",
+                         'balance': to_micros(10 ** 9), 'total_bets': 0, 'total_winnings': 0})
+        markets = [db.create_market(f"Q{i}?", '', 'criteria', '2099-01-01T00:00:00', users[0])['id']
+                   for i in range(MARKETS)]
+
+        per_bet = place_bets(db, rng, users, markets, BETS)
+        print(f"{BETS} bets journaled at {per_bet * 1e6:.1f} us/bet ({dir_mb(journal_dir):.0f} MB journal)")
+
+        # Longest single bet with no snapshot running (cyclic GC passes)
+        remaining = iter(range(BASELINE_BETS))
+        _, baseline = longest_bet(db, rng, users, markets, lambda: next(remaining, None) is not None)
+        print(f"longest of the next {BASELINE_BETS} bets, no snapshot running: {baseline * 1e3:.1f} ms")
+
+        journal_only = os.path.join(tmp, 'journal-only')
+        db._journal.close()
+        shutil.copytree(journal_dir, journal_only)
+        db._journal.open()
+
+        # Bet while the snapshot is built, timing each one
+        start = time.perf_counter()
+        snapshotting = threading.Thread(target=db.snapshot)
+        snapshotting.start()
+        count, longest = longest_bet(db, rng, users, markets, snapshotting.is_alive)
+        print(f"snapshot written in {time.perf_counter() - start:.2f} s ({dir_mb(journal_dir):.0f} MB); "
+              f"{count} bets placed meanwhile, longest took {longest * 1e3:.1f} ms")
+
+        place_bets(db, rng, users, markets, TAIL_BETS)
+        db._journal.close()
+
+        seconds, bets = restart_seconds(journal_dir)
+        print(f"restart from snapshot + {TAIL_BETS} bet tail: {seconds:.2f} s ({bets} bets)")
+        seconds, bets = restart_seconds(journal_only)
+        print(f"restart replaying the full journal:      {seconds:.2f} s ({bets} bets)")
+
+        # Same bets with journaling switched off, for the per-bet overhead
+        journal, db._journal = db._journal, None
+        unjournaled = place_bets(db, rng, users, markets, TAIL_BETS)
+        db._journal = journal
+        print(f"bet without journal: {unjournaled * 1e6:.1f} us/bet")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark leaderboard reads and balance updates
+
+Adds many users spread over a few communities, then times top-N and
+rank-of-user reads on the live boards against the sort-every-user
+version they replaced, plus the cost a balance change now pays to keep
+the boards current.
+
+Usage:
+    python -m benchmarks.bench_leaderboard
+"""
+import random
+
+from db import db
+from db.money import to_micros
+
+from .common import format_us, time_per_call
+
+USERS = 100_000
+COMMUNITIES = ['general', 'news', 'worldnews', 'technology', 'sports']
+TOP_N = 100
+ITERATIONS = 500
+
+
+def sorted_leaderboard(limit=100):
+    """Previous get_leaderboard: sort every user by balance"""
+    users = list(db._users.values())
+    users.sort(key=lambda u: u['balance'], reverse=True)
+    return users[:limit]
+
+
+def sorted_rank(user_id):
+    """Rank of one user by sorting everyone"""
+    users = sorted(db._users.values(), key=lambda u: u['balance'], reverse=True)
+    return next(i for i, u in enumerate(users, 1) if u['id'] == user_id)
+
+
+def populate():
+    """Add USERS users with random balances, each betting in one community"""
+    rng = random.Random(7)
+    markets = {
+        community: db.create_market(f"{community}?", '', 'criteria', '2099-01-01T00:00:00', 'bench',
+                                    community=community)['id']
+        for community in COMMUNITIES
+    }
+    user_ids = []
+    for i in range(USERS):
+        user_id = f"user-{i}"
+        db.add_user({'id': user_id, 'username': user_id, 'balance': to_micros(rng.randint(0, 10 ** 6))})
+        db.create_bet(user_id, markets[rng.choice(COMMUNITIES)], 'YES', to_micros(10), to_micros(15), 0.66,
+                      to_micros(15))
+        user_ids.append(user_id)
+    return user_ids, rng
+
+
+if __name__ == '__main__':
+    user_ids, rng = populate()
+    user_id = user_ids[USERS // 2]
+    print(f"{USERS} users over {len(COMMUNITIES)} communities")
+
+    live_top = time_per_call(lambda: db.get_leaderboard(limit=TOP_N), ITERATIONS)
+    community_top = time_per_call(lambda: db.get_leaderboard('news', TOP_N), ITERATIONS)
+    sort_top = time_per_call(lambda: sorted_leaderboard(TOP_N), 5)
+    print(f"  top {TOP_N:<5d}      live {format_us(live_top)}   community {format_us(community_top)}   "
+          f"full sort {format_us(sort_top)}")
+
+    live_rank = time_per_call(lambda: db.get_user_rank(user_id), ITERATIONS)
+    sort_rank = time_per_call(lambda: sorted_rank(user_id), 5)
+    print(f"  rank of user  live {format_us(live_rank)}   full sort {format_us(sort_rank)}")
+
+    update = time_per_call(
+        lambda: db.update_user_balance(rng.choice(user_ids), to_micros(rng.randint(0, 10 ** 6))), ITERATIONS)
+    print(f"  balance update (global + community board) {format_us(update)}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the columnar bet ledger
+
+Fills the store with bets over many markets, one of them holding
+MARKET_BETS bets, then times settling that market, per-market volume and
+open exposure from the ledger against walks over the bet records, plus a
+full settle_bets_for_market. A single user's exposure stays cheaper off
+the per-user bet index; the ledger wins once a question spans many bets.
+
+Usage:
+    python -m benchmarks.bench_ledger
+"""
+import copy
+import random
+import time
+
+from db import db
+from db.ledger import ledger
+from db.money import to_micros
+
+from .common import format_us, time_per_call
+
+MARKET_BETS = 100_000
+OTHER_BETS = 200_000
+MARKETS = 500
+USERS = 10_000
+
+
+def record_settlement(market_id, outcome):
+    """Per-user payouts by walking the market's bet records (the old way)"""
+    payouts = {}
+    for bet in db._bets_by_market.get(market_id, ()):
+        if bet['status'] == 'active' and bet['outcome'] == outcome:
+            payouts[bet['user_id']] = payouts.get(bet['user_id'], 0) + bet['potential_payout']
+    return payouts
+
+
+def record_volume():
+    volumes = {}
+    for bet in db._bets.values():
+        volumes[bet['market_id']] = volumes.get(bet['market_id'], 0) + abs(bet['amount'])
+    return volumes
+
+
+def record_exposure(user_id):
+    stakes = {}
+    for bet in db._bets_by_user.get(user_id, ()):
+        if bet['status'] == 'active':
+            stakes[bet['market_id']] = stakes.get(bet['market_id'], 0) + bet['amount']
+    return stakes
+
+
+def record_exposure_by_user():
+    stakes = {}
+    for bet in db._bets.values():
+        if bet['status'] == 'active':
+            stakes[bet['user_id']] = stakes.get(bet['user_id'], 0) + bet['amount']
+    return stakes
+
+
+def populate():
+    rng = random.Random(11)
+    market_ids = [
+        db.create_market(f"Market {i}?", '', 'criteria', '2099-01-01T00:00:00', 'bench')['id']
+        for i in range(MARKETS)
+    ]
+    user_ids = [f"user-{i}" for i in range(USERS)]
+    for user_id in user_ids:
+        db.add_user({'id': user_id, 'username': user_id, 'balance': to_micros(1000),
+                     'total_bets': 0, 'total_winnings': 0})
+
+    big = market_ids[0]
+    for i in range(MARKET_BETS + OTHER_BETS):
+        market_id = big if i < MARKET_BETS else rng.choice(market_ids[1:])
+        amount = to_micros(rng.randint(1, 100))
+        db.create_bet(rng.choice(user_ids), market_id, rng.choice(('YES', 'NO')), amount, amount * 3 // 2, 0.66,
+                      amount * 3 // 2)
+    return big, user_ids[0]
+
+
+if __name__ == '__main__':
+    big, user_id = populate()
+    print(f"{MARKET_BETS + OTHER_BETS} bets over {MARKETS} markets; settling one with {MARKET_BETS} bets")
+
+    copies = [copy.deepcopy(ledger) for _ in range(5)]
+    start = time.perf_counter()
+    for copied in copies:
+        copied.settle(big, 'YES')
+    ledger_settle = (time.perf_counter() - start) / len(copies)
+    record_settle = time_per_call(lambda: record_settlement(big, 'YES'), 5)
+    print(f"  payouts by user    ledger {format_us(ledger_settle)}   bet records {format_us(record_settle)}")
+
+    ledger_volume = time_per_call(ledger.market_volume, 20)
+    records_volume = time_per_call(record_volume, 3)
+    print(f"  volume per market  ledger {format_us(ledger_volume)}   bet records {format_us(records_volume)}")
+
+    ledger_exposure = time_per_call(lambda: ledger.user_exposure(user_id), 200)
+    records_exposure = time_per_call(lambda: record_exposure(user_id), 200)
+    print(f"  one user exposure  ledger {format_us(ledger_exposure)}   bet records {format_us(records_exposure)}")
+
+    ledger_all = time_per_call(ledger.exposure_by_user, 20)
+    records_all = time_per_call(record_exposure_by_user, 3)
+    print(f"  all users exposure ledger {format_us(ledger_all)}   bet records {format_us(records_all)}")
+
+    start = time.perf_counter()
+    settled = db.settle_bets_for_market(big, 'YES')
+    elapsed = time.perf_counter() - start
+    print(f"  settle_bets_for_market: {settled} bets in {elapsed * 1e3:.1f} ms")
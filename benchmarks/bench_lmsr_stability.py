@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark LMSR pricing across share magnitudes
+
+Prices a market holding YES share totals from 0 to 1e6 (liquidity 100)
+with the float log-sum-exp core, next to the previous exp/Decimal core,
+which overflows once q/b passes ~710.
+
+Usage:
+    python -m benchmarks.bench_lmsr_stability
+"""
+import math
+from decimal import Decimal
+
+from db.market_maker import MarketMaker
+
+from .common import format_us, time_per_call
+
+LIQUIDITY = 100
+MAGNITUDES = [0, 1e2, 1e3, 1e4, 7e4, 7.2e4, 1e5, 1e6]
+ITERATIONS = 5000
+
+
+def legacy_cost(yes_shares, no_shares, b=LIQUIDITY):
+    """Previous cost function: direct exponentials through Decimal"""
+    yes_exp = math.exp(float(yes_shares) / b)
+    no_exp = math.exp(float(no_shares) / b)
+    return Decimal(str(b * math.log(yes_exp + no_exp)))
+
+
+def legacy_odds(yes_shares, no_shares, b=LIQUIDITY):
+    """Previous odds: direct exponentials"""
+    yes_exp = math.exp(float(yes_shares) / b)
+    no_exp = math.exp(float(no_shares) / b)
+    total = yes_exp + no_exp
+    return {'YES': yes_exp / total, 'NO': no_exp / total}
+
+
+def bench_legacy(yes_shares):
+    """Time the previous core, or report where it overflows"""
+    yes, no = Decimal(str(yes_shares)), Decimal('0')
+
+    def price():
+        legacy_odds(yes, no)
+        legacy_cost(yes + Decimal('10'), no) - legacy_cost(yes, no)
+
+    try:
+        price()
+    except OverflowError:
+        return 'OverflowError'
+    return format_us(time_per_call(price, ITERATIONS))
+
+
+def bench_float(yes_shares):
+    """Time the float core and sanity-check its output"""
+    mm = MarketMaker(liquidity=LIQUIDITY)
+    mm.yes_shares = float(yes_shares)
+
+    def price():
+        mm.get_odds()
+        mm.simulate_bet('NO', 10)
+
+    result = mm.simulate_bet('NO', 10)
+    finite = all(math.isfinite(v) for v in (result['shares'], *result['new_odds'].values()))
+    return format_us(time_per_call(price, ITERATIONS)), finite, mm.get_odds()['YES']
+
+
+if __name__ == '__main__':
+    print(f"{'q_yes':>10s}  {'exp/Decimal core':>16s}  {'float core':>13s}  finite  P(YES)")
+    for magnitude in MAGNITUDES:
+        legacy = bench_legacy(magnitude)
+        elapsed, finite, yes_odds = bench_float(magnitude)
+        print(f"{magnitude:10.0f}  {legacy:>16s}  {elapsed}  {str(finite):6s}  {yes_odds:.6f}")
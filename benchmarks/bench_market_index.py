@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark market listing pages
+
+Creates many markets across a few communities, resolves a share of them,
+then times first, middle and last pages of list_markets through the
+ordered index (offset and cursor) against the full scan-filter-sort it
+replaced.
+
+Usage:
+    python -m benchmarks.bench_market_index
+"""
+import random
+
+from db import db
+
+from .common import format_us, time_per_call
+
+MARKETS = 200_000
+COMMUNITIES = ['general', 'news', 'worldnews', 'technology', 'sports']
+RESOLVED_FRACTION = 0.3
+PAGE = 50
+ITERATIONS = 200
+
+
+def scan_list_markets(status='open', community=None, limit=50, offset=0):
+    """Previous list_markets: filter every market, sort, then slice (ties by id)"""
+    markets = list(db._markets.values())
+    if status:
+        markets = [m for m in markets if m['status'] == status]
+    if community:
+        markets = [m for m in markets if m.get('community') == community]
+    markets.sort(key=lambda m: (-m['created_at'].timestamp(), m['id']))
+    return markets[offset:offset+limit]
+
+
+def populate():
+    """Create MARKETS markets and resolve a random share of them"""
+    rng = random.Random(7)
+    for i in range(MARKETS):
+        market = db.create_market(f"Q{i}?", '', 'criteria', '2099-01-01T00:00:00', 'bench',
+                                  community=rng.choice(COMMUNITIES))
+        if rng.random() < RESOLVED_FRACTION:
+            db.resolve_market(market['id'], 'YES')
+
+
+if __name__ == '__main__':
+    populate()
+    open_news = len(scan_list_markets('open', 'news', limit=MARKETS))
+    print(f"{MARKETS} markets, {open_news} open in 'news', page size {PAGE}")
+
+    for label, offset in [('first page', 0), ('middle page', open_news // 2), ('last page', open_news - PAGE)]:
+        cursor = db.market_cursor(db.list_markets('open', 'news', 1, offset - 1)[0]['id']) if offset else None
+        assert ([m['id'] for m in db.list_markets('open', 'news', PAGE, cursor=cursor)]
+                == [m['id'] for m in scan_list_markets('open', 'news', PAGE, offset)])
+
+        by_offset = time_per_call(lambda: db.list_markets('open', 'news', PAGE, offset), ITERATIONS)
+        by_cursor = time_per_call(lambda: db.list_markets('open', 'news', PAGE, cursor=cursor), ITERATIONS)
+        scan = time_per_call(lambda: scan_list_markets('open', 'news', PAGE, offset), 5)
+        print(f"  {label:12s} offset {format_us(by_offset)}   cursor {format_us(by_cursor)}   "
+              f"full scan {format_us(scan)}")
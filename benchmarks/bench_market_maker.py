@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark the LMSR share solvers
+
+Checks that the closed-form solver and the bisection fallback fill the
+same shares on fresh and skewed markets, failing if they disagree, then
+compares their speed on MarketMaker.simulate_bet directly and through
+/api/bets/simulate and /api/bets/place, and compares one
+/api/markets/<id>/quote-ladder request against the equivalent run of
+/api/bets/simulate round-trips.
+
+Usage:
+    python -m benchmarks.bench_market_maker
+"""
+from db.market_maker import MarketMaker, SOLVERS, market_makers
+
+from .common import api_client, create_bench_market, format_us, time_per_call
+
+AMOUNTS = [1, 10, 100, 500]
+ITERATIONS = 2000
+API_ITERATIONS = 500
+# Largest relative difference allowed between the two solvers' fills
+AGREEMENT_TOLERANCE = 1e-9
+
+
+def check_agreement():
+    """Fail unless both solvers fill the same shares, on fresh and skewed markets"""
+    print("Solver agreement")
+    for skew in (0, 250, 2000):
+        makers = {solver: MarketMaker(solver=solver) for solver in SOLVERS}
+        for mm in makers.values():
+            if skew:
+                mm.execute_bet('YES', skew)
+        worst = 0.0
+        for outcome in ('YES', 'NO'):
+            for amount in AMOUNTS:
+                fills = [makers[solver].simulate_bet(outcome, amount)['shares'] for solver in SOLVERS]
+                assert min(fills) > 0, f"${amount} {outcome} after ${skew} on YES filled {fills}"
+                worst = max(worst, (max(fills) - min(fills)) / max(fills))
+        assert worst <= AGREEMENT_TOLERANCE, f"solvers disagree by {worst:.2e} after ${skew} on YES"
+        print(f"  after ${skew:<5d} on YES   max relative difference {worst:.2e}")
+
+
+def bench_solvers():
+    """Time simulate_bet per solver and check fill accuracy"""
+    print("MarketMaker.simulate_bet")
+    for solver in SOLVERS:
+        mm = MarketMaker(solver=solver)
+        mm.execute_bet('YES', 250)
+        mean = time_per_call(lambda: [mm.simulate_bet('NO', a) for a in AMOUNTS], ITERATIONS)
+        mean /= len(AMOUNTS)
+
+        # Cost actually charged for the returned shares vs the requested amount
+        worst = 0.0
+        for amount in AMOUNTS:
+            result = mm.simulate_bet('NO', amount)
+            cost = mm._cost_function(result['yes_shares'], result['no_shares']) - \
+                mm._cost_function(mm.yes_shares, mm.no_shares)
+            worst = max(worst, abs(float(cost) - amount))
+
+        print(f"  {solver:12s} {format_us(mean)} per quote   max fill error ${worst:.2e}")
+
+
+def bench_endpoints():
+    """Time the simulate and place endpoints per solver"""
+    bettit_api, client, headers, user_id = api_client()
+
+    print("API endpoints")
+    for solver in SOLVERS:
+        market_makers.solver = solver
+        market_id = create_bench_market(user_id)
+        payload = {'market_id': market_id, 'outcome': 'YES', 'amount': 5}
+
+        simulate = time_per_call(
+            lambda: client.post('/api/bets/simulate', json=payload, headers=headers),
+            API_ITERATIONS
+        )
+        place = time_per_call(
+            lambda: client.post('/api/bets/place', json=payload, headers=headers),
+            API_ITERATIONS
+        )
+
+        print(f"  {solver:12s} /api/bets/simulate {format_us(simulate)}   "
+              f"/api/bets/place {format_us(place)}")
+
+
+def bench_quote_ladder(ladder_size=25):
+    """Time one quote-ladder request against simulate calls for the same amounts"""
+    bettit_api, client, headers, user_id = api_client()
+    market_makers.solver = 'closed_form'
+    market_id = create_bench_market(user_id)
+    amounts = [5 * (i + 1) for i in range(ladder_size)]
+
+    mm = MarketMaker()
+    batch = time_per_call(lambda: mm.quote_batch(amounts), ITERATIONS)
+    scalar = time_per_call(
+        lambda: [mm.simulate_bet(o, a) for o in ('YES', 'NO') for a in amounts],
+        ITERATIONS // 10
+    )
+
+    query = ','.join(str(a) for a in amounts)
+    ladder = time_per_call(
+        lambda: client.get(f'/api/markets/{market_id}/quote-ladder?amounts={query}'),
+        API_ITERATIONS
+    )
+
+    def simulate_all():
+        for outcome in ('YES', 'NO'):
+            for amount in amounts:
+                client.post('/api/bets/simulate', headers=headers,
+                            json={'market_id': market_id, 'outcome': outcome, 'amount': amount})
+
+    round_trips = time_per_call(simulate_all, API_ITERATIONS // 25)
+
+    print(f"Quote ladder ({ladder_size} amounts x 2 outcomes)")
+    print(f"  MarketMaker.quote_batch    {format_us(batch)}   "
+          f"simulate_bet loop {format_us(scalar)}")
+    print(f"  GET quote-ladder           {format_us(ladder)}   "
+          f"{2 * ladder_size} x /api/bets/simulate {format_us(round_trips)}")
+
+
+if __name__ == '__main__':
+    check_agreement()
+    bench_solvers()
+    bench_endpoints()
+    bench_quote_ladder()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark micro-batched order execution
+
+Many threads hammer a few hot markets through /api/bets/place with
+batching off and with several batch windows, reporting fills per second
+per market, the average batch size, and whether each market's pool still
+matches the sum of its recorded bets.
+
+Usage:
+    python -m benchmarks.bench_order_batching
+"""
+import threading
+import time
+
+from db import db
+from db.money import to_dollars
+
+from .common import api_client, create_bench_market, register_bench_user
+
+HOT_MARKETS = 4
+THREADS_PER_MARKET = 16
+ORDERS_PER_THREAD = 25
+WINDOWS_MS = [0, 1, 5]
+
+
+def run(bettit_api, window_ms, market_ids):
+    """Place every order concurrently and return elapsed seconds"""
+    bettit_api.order_batcher.window = window_ms / 1000
+    users = [register_bench_user()[1] for _ in range(len(market_ids) * THREADS_PER_MARKET)]
+
+    def worker(market_id, headers):
+        client = bettit_api.app.test_client()
+        payload = {'market_id': market_id, 'outcome': 'YES', 'amount': 1}
+        for _ in range(ORDERS_PER_THREAD):
+            client.post('/api/bets/place', json=payload, headers=headers)
+
+    threads = [
+        threading.Thread(target=worker, args=(market_ids[i % len(market_ids)], headers))
+        for i, headers in enumerate(users)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def report(bettit_api, window_ms, market_ids, elapsed):
+    """Print per-market throughput and consistency"""
+    stats = bettit_api.order_batcher.stats()
+    label = f"window {window_ms} ms" if window_ms else "no batching"
+    print(label)
+    for market_id in market_ids:
+        market = db.get_market_by_id(market_id)
+        bets = [b for b in db._bets.values() if b['market_id'] == market_id]
+        recorded = to_dollars(sum(b['amount'] for b in bets))
+        batch = stats.get(market_id, {}).get('avg_batch_size', 1.0)
+        print(f"  market {market_id[:8]}  {len(bets) / elapsed:8.0f} fills/s  "
+              f"avg batch {batch:5.1f}  pool {to_dollars(market['total_pool']):7.0f} "
+              f"vs bets {recorded:7.0f}")
+
+
+if __name__ == '__main__':
+    bettit_api, _, _, user_id = api_client()
+    for window_ms in WINDOWS_MS:
+        market_ids = [create_bench_market(user_id) for _ in range(HOT_MARKETS)]
+        elapsed = run(bettit_api, window_ms, market_ids)
+        report(bettit_api, window_ms, market_ids, elapsed)
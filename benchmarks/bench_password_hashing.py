@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput at several password-hashing costs
+
+For each scheme and cost, registers a user and has a set of client
+threads log in as fast as they can, reporting logins per second and
+latency. A final burst sends more concurrent logins than the pool admits,
+to show the excess turned away at once instead of queueing behind it.
+
+Usage:
+    python -m benchmarks.bench_password_hashing
+"""
+import hashlib
+import logging
+import statistics
+import threading
+import time
+
+from db.auth import login_user, register_user
+from db.passwords import HASH_QUEUE_DEPTH, HasherBusy, hasher
+
+from .common import format_us, time_per_call
+
+CLIENTS = 8
+LOGINS_PER_CLIENT = 5
+SETTINGS = [('scrypt', 12), ('scrypt', 13), ('scrypt', 14), ('pbkdf2-sha256', 17), ('pbkdf2-sha256', 19)]
+BURST = 96
+
+
+def logins(email, clients, per_client):
+    """Concurrent logins; returns (wall seconds, success latencies, rejected-call latencies)"""
+    latencies, busy = [], []
+
+    def client():
+        for _ in range(per_client):
+            start = time.perf_counter()
+            try:
+                ok, _, _ = login_user(email, 'bench-password')
+            except HasherBusy:
+                busy.append(time.perf_counter() - start)
+                continue
+            assert ok
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, busy
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    legacy = time_per_call(lambda: hashlib.sha256(b'bench-password').hexdigest(), 100_000)
+    print(f"{CLIENTS} clients x {LOGINS_PER_CLIENT} logins, {hasher.workers} hashing workers")
+    print(f"  unsalted sha256 (previous)   {format_us(legacy)} per hash")
+    print("  scheme          cost   logins/s     p50 latency     p99 latency")
+    for scheme, cost in SETTINGS:
+        hasher.scheme, hasher.cost = scheme, cost
+        _, user, _ = register_user(f"{scheme}{cost}", f"{scheme}{cost}@example.com", 'bench-password')
+        elapsed, latencies, _ = logins(user['email'], CLIENTS, LOGINS_PER_CLIENT)
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"  {scheme:<15s} {cost:4d}   {len(latencies) / elapsed:8.1f}   "
+              f"{format_us(statistics.median(latencies))}   {format_us(p99)}")
+
+    # Burst: more simultaneous logins than workers plus queue admit
+    hasher.scheme, hasher.cost = 'scrypt', 14
+    _, user, _ = register_user('burst', 'burst@example.com', 'bench-password')
+    elapsed, latencies, busy = logins(user['email'], BURST, 1)
+    print(f"burst of {BURST} logins, queue depth {HASH_QUEUE_DEPTH} (scrypt cost 14)")
+    print(f"  served {len(latencies)} in {elapsed:.2f} s, turned away {len(busy)} "
+          f"(503) after {format_us(max(busy) if busy else 0)} at most")
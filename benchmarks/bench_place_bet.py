@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the place-bet path
+
+Times single-order fills through execute_bet_orders (pricing, bet record,
+balance, transaction, market update) and full /api/bets/place requests,
+and measures the memory each placed bet leaves behind in the store.
+
+It also isolates the money handling one fill does, as the Decimal
+amounts the store used to keep (every value parsed through str, a new
+Decimal per stored field) next to the integer micro-units it keeps now.
+
+Usage:
+    python -m benchmarks.bench_place_bet
+"""
+import gc
+import tracemalloc
+from decimal import Decimal
+
+from db.money import to_micros
+
+from .common import api_client, create_bench_market, format_us, time_per_call
+
+BETS = 5_000
+WARMUP = 200
+ITERATIONS = 100_000
+
+
+def decimal_fill(amount, shares, balance, pool, yes_shares):
+    """Money values one fill stored as Decimals: bet, balance, transaction, market"""
+    bet = (Decimal(str(amount)), Decimal(str(shares)), Decimal(str(shares)))
+    new_balance = Decimal(str(Decimal(balance) - Decimal(str(amount))))
+    transaction = (Decimal(str(-amount)), Decimal(str(float(new_balance))))
+    market = (Decimal(str(float(pool) + amount)), Decimal(str(float(yes_shares) + shares)))
+    return bet, new_balance, transaction, market
+
+
+def micros_fill(amount, shares, balance, pool, yes_shares):
+    """The same values as integer micro-units"""
+    shares = to_micros(shares)
+    bet = (amount, shares, shares)
+    new_balance = balance - amount
+    transaction = (-amount, new_balance)
+    market = (pool + amount, yes_shares + shares)
+    return bet, new_balance, transaction, market
+
+
+def retained_bytes(fill, args, count=10_000):
+    """Heap bytes per call kept alive by the values fill() returns"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [fill(*args) for _ in range(count)]
+    retained = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    del kept
+    return retained
+
+
+if __name__ == '__main__':
+    bettit_api, client, headers, user_id = api_client()
+    order = {'user_id': user_id, 'outcome': 'YES', 'amount': to_micros(5)}
+
+    market_id = create_bench_market(user_id)
+    for _ in range(WARMUP):
+        bettit_api.execute_bet_orders(market_id, [order])
+    fill = time_per_call(lambda: bettit_api.execute_bet_orders(market_id, [order]), BETS)
+
+    payload = {'market_id': create_bench_market(user_id), 'outcome': 'NO', 'amount': 5}
+    request = time_per_call(lambda: client.post('/api/bets/place', json=payload, headers=headers), BETS)
+
+    market_id = create_bench_market(user_id)
+    bettit_api.execute_bet_orders(market_id, [order])
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(BETS):
+        bettit_api.execute_bet_orders(market_id, [order])
+    gc.collect()
+    retained = (tracemalloc.get_traced_memory()[0] - before) / BETS
+    tracemalloc.stop()
+
+    print(f"{BETS} bets")
+    print(f"  execute_bet_orders   {format_us(fill)} per bet")
+    print(f"  POST /api/bets/place {format_us(request)} per bet")
+    print(f"  memory retained      {retained:10.0f} bytes per bet (bet, transaction, indexes, ledger)")
+
+    # Money handling of one $5 fill buying 7.5 shares
+    decimal_args = (5.0, 7.5, Decimal('1000'), Decimal('250'), Decimal('400.125'))
+    micros_args = (to_micros(5), 7.5, to_micros(1000), to_micros(250), to_micros('400.125'))
+    print("money handling per fill              Decimal     micro-units")
+    print(f"  time                         {format_us(time_per_call(lambda: decimal_fill(*decimal_args), ITERATIONS))}"
+          f"   {format_us(time_per_call(lambda: micros_fill(*micros_args), ITERATIONS))}")
+    print(f"  bytes of stored values       {retained_bytes(decimal_fill, decimal_args):10.0f}   "
+          f"   {retained_bytes(micros_fill, micros_args):10.0f}")
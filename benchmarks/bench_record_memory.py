@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory per stored record: plain dicts vs slotted records
+
+Builds the same markets, bets, users and transactions once as the dicts
+the store used to hold and once as the records in db.records, both
+pointing at the same field values, and reports per record the container's
+size, the heap each layout allocates (tracemalloc) and the size of its
+snapshot pickle.
+
+Usage:
+    python -m benchmarks.bench_record_memory
+"""
+import gc
+import pickle
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from db.money import to_micros
+from db.records import Bet, Market, Transaction, User
+
+RECORDS = 100_000
+
+
+def market_fields(i):
+    return {
+        'id': str(uuid.uuid4()), 'question': f"Will event {i} happen?", 'description': '',
+        'resolution_criteria': 'criteria', 'resolution_date': datetime.utcnow(),
+        'created_by': 'bench', 'source_article_url': None, 'source_article_title': None,
+        'community': 'general', 'image_url': None, 'market_type': 'article_prediction',
+        'source_metadata': {}, 'status': 'open', 'outcomes': ['YES', 'NO'],
+        'yes_odds': 0.5, 'no_odds': 0.5, 'outcome_odds': None, 'total_pool': 0,
+        'total_yes_shares': 0, 'total_no_shares': 0, 'outcome_shares': None,
+        'created_at': datetime.utcnow(), 'resolved_at': None, 'outcome': None
+    }
+
+
+def bet_fields(i):
+    return {
+        'id': str(uuid.uuid4()), 'user_id': f"user-{i % 1000}", 'market_id': f"market-{i % 100}",
+        'outcome': 'YES', 'side': 'buy', 'amount': to_micros(10 + i % 90),
+        'shares': to_micros('15.25'), 'odds': 0.66, 'potential_payout': to_micros('15.25'),
+        'status': 'active', 'created_at': datetime.utcnow(), 'settled_at': None, 'actual_payout': None
+    }
+
+
+def user_fields(i):
+    return {
+        'id': str(uuid.uuid4()), 'username': f"user{i}", 'email': f"user{i}@example.com",
+        'password_hash': uuid.uuid4().hex * 2, 'display_name': f"user{i}", 'avatar_url': None,
+        'bio': '', 'balance': to_micros(1000), 'total_bets': 0, 'total_winnings': 0,
+        'win_rate': 0.0, 'is_creator': False, 'creator_bio': None,
+        'created_at': datetime.utcnow(), 'token': None
+    }
+
+
+def transaction_fields(i):
+    return {
+        'id': str(uuid.uuid4()), 'user_id': f"user-{i % 1000}", 'type': 'bet_placed',
+        'amount': to_micros(-(10 + i % 90)), 'balance_after': to_micros(990),
+        'market_id': f"market-{i % 100}", 'bet_id': str(uuid.uuid4()),
+        'description': 'Bet YES on market', 'created_at': datetime.utcnow()
+    }
+
+
+def heap_per_record(build):
+    """Heap bytes per record allocated by build(), which returns a list"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(records), records
+
+
+if __name__ == '__main__':
+    print(f"{RECORDS} records of each type; bytes per record, dict -> slotted record")
+    for name, cls, fields in (
+        ('market', Market, market_fields),
+        ('bet', Bet, bet_fields),
+        ('user', User, user_fields),
+        ('transaction', Transaction, transaction_fields),
+    ):
+        rows = [fields(i) for i in range(RECORDS)]
+        # Copy the same values into each layout so only the container differs
+        dict_heap, dicts = heap_per_record(lambda: [dict(row) for row in rows])
+        record_heap, records = heap_per_record(lambda: [cls.from_dict(row) for row in rows])
+
+        dict_size = sys.getsizeof(dicts[0])
+        record_size = sys.getsizeof(records[0])
+        dict_pickle = len(pickle.dumps(dicts, protocol=pickle.HIGHEST_PROTOCOL)) / RECORDS
+        record_pickle = len(pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)) / RECORDS
+
+        print(f"  {name:<12} container {dict_size:>5} -> {record_size:>4}"
+              f"   heap {dict_heap:>7.0f} -> {record_heap:>6.0f}"
+              f" ({dict_heap / record_heap:.1f}x)"
+              f"   pickled {dict_pickle:>6.0f} -> {record_pickle:>5.0f}")
+        del rows, dicts, records
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark the resolution scheduler
+
+Opens MARKETS markets with resolution dates spread over the next year,
+then compares finding the markets that have just expired by popping the
+scheduler's heap against scanning every market's resolution date, and
+times the lazy expiry check every bet now pays.
+
+Usage:
+    python -m benchmarks.bench_scheduler
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from db import db
+from db.scheduler import ResolutionScheduler
+
+from .common import format_us, time_per_call
+
+MARKETS = 100_000
+DUE_PER_TICK = 10
+ITERATIONS = 200
+
+
+def scan_expired(now):
+    """Expired open markets by checking every market (what a periodic sweep costs)"""
+    return [market['id'] for market in db._markets.values()
+            if market['status'] == 'open' and db.resolution_deadline(market) <= now]
+
+
+if __name__ == '__main__':
+    rng = random.Random(3)
+    base = datetime.utcnow() + timedelta(days=1)
+    for i in range(MARKETS):
+        when = base + timedelta(seconds=rng.randint(0, 365 * 86400))
+        db.create_market(f"Market {i}?", '', 'criteria', when.isoformat(), 'bench')
+    print(f"{MARKETS} open markets")
+
+    # A standalone copy of the heap so popping does not touch the live one
+    heap = ResolutionScheduler()
+    deadlines = sorted(db.resolution_deadline(market) for market in db._markets.values())
+    schedule = time_per_call(
+        lambda: heap.schedule('m', deadlines[rng.randrange(MARKETS)]), ITERATIONS)
+    for market_id, market in db._markets.items():
+        heap.schedule(market_id, db.resolution_deadline(market))
+    print(f"  schedule one market          {format_us(schedule)}")
+
+    ticks = iter(deadlines[DUE_PER_TICK - 1::DUE_PER_TICK])
+    pop = time_per_call(lambda: heap.pop_due(next(ticks)), ITERATIONS)
+    scan = time_per_call(lambda: scan_expired(deadlines[DUE_PER_TICK * ITERATIONS]), 5)
+    print(f"  find {DUE_PER_TICK} expired markets     heap {format_us(pop)}   full scan {format_us(scan)}")
+
+    market = next(iter(db._markets.values()))
+    check = time_per_call(lambda: db.market_status(market), 10_000)
+    print(f"  lazy expiry check per bet    {format_us(check)}")
+
+    start = time.perf_counter()
+    expiring = list(db._markets)[:1000]
+    db.close_markets(expiring)
+    print(f"  close 1000 markets           {format_us((time.perf_counter() - start) / 1000)} each")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark the bet placement path on each storage backend
+
+Replays the store calls a filled buy makes (load market and user, create
+the bet, update balance and bet count, write the transaction, update the
+market), grouped in one write transaction as the API runs them, against
+the in-memory store and the SQLite backend, single threaded and from
+several threads sharing the connection pool.
+
+Usage:
+    python -m benchmarks.bench_storage_backends
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from db import db
+from db.money import to_micros
+
+from .common import format_us
+
+BETS = 5_000
+THREADS = 8
+POOL_SIZE = (2, 8)
+
+
+def setup(store, users=THREADS):
+    """Create one market and a funded user per thread"""
+    market = store.create_market('Bench?', '', 'criteria', '2099-01-01T00:00:00', 'bench')
+    user_ids = []
+    for i in range(users):
+        user_id = f"bench-user-{i}-{time.perf_counter_ns()}"
+        store.add_user({'id': user_id, 'username': user_id, 'email': f"{user_id}@example.com",
+                        'balance': to_micros(10 ** 9), 'total_bets': 0, 'total_winnings': 0,
+                        'created_at': datetime.utcnow()})
+        user_ids.append(user_id)
+    return market['id'], user_ids
+
+
+def place_bet(store, market_id, user_id, i):
+    """The store calls behind one filled buy order"""
+    with store.write_transaction():
+        store.get_market_by_id(market_id)
+        user = store.get_user_by_id(user_id)
+        amount, shares = to_micros(10), to_micros(15)
+        bet = store.create_bet(user_id, market_id, 'YES', amount, shares, 0.66, shares)
+        new_balance = user['balance'] - amount
+        store.update_user_balance(user_id, new_balance)
+        store.increment_user_total_bets(user_id)
+        store.create_transaction(user_id, 'bet_placed', -amount, new_balance, market_id, bet['id'])
+        store.update_market_odds(market_id, {'YES': 0.5, 'NO': 0.5}, amount * i, shares * i, 0)
+
+
+def run(store, threads):
+    """Place BETS bets split over `threads` threads; returns seconds per bet"""
+    market_id, user_ids = setup(store, threads)
+    per_thread = BETS // threads
+
+    def worker(user_id):
+        for i in range(per_thread):
+            place_bet(store, market_id, user_id, i)
+
+    workers = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return (time.perf_counter() - start) / (per_thread * threads)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['BETTIT_SQLITE_PATH'] = os.path.join(tmp, 'bench.db')
+        from db import sqlite_db
+        sqlite_db.init_pool(*POOL_SIZE)
+
+        print(f"{BETS} bets per run, pool minconn={POOL_SIZE[0]} maxconn={POOL_SIZE[1]}")
+        for threads in (1, THREADS):
+            memory = run(db, threads)
+            sqlite = run(sqlite_db, threads)
+            print(f"  {threads} thread(s)  memory {format_us(memory)}/bet   sqlite {format_us(sqlite)}/bet "
+                  f"({1 / sqlite:,.0f} bets/s)")
+
+        sqlite_db._pool.closeall()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark the auth token store under login churn
+
+Logs a fixed set of users in over and over and tracks how many tokens are
+held and the heap they use, next to the plain dict that used to keep
+every token ever issued. Also times validating stored and signed tokens,
+and a timer-wheel sweep against a scan of every token for expired ones.
+
+Usage:
+    python -m benchmarks.bench_token_churn
+"""
+import logging
+import random
+import time
+import tracemalloc
+
+from db import db
+from db.auth import generate_token, hash_password, login_user, sign_token, validate_token
+from db.money import to_micros
+from db.passwords import hasher
+from db.tokens import TokenStore, tokens
+
+from .common import format_us, time_per_call
+
+USERS = 10_000
+ROUNDS = 5
+LOGINS_PER_ROUND = 100_000
+ITERATIONS = 100_000
+SWEEP_TOKENS = 1_000_000
+
+
+def populate():
+    """Add USERS users who can log in"""
+    password_hash = hash_password('bench-password')
+    for i in range(USERS):
+        db.add_user({
+            'id': f"user-{i}",
+            'username': f"user{i}",
+            'email': f"user{i}@example.com",
+            'password_hash': password_hash,
+            'balance': to_micros(1000)
+        })
+
+
+def churn():
+    """Memory held by the token store and by an unbounded dict as logins pile up"""
+    rng = random.Random(7)
+    unbounded = {}
+    print(f"{USERS} users, cap {tokens.max_per_user} tokens each")
+    print("  logins       tokens held     store heap   unbounded dict")
+    for round_ in range(1, ROUNDS + 1):
+        for _ in range(LOGINS_PER_ROUND):
+            i = rng.randrange(USERS)
+            _, user, _ = login_user(f"user{i}@example.com", 'bench-password')
+            unbounded[user['token']] = user['id']
+        print(f"  {round_ * LOGINS_PER_ROUND:>8d}   {len(tokens):12d}   {store_bytes() / 2 ** 20:9.1f} MB   "
+              f"{dict_bytes(unbounded) / 2 ** 20:9.1f} MB ({len(unbounded)} tokens)")
+
+
+def store_bytes():
+    """Heap bytes of a rebuilt copy of the live token store"""
+    entries = tokens.entries()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copy = TokenStore()
+    for token, user_id, expires_at in entries:
+        copy.add(token.encode().decode(), user_id, expires_at)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del copy
+    return used
+
+
+def dict_bytes(mapping):
+    """Heap bytes of a copy of a token -> user_id dict, tokens included"""
+    items = list(mapping.items())
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copy = {token.encode().decode(): user_id for token, user_id in items}
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del copy
+    return used
+
+
+def scan_evict(store, now):
+    """Evict expired tokens by checking every token held"""
+    expired = [token for token, (_, expires_at) in store._tokens.items() if expires_at <= now]
+    for token in expired:
+        store.discard(token)
+    return len(expired)
+
+
+def sweeps():
+    """Evicting two ticks' worth of expired tokens: wheel sweep vs full scan"""
+    store = TokenStore(ttl=3600, tick=60)
+    start = (time.time() // 60 + 1) * 60  # next tick boundary
+    for _ in range(SWEEP_TOKENS):
+        store.add(generate_token(), f"user-{len(store)}", start + random.uniform(0, 3600))
+    print(f"{SWEEP_TOKENS} tokens over a 1 h TTL, 60 s ticks")
+    # Same store, next two ticks for the scan, so both evict about as many
+    for name, evict in (('wheel sweep', lambda: store.sweep(start + 120)),
+                        ('full scan', lambda: scan_evict(store, start + 240))):
+        evict_start = time.perf_counter()
+        evicted = evict()
+        elapsed = time.perf_counter() - evict_start
+        print(f"  {name:<12s} {format_us(elapsed)}   {evicted} evicted, {elapsed / evicted * 1e6:.2f} us each")
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    # Cheapest KDF cost: logins here measure lookups, not password hashing
+    hasher.cost = 1
+    populate()
+    churn()
+
+    token, signed = tokens.user_tokens('user-0')[-1], sign_token('user-0')
+    print(f"  validate_token     stored {format_us(time_per_call(lambda: validate_token(token), ITERATIONS))}"
+          f"   signed {format_us(time_per_call(lambda: validate_token(signed), ITERATIONS))}")
+    sweeps()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark user lookups by email and username
+
+Adds a million users, then times email and username lookups through the
+store's hash indexes against the scan over every user they replaced, and
+the register and login calls that run those lookups.
+
+Usage:
+    python -m benchmarks.bench_user_lookup
+"""
+import logging
+import random
+import sys
+
+from db import db
+from db.auth import hash_password, login_user, register_user
+from db.money import to_micros
+from db.passwords import hasher
+
+from .common import format_us, time_per_call
+
+USERS = 1_000_000
+ITERATIONS = 10_000
+SCANS = 5
+
+
+def scan_by_email(email):
+    """Previous get_user_by_email: check every user"""
+    for user in db._users.values():
+        if user['email'] == email:
+            return user
+    return None
+
+
+def scan_by_username(username):
+    """Previous get_user_by_username: check every user"""
+    for user in db._users.values():
+        if user['username'] == username:
+            return user
+    return None
+
+
+def populate():
+    """Add USERS users with distinct usernames and emails"""
+    password_hash = hash_password('bench-password')
+    for i in range(USERS):
+        db.add_user({
+            'id': f"user-{i}",
+            'username': f"user{i}",
+            'email': f"user{i}@example.com",
+            'password_hash': password_hash,
+            'balance': to_micros(1000)
+        })
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    # Cheapest KDF cost: logins here measure lookups, not password hashing
+    hasher.cost = 1
+    populate()
+    rng = random.Random(7)
+    print(f"{USERS} users")
+
+    # The scans get a user near the end, as a login for a recent signup would
+    email, username = f"user{USERS - 1}@example.com", f"user{USERS - 1}"
+    index_email = time_per_call(lambda: db.get_user_by_email(email), ITERATIONS)
+    index_username = time_per_call(lambda: db.get_user_by_username(username), ITERATIONS)
+    scan_email = time_per_call(lambda: scan_by_email(email), SCANS)
+    scan_username = time_per_call(lambda: scan_by_username(username), SCANS)
+    print(f"  by email      index {format_us(index_email)}   scan {format_us(scan_email)}")
+    print(f"  by username   index {format_us(index_username)}   scan {format_us(scan_username)}")
+
+    counter = iter(range(10 ** 9))
+
+    def register():
+        i = next(counter)
+        register_user(f"new{i}", f"new{i}@example.com", 'bench-password')
+
+    def login():
+        i = rng.randrange(USERS)
+        login_user(f"User{i}@Example.com", 'bench-password')
+
+    print(f"  register_user {format_us(time_per_call(register, ITERATIONS))}")
+    print(f"  login_user    {format_us(time_per_call(login, ITERATIONS))}   (mixed-case email)")
+
+    index_bytes = sys.getsizeof(db._users_by_email) + sys.getsizeof(db._users_by_username)
+    print(f"  index tables  {index_bytes / USERS:10.1f} bytes per user (keys shared with the records)")
@@ -0,0 +1,79 @@
+"""
+Shared helpers for the benchmark scripts
+
+Run any benchmark from the repository root, e.g.:
+    python -m benchmarks.bench_market_maker
+"""
+import logging
+import time
+
+
+def time_per_call(fn, iterations):
+    """
+    Time a callable
+
+    Args:
+        fn: Zero-argument callable to time
+        iterations: Number of calls
+
+    Returns:
+        Mean seconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def format_us(seconds):
+    """Format a duration in microseconds"""
+    return f"{seconds * 1e6:10.1f} us"
+
+
+def register_bench_user(balance=10 ** 9):
+    """
+    Register a well-funded user
+
+    Args:
+        balance: Starting balance in dollars
+
+    Returns:
+        (user_id, auth headers)
+    """
+    from db import db
+    from db.auth import register_user
+    from db.money import to_micros
+
+    suffix = str(time.perf_counter_ns())
+    _, user, _ = register_user(f"bench{suffix}", f"bench{suffix}@example.com", 'bench-password')
+    db.update_user_balance(user['id'], to_micros(balance))
+    return user['id'], {'Authorization': f"Bearer {user['token']}"}
+
+
+def api_client():
+    """
+    Build a Flask test client with a registered, well-funded user
+
+    Returns:
+        (app module, test client, auth headers, user_id)
+    """
+    logging.disable(logging.WARNING)
+
+    import bettit_api
+
+    user_id, headers = register_bench_user()
+    return bettit_api, bettit_api.app.test_client(), headers, user_id
+
+
+def create_bench_market(user_id, question='Benchmark market?'):
+    """Create an open market for benchmarking and return its ID"""
+    from db import db
+
+    market = db.create_market(
+        question=question,
+        description='',
+        resolution_criteria='Benchmark',
+        resolution_date='2099-01-01T00:00:00',
+        created_by=user_id
+    )
+    return market['id']
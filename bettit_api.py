@@ -5,8 +5,12 @@ Handles markets, betting, authentication, and social features
 """
 
 from flask import Flask, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import copy
+import math
 import os
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
@@ -19,31 +23,47 @@ import re
 from collections import Counter
 from openai import OpenAI
 
+# Load environment variables (before db, which picks its backend from them)
+load_dotenv()
+
 # Import our modules
 from db.db import (
-    init_pool, health_check,
-    get_market_by_id, list_markets, create_market, update_market_odds,
-    resolve_market, settle_bets_for_market,
-    create_bet, get_user_bets_on_market, get_user_active_bets,
-    get_user_by_id, update_user_balance, increment_user_total_bets,
+    init_pool, health_check, write_transaction,
+    get_market_by_id, list_markets, market_cursor, market_status, create_market, update_market_odds,
+    update_market_outcome_shares, is_categorical, resolve_markets,
+    create_bet, get_user_bets_on_market, get_user_active_bets, get_user_position, get_user_positions,
+    get_user_by_id, adjust_user_balance, increment_user_total_bets,
     create_transaction, get_user_transactions,
-    get_leaderboard
+    get_leaderboard, get_user_rank
 )
 from db.auth import (
-    register_user, login_user, validate_token,
-    require_auth, get_current_user
+    register_user, login_user, logout_user, validate_token,
+    require_auth, get_current_user, get_current_token
 )
-from db.market_maker import MarketMaker, restore_market
-
-# Load environment variables
-load_dotenv()
+from db.exposure import exposure
+from db.locks import locks
+from db.market_maker import market_makers
+from db.money import format_dollars, to_dollars, to_micros
+from db.order_batcher import OrderBatcher
+from db.passwords import HasherBusy
+from db.records import Bet, Market, Record, Transaction, User, UserView
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class RecordJSONProvider(DefaultJSONProvider):
+    """JSON provider that turns store records into dicts, with money in dollars, as they are serialized"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (Record, UserView)):
+            return o.to_json()
+        return DefaultJSONProvider.default(o)
+
 # Initialize Flask app - serve static files from current directory
 app = Flask(__name__, static_folder='.', static_url_path='')
+app.json = RecordJSONProvider(app)
 CORS(app)  # Enable CORS for browser requests
 
 # Initialize database pool immediately
@@ -68,6 +88,28 @@ except Exception as e:
     logger.warning(f"⚠️ OpenAI client initialization failed: {e}")
     openai_client = None
 
+# ========== MARKET MAKER ==========
+# Share solver used by the LMSR market maker ('closed_form' or 'bisection')
+LMSR_SOLVER = os.getenv('LMSR_SOLVER', 'closed_form')
+market_makers.solver = LMSR_SOLVER
+
+# Default bet amounts for /api/markets/<id>/quote-ladder, and the cap per request
+QUOTE_LADDER_AMOUNTS = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+MAX_QUOTE_LADDER_SIZE = 200
+
+# Most outcomes a categorical market may have
+MAX_MARKET_OUTCOMES = 100
+
+# Most markets /api/admin/markets/resolve settles per request
+MAX_BULK_RESOLUTIONS = int(os.getenv('MAX_BULK_RESOLUTIONS', '10000'))
+
+# Slack in micro-shares allowed when a sell asks for slightly more shares
+# than are held (rounding); the sale is clamped to the position
+SELL_SHARE_TOLERANCE = 1
+
+# Window in which /api/bets/place coalesces bets per market (0 = no batching)
+ORDER_BATCH_WINDOW_MS = float(os.getenv('ORDER_BATCH_WINDOW_MS', '0'))
+
 
 # ========== MODAL ANALYZER ==========
 class ModalAnalyzer:
@@ -372,10 +414,12 @@ def auth_register():
 
         return jsonify({
             'success': True,
-            'user': user_data,
+            'user': User.json_copy(user_data),
             'message': 'Registration successful'
         }), 201
 
+    except HasherBusy:
+        return jsonify({'error': 'Server busy, try again shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Registration error: {e}")
         return jsonify({'error': 'Registration failed'}), 500
@@ -398,10 +442,12 @@ def auth_login():
 
         return jsonify({
             'success': True,
-            'user': user_data,
+            'user': User.json_copy(user_data),
             'message': 'Login successful'
         }), 200
 
+    except HasherBusy:
+        return jsonify({'error': 'Server busy, try again shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({'error': 'Login failed'}), 500
@@ -423,13 +469,32 @@ def auth_validate():
 
         return jsonify({
             'valid': True,
-            'user': user_data
+            'user': User.json_copy(user_data)
         }), 200
 
     except Exception as e:
         logger.error(f"Validation error: {e}")
         return jsonify({'error': 'Validation failed', 'valid': False}), 500
 
+@app.route('/api/auth/logout', methods=['POST'])
+@require_auth
+def auth_logout():
+    """Revoke the token this request authenticated with"""
+    try:
+        success, error = logout_user(get_current_token())
+
+        if not success:
+            return jsonify({'error': error}), 401
+
+        return jsonify({
+            'success': True,
+            'message': 'Logout successful'
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Logout error: {e}")
+        return jsonify({'error': 'Logout failed'}), 500
+
 @app.route('/api/auth/me', methods=['GET'])
 @require_auth
 def auth_me():
@@ -442,9 +507,9 @@ def auth_me():
                 'username': user['username'],
                 'email': user['email'],
                 'display_name': user['display_name'],
-                'balance': float(user['balance']),
+                'balance': to_dollars(user['balance']),
                 'total_bets': user['total_bets'],
-                'total_winnings': float(user['total_winnings']),
+                'total_winnings': to_dollars(user['total_winnings']),
                 'win_rate': float(user['win_rate']),
                 'is_creator': user['is_creator']
             }
@@ -463,12 +528,19 @@ def get_markets():
         community = request.args.get('community')
         limit = int(request.args.get('limit', 50))
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+
+        try:
+            markets = list_markets(status, community, limit, offset, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        markets = list_markets(status, community, limit, offset)
+        # Only a full page can have another page after it
+        next_cursor = market_cursor(markets[-1]['id']) if markets and len(markets) == limit else None
 
-        # Convert timestamps and decimals to JSON-serializable types
+        # Convert timestamps and money to JSON-serializable types
+        markets = [Market.json_copy(market) for market in markets]
         for market in markets:
-            market['total_pool'] = float(market['total_pool'])
             # Handle datetime objects
             if market.get('created_at'):
                 market['created_at'] = market['created_at'].isoformat() if hasattr(market['created_at'], 'isoformat') else market['created_at']
@@ -477,7 +549,8 @@ def get_markets():
 
         return jsonify({
             'markets': markets,
-            'count': len(markets)
+            'count': len(markets),
+            'next_cursor': next_cursor
         }), 200
 
     except Exception as e:
@@ -494,7 +567,7 @@ def get_market(market_id):
             return jsonify({'error': 'Market not found'}), 404
 
         # Convert to JSON-serializable
-        market['total_pool'] = float(market['total_pool'])
+        market = Market.json_copy(market)
         if market.get('created_at'):
             market['created_at'] = market['created_at'].isoformat() if hasattr(market['created_at'], 'isoformat') else market['created_at']
         if market.get('resolution_date'):
@@ -506,6 +579,61 @@ def get_market(market_id):
         logger.error(f"Get market error: {e}")
         return jsonify({'error': 'Failed to get market'}), 500
 
+@app.route('/api/markets/<market_id>/quote-ladder', methods=['GET'])
+def get_quote_ladder(market_id):
+    """
+    Quote a ladder of bet amounts for every outcome in one request
+
+    Query params:
+        amounts: comma-separated bet amounts (default QUOTE_LADDER_AMOUNTS)
+    """
+    try:
+        raw_amounts = request.args.get('amounts')
+        if raw_amounts:
+            # Count before converting, so an oversized ladder is never parsed
+            amounts = [a for a in raw_amounts.split(',') if a.strip()]
+            if not amounts or len(amounts) > MAX_QUOTE_LADDER_SIZE:
+                return jsonify({'error': f'Between 1 and {MAX_QUOTE_LADDER_SIZE} amounts required'}), 400
+            try:
+                amounts = [float(a) for a in amounts]
+            except ValueError:
+                return jsonify({'error': 'Amounts must be numbers'}), 400
+        else:
+            amounts = QUOTE_LADDER_AMOUNTS
+
+        if not all(math.isfinite(a) and a > 0 for a in amounts):
+            return jsonify({'error': 'Amounts must be positive finite numbers'}), 400
+
+        market = get_market_by_id(market_id)
+        if not market:
+            return jsonify({'error': 'Market not found'}), 404
+
+        if market_status(market) != 'open':
+            return jsonify({'error': 'Market is not open for betting'}), 400
+
+        mm = market_makers.get(market)
+
+        quotes = mm.quote_batch(amounts)
+
+        # Binary quotes carry both post-trade odds; k-outcome quotes carry the
+        # post-trade price of the bought outcome only
+        return jsonify({
+            'market_id': market_id,
+            'amounts': amounts,
+            'current_odds': mm.get_odds(),
+            'quotes': {
+                outcome: {
+                    key: {k: v.tolist() for k, v in value.items()} if key == 'new_odds' else value.tolist()
+                    for key, value in q.items()
+                }
+                for outcome, q in quotes.items()
+            }
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Quote ladder error: {e}")
+        return jsonify({'error': 'Failed to quote ladder'}), 500
+
 # ========== AI BETTING CONDITION GENERATION ==========
 
 def generate_ai_betting_condition(content: dict, content_type: str = 'reddit') -> dict:
@@ -750,11 +878,19 @@ def create_new_market():
         image_url = data.get('image_url')
         market_type = data.get('market_type', 'article_prediction')
         source_metadata = data.get('source_metadata', {})
+        outcomes = data.get('outcomes')  # optional list of labels for k-outcome markets
 
         # Validate required fields
         if not all([question, resolution_criteria]):
             return jsonify({'error': 'Question and resolution criteria required'}), 400
 
+        if outcomes is not None:
+            if (not isinstance(outcomes, list)
+                    or not 2 <= len(outcomes) <= MAX_MARKET_OUTCOMES
+                    or not all(isinstance(o, str) and o.strip() for o in outcomes)
+                    or len(set(outcomes)) != len(outcomes)):
+                return jsonify({'error': f'Outcomes must be 2 to {MAX_MARKET_OUTCOMES} unique labels'}), 400
+
         # Calculate resolution date
         resolution_date = datetime.utcnow() + timedelta(hours=resolution_hours)
 
@@ -770,16 +906,17 @@ def create_new_market():
             community=community,
             image_url=image_url,
             market_type=market_type,
-            source_metadata=source_metadata
+            source_metadata=source_metadata,
+            outcomes=outcomes
         )
 
         if not market:
             return jsonify({'error': 'Failed to create market'}), 500
 
         # Convert timestamps
+        market = Market.json_copy(market)
         market['created_at'] = market['created_at'].isoformat() if market.get('created_at') else None
         market['resolution_date'] = market['resolution_date'].isoformat() if market.get('resolution_date') else None
-        market['total_pool'] = float(market['total_pool'])
 
         return jsonify({
             'success': True,
@@ -831,9 +968,9 @@ def create_reddit_market():
             return jsonify({'error': 'Failed to create market'}), 500
 
         # Convert timestamps
+        market = Market.json_copy(market)
         market['created_at'] = market['created_at'].isoformat() if market.get('created_at') else None
         market['resolution_date'] = market['resolution_date'].isoformat() if market.get('resolution_date') else None
-        market['total_pool'] = float(market['total_pool'])
 
         return jsonify({
             'success': True,
@@ -855,30 +992,32 @@ def create_reddit_market():
 def simulate_bet():
     """Simulate a bet to preview odds and payout (no state change)"""
     try:
-        data = request.json
+        data = request.json or {}
         market_id = data.get('market_id')
-        outcome = data.get('outcome')  # 'YES' or 'NO'
-        amount = float(data.get('amount'))
+        outcome = data.get('outcome')  # 'YES'/'NO', or a label of a k-outcome market
+        raw_amount = data.get('amount')
 
-        if not all([market_id, outcome, amount]):
+        if not market_id or not outcome or raw_amount is None:
             return jsonify({'error': 'Missing required fields'}), 400
 
-        if amount <= 0:
-            return jsonify({'error': 'Amount must be positive'}), 400
+        try:
+            amount = to_dollars(_positive_micros(raw_amount))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Amount must be a positive finite number'}), 400
 
         # Get market
         market = get_market_by_id(market_id)
         if not market:
             return jsonify({'error': 'Market not found'}), 404
 
-        if market['status'] != 'open':
+        if market_status(market) != 'open':
             return jsonify({'error': 'Market is not open for betting'}), 400
 
-        # Restore market maker state
-        mm = restore_market(
-            float(market['total_yes_shares']),
-            float(market['total_no_shares'])
-        )
+        if outcome not in market['outcomes']:
+            return jsonify({'error': f"Outcome must be one of: {', '.join(market['outcomes'])}"}), 400
+
+        # Live market maker for this market
+        mm = market_makers.get(market)
 
         # Simulate bet
         result = mm.simulate_bet(outcome, amount)
@@ -892,102 +1031,318 @@ def simulate_bet():
         logger.error(f"Simulate bet error: {e}")
         return jsonify({'error': 'Simulation failed'}), 500
 
+def _fill_buy(mm, market, order):
+    """
+    Fill one buy order against a scratch market maker
+
+    Returns:
+        ((response_body, status_code), Bet record or None if not filled)
+    """
+    user_id, outcome, amount = order['user_id'], order['outcome'], order['amount']
+
+    # Check user balance
+    user = get_user_by_id(user_id)
+    if user['balance'] < amount:
+        return ({'error': 'Insufficient balance'}, 400), None
+
+    # The maker prices in dollars; everything stored is micro-units
+    bet_result = mm.execute_bet(outcome, to_dollars(amount))
+    shares = to_micros(bet_result['shares'])
+
+    # Create bet record
+    bet = create_bet(
+        user_id=user_id,
+        market_id=market['id'],
+        outcome=outcome,
+        amount=amount,
+        shares=shares,
+        odds=bet_result['effective_price'],
+        potential_payout=shares  # each share pays $1 if it wins
+    )
+
+    # Update user balance
+    new_balance = adjust_user_balance(user_id, -amount)
+    increment_user_total_bets(user_id)
+
+    # Create transaction
+    create_transaction(
+        user_id=user_id,
+        tx_type='bet_placed',
+        amount=-amount,
+        balance_after=new_balance,
+        market_id=market['id'],
+        bet_id=bet['id'],
+        description=f"Bet {format_dollars(amount)} on {outcome}"
+    )
+
+    return ({
+        'success': True,
+        'bet': {**Bet.json_copy(bet), 'created_at': bet['created_at'].isoformat()},
+        'new_balance': to_dollars(new_balance),
+        'new_odds': bet_result['new_odds'],
+        'message': f"Bet placed: {format_dollars(amount)} on {outcome}"
+    }, 201), bet
+
+def _fill_sell(mm, market, order):
+    """
+    Fill one sell order against a scratch market maker
+
+    Returns:
+        ((response_body, status_code), Bet record or None if not filled)
+    """
+    user_id, outcome, shares = order['user_id'], order['outcome'], order['shares']
+
+    # Check the position covers the sale
+    position = get_user_position(user_id, market['id'])
+    held = position['shares'].get(outcome, 0) if position else 0
+    shares_to_sell = min(shares, held)
+    # Within tolerance of a position that is not there clamps to nothing
+    if shares > held + SELL_SHARE_TOLERANCE or shares_to_sell <= 0:
+        return ({'error': 'Insufficient shares', 'shares_held': to_dollars(held)}, 400), None
+    shares = shares_to_sell
+
+    sale = mm.execute_sell(outcome, to_dollars(shares))
+    proceeds = to_micros(sale['proceeds'])
+
+    # Record the sale as a negative bet so settlement nets it out
+    bet = create_bet(
+        user_id=user_id,
+        market_id=market['id'],
+        outcome=outcome,
+        amount=-proceeds,
+        shares=-shares,
+        odds=sale['effective_price'],
+        potential_payout=-shares,
+        side='sell'
+    )
+
+    # Credit proceeds
+    new_balance = adjust_user_balance(user_id, proceeds)
+
+    message = f"Sold {to_dollars(shares):.2f} {outcome} shares for {format_dollars(proceeds)}"
+    create_transaction(
+        user_id=user_id,
+        tx_type='bet_sold',
+        amount=proceeds,
+        balance_after=new_balance,
+        market_id=market['id'],
+        bet_id=bet['id'],
+        description=message
+    )
+
+    return ({
+        'success': True,
+        'sale': {**Bet.json_copy(bet), 'created_at': bet['created_at'].isoformat()},
+        'proceeds': to_dollars(proceeds),
+        'new_balance': to_dollars(new_balance),
+        'new_odds': sale['new_odds'],
+        'message': message
+    }, 201), bet
+
+def execute_bet_orders(market_id, orders):
+    """
+    Fill a sequence of buy and sell orders on one market, in order
+
+    Every order is priced against one scratch copy of the market's live
+    maker and gets its own bet, balance update and transaction; the market
+    record is written once at the end. The whole sequence runs holding the
+    market's lock and the lock of every user placing an order, so
+    concurrent orders neither price off stale odds nor overdraw a balance.
+    Those locks only reach this process; the write transaction around the
+    sequence shuts out other processes sharing a SQLite file, and the
+    market, balances and positions are read inside it.
+
+    Args:
+        market_id: Market ID
+        orders: list of dicts with 'user_id' and 'outcome', plus 'amount'
+            for buys or 'side': 'sell' and 'shares' for sells, both in
+            micro-units
+
+    Returns:
+        list of (response_body, status_code), one per order
+    """
+    with locks.hold(market_ids=[market_id], user_ids=[order['user_id'] for order in orders]), write_transaction():
+        return _execute_bet_orders(market_id, orders)
+
+def _execute_bet_orders(market_id, orders):
+    market = get_market_by_id(market_id)
+    if not market:
+        return [({'error': 'Market not found'}, 404)] * len(orders)
+
+    if market_status(market) != 'open':
+        return [({'error': 'Market is not open for betting'}, 400)] * len(orders)
+
+    # Price on a copy; update_market_odds syncs the live maker afterwards.
+    # The stored totals move by exactly the micro-units the bets record,
+    # from the totals just read, which nothing else can change before the
+    # transaction commits.
+    mm = copy.copy(market_makers.get(market))
+    pool = market['total_pool']
+    if is_categorical(market):
+        shares = list(market['outcome_shares'])
+    else:
+        shares = [market['total_yes_shares'], market['total_no_shares']]
+    filled = False
+    results = []
+
+    for order in orders:
+        if order['outcome'] not in market['outcomes']:
+            results.append(({'error': f"Outcome must be one of: {', '.join(market['outcomes'])}"}, 400))
+            continue
+
+        fill = _fill_sell if order.get('side') == 'sell' else _fill_buy
+        result, bet = fill(mm, market, order)
+        results.append(result)
+
+        if bet is not None:
+            pool += bet['amount']
+            shares[market['outcomes'].index(bet['outcome'])] += bet['shares']
+            filled = True
+
+    # Update market odds once for the whole sequence
+    if filled:
+        if is_categorical(market):
+            update_market_outcome_shares(market_id, mm.get_odds(), pool, shares)
+        else:
+            update_market_odds(market_id, mm.get_odds(), pool, *shares)
+
+    return results
+
+# Coalesces concurrent buys and sells per market when ORDER_BATCH_WINDOW_MS > 0
+order_batcher = OrderBatcher(execute_bet_orders, window=ORDER_BATCH_WINDOW_MS / 1000)
+
 @app.route('/api/bets/place', methods=['POST'])
 @require_auth
 def place_bet():
     """Place a bet on a market"""
     try:
         user = get_current_user()
-        data = request.json
+        data = request.json or {}
 
         market_id = data.get('market_id')
-        outcome = data.get('outcome')  # 'YES' or 'NO'
-        amount = float(data.get('amount'))
+        outcome = data.get('outcome')  # 'YES'/'NO', or a label of a k-outcome market
+        raw_amount = data.get('amount')
 
         # Validate inputs
-        if not all([market_id, outcome, amount]):
+        if not market_id or not outcome or raw_amount is None:
             return jsonify({'error': 'Missing required fields'}), 400
 
-        if amount <= 0:
-            return jsonify({'error': 'Amount must be positive'}), 400
+        try:
+            amount = _positive_micros(raw_amount)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Amount must be a positive finite number'}), 400
 
-        if outcome not in ['YES', 'NO']:
-            return jsonify({'error': 'Outcome must be YES or NO'}), 400
+        order = {'user_id': user['id'], 'outcome': outcome, 'amount': amount}
 
-        # Check user balance
-        if float(user['balance']) < amount:
-            return jsonify({'error': 'Insufficient balance'}), 400
+        if order_batcher.window > 0:
+            body, status = order_batcher.submit(market_id, order)
+        else:
+            body, status = execute_bet_orders(market_id, [order])[0]
+
+        return jsonify(body), status
+
+    except Exception as e:
+        logger.error(f"Place bet error: {e}")
+        return jsonify({'error': 'Failed to place bet'}), 500
+
+def _positive_micros(value):
+    """
+    Convert a request amount or share count to micro-units
+
+    Raises:
+        TypeError: if value is not a number (JSON booleans included)
+        ValueError: if it is not finite or comes to no more than zero micro-units
+    """
+    if isinstance(value, bool):
+        raise TypeError('Expected a number')
+    if not math.isfinite(float(value)):
+        raise ValueError('Expected a finite number')
+    micros = to_micros(value)
+    if micros <= 0:
+        raise ValueError('Expected a positive number')
+    return micros
+
+def _parse_sell_request(data):
+    """
+    Validate a sell request body
+
+    Returns:
+        (market_id, outcome, shares in micro-units, error_response)
+    """
+    data = data or {}
+    market_id = data.get('market_id')
+    outcome = data.get('outcome')
+    raw_shares = data.get('shares')
+
+    if not market_id or not outcome or raw_shares is None:
+        return None, None, None, (jsonify({'error': 'Missing required fields'}), 400)
+
+    try:
+        shares = _positive_micros(raw_shares)
+    except (TypeError, ValueError):
+        return None, None, None, (jsonify({'error': 'Shares must be a positive finite number'}), 400)
+
+    return market_id, outcome, shares, None
+
+@app.route('/api/bets/sell/simulate', methods=['POST'])
+@require_auth
+def simulate_sell():
+    """Preview the proceeds of selling held shares (no state change)"""
+    try:
+        user = get_current_user()
+        market_id, outcome, shares, error = _parse_sell_request(request.json)
+        if error:
+            return error
 
-        # Get market
         market = get_market_by_id(market_id)
         if not market:
             return jsonify({'error': 'Market not found'}), 404
 
-        if market['status'] != 'open':
+        if market_status(market) != 'open':
             return jsonify({'error': 'Market is not open for betting'}), 400
 
-        # Restore market maker and execute bet
-        mm = restore_market(
-            float(market['total_yes_shares']),
-            float(market['total_no_shares'])
-        )
+        if outcome not in market['outcomes']:
+            return jsonify({'error': f"Outcome must be one of: {', '.join(market['outcomes'])}"}), 400
 
-        bet_result = mm.execute_bet(outcome, amount)
-
-        # Create bet record
-        bet = create_bet(
-            user_id=user['id'],
-            market_id=market_id,
-            outcome=outcome,
-            amount=amount,
-            shares=bet_result['shares'],
-            odds=bet_result['effective_price'],
-            potential_payout=bet_result['potential_payout']
-        )
+        position = get_user_position(user['id'], market_id)
+        held = position['shares'].get(outcome, 0) if position else 0
+        shares_to_sell = min(shares, held)
+        if shares > held + SELL_SHARE_TOLERANCE or shares_to_sell <= 0:
+            return jsonify({'error': 'Insufficient shares', 'shares_held': to_dollars(held)}), 400
 
-        if not bet:
-            return jsonify({'error': 'Failed to create bet'}), 500
-
-        # Update market odds
-        new_pool = float(market['total_pool']) + amount
-        update_market_odds(
-            market_id,
-            bet_result['new_odds'],
-            new_pool,
-            bet_result['yes_shares'],
-            bet_result['no_shares']
-        )
-
-        # Update user balance
-        new_balance = float(user['balance']) - amount
-        update_user_balance(user['id'], new_balance)
-        increment_user_total_bets(user['id'])
-
-        # Create transaction
-        create_transaction(
-            user_id=user['id'],
-            tx_type='bet_placed',
-            amount=-amount,
-            balance_after=new_balance,
-            market_id=market_id,
-            bet_id=bet['id'],
-            description=f"Bet ${amount} on {outcome}"
-        )
-
-        # Convert timestamps
-        bet['created_at'] = bet['created_at'].isoformat() if bet.get('created_at') else None
+        result = market_makers.get(market).simulate_sell(outcome, to_dollars(shares_to_sell))
 
         return jsonify({
             'success': True,
-            'bet': bet,
-            'new_balance': new_balance,
-            'new_odds': bet_result['new_odds'],
-            'message': f"Bet placed: ${amount} on {outcome}"
-        }), 201
+            'simulation': result
+        }), 200
 
     except Exception as e:
-        logger.error(f"Place bet error: {e}")
-        return jsonify({'error': 'Failed to place bet'}), 500
+        logger.error(f"Simulate sell error: {e}")
+        return jsonify({'error': 'Simulation failed'}), 500
+
+@app.route('/api/bets/sell', methods=['POST'])
+@require_auth
+def sell_bet():
+    """Sell held shares back to the market maker before resolution"""
+    try:
+        user = get_current_user()
+        market_id, outcome, shares, error = _parse_sell_request(request.json)
+        if error:
+            return error
+
+        order = {'user_id': user['id'], 'outcome': outcome, 'shares': shares, 'side': 'sell'}
+
+        if order_batcher.window > 0:
+            body, status = order_batcher.submit(market_id, order)
+        else:
+            body, status = execute_bet_orders(market_id, [order])[0]
+
+        return jsonify(body), status
+
+    except Exception as e:
+        logger.error(f"Sell bet error: {e}")
+        return jsonify({'error': 'Failed to sell shares'}), 500
 
 @app.route('/api/bets/my-bets', methods=['GET'])
 @require_auth
@@ -997,13 +1352,10 @@ def get_my_bets():
         user = get_current_user()
         limit = int(request.args.get('limit', 50))
 
-        bets = get_user_active_bets(user['id'], limit)
+        bets = [Bet.json_copy(bet) for bet in get_user_active_bets(user['id'], limit)]
 
         # Convert to JSON-serializable
         for bet in bets:
-            bet['amount'] = float(bet['amount'])
-            bet['shares'] = float(bet['shares'])
-            bet['potential_payout'] = float(bet['potential_payout'])
             if bet.get('created_at'):
                 bet['created_at'] = bet['created_at'].isoformat() if hasattr(bet['created_at'], 'isoformat') else bet['created_at']
             if bet.get('resolution_date'):
@@ -1024,26 +1376,77 @@ def get_market_bets(market_id):
     """Get current user's bets on a specific market"""
     try:
         user = get_current_user()
-        bets = get_user_bets_on_market(user['id'], market_id)
+        # Copies, so converting below leaves the stored records intact
+        bets = [Bet.json_copy(b) for b in get_user_bets_on_market(user['id'], market_id)]
 
         # Convert to JSON-serializable
         for bet in bets:
-            bet['amount'] = float(bet['amount'])
-            bet['shares'] = float(bet['shares'])
-            bet['potential_payout'] = float(bet['potential_payout'])
             if bet.get('created_at'):
                 bet['created_at'] = bet['created_at'].isoformat() if hasattr(bet['created_at'], 'isoformat') else bet['created_at']
 
+        position = get_user_position(user['id'], market_id)
+
         return jsonify({
             'bets': bets,
             'count': len(bets),
-            'total_amount': sum(float(b['amount']) for b in bets)
+            'total_amount': to_dollars(position['cost_basis']) if position else 0.0,
+            'position': _position_json(position) if position else None
         }), 200
 
     except Exception as e:
         logger.error(f"Get market bets error: {e}")
         return jsonify({'error': 'Failed to get bets'}), 500
 
+def _position_json(position, market=None):
+    """JSON-serializable copy of a position, with its market's state if given"""
+    result = {
+        'market_id': position['market_id'],
+        'shares': {outcome: to_dollars(q) for outcome, q in position['shares'].items()},
+        'cost_basis': to_dollars(position['cost_basis']),
+        'realized_payout': to_dollars(position['realized_payout']),
+        'bet_count': position['bet_count']
+    }
+    if market:
+        result['question'] = market['question']
+        result['market_status'] = market['status']
+        result['market_outcome'] = market['outcome']
+    return result
+
+@app.route('/api/positions', methods=['GET'])
+@require_auth
+def get_my_positions():
+    """
+    Get current user's positions: net shares, cost basis and realized payout per market
+
+    Query params:
+        market_id: only this market's position
+        limit: maximum positions, most recently opened first (default 50)
+    """
+    try:
+        user = get_current_user()
+
+        market_id = request.args.get('market_id')
+        if market_id:
+            position = get_user_position(user['id'], market_id)
+            if not position:
+                return jsonify({'error': 'No position in this market'}), 404
+            return jsonify({'position': _position_json(position, get_market_by_id(market_id))}), 200
+
+        limit = int(request.args.get('limit', 50))
+        positions = [
+            _position_json(position, get_market_by_id(position['market_id']))
+            for position in get_user_positions(user['id'], limit)
+        ]
+
+        return jsonify({
+            'positions': positions,
+            'count': len(positions)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Get positions error: {e}")
+        return jsonify({'error': 'Failed to get positions'}), 500
+
 # ========== MARKET RESOLUTION (ADMIN) ==========
 
 @app.route('/api/admin/markets/<market_id>/resolve', methods=['POST'])
@@ -1055,32 +1458,123 @@ def resolve_market_admin(market_id):
         user = get_current_user()
 
         data = request.json
-        outcome = data.get('outcome')  # 'YES' or 'NO'
-
-        if outcome not in ['YES', 'NO']:
-            return jsonify({'error': 'Outcome must be YES or NO'}), 400
+        outcome = data.get('outcome')  # 'YES'/'NO', or a label of a k-outcome market
 
-        # Resolve market
-        success = resolve_market(market_id, outcome)
-        if not success:
-            return jsonify({'error': 'Failed to resolve market'}), 500
+        market = get_market_by_id(market_id)
+        if not market:
+            return jsonify({'error': 'Market not found'}), 404
 
-        # Settle all bets
-        settled_count = settle_bets_for_market(market_id, outcome)
+        if outcome not in market['outcomes']:
+            return jsonify({'error': f"Outcome must be one of: {', '.join(market['outcomes'])}"}), 400
 
-        # TODO: Distribute winnings and update user balances
-        # This requires a separate function to process all winning bets
+        # Resolve the market, settle its bets and pay out winners
+        result = resolve_markets([(market_id, outcome)])
+        if not result['resolved']:
+            return jsonify({'error': 'Market is already resolved'}), 400
 
         return jsonify({
             'success': True,
             'message': f'Market resolved: {outcome} wins',
-            'bets_settled': settled_count
+            'bets_settled': result['bets_settled'].get(market_id, 0)
         }), 200
 
     except Exception as e:
         logger.error(f"Resolve market error: {e}")
         return jsonify({'error': 'Failed to resolve market'}), 500
 
+@app.route('/api/admin/markets/resolve', methods=['POST'])
+@require_auth
+def resolve_markets_admin():
+    """
+    Resolve many markets and settle all their bets at once (admin only for POC)
+
+    Body:
+        resolutions: list of {"market_id": ..., "outcome": ...}
+    """
+    try:
+        # TODO: Add admin check
+        data = request.json or {}
+        items = data.get('resolutions')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'resolutions must be a non-empty list'}), 400
+        if len(items) > MAX_BULK_RESOLUTIONS:
+            return jsonify({'error': f'At most {MAX_BULK_RESOLUTIONS} resolutions per request'}), 400
+
+        resolutions, errors, seen = [], [], set()
+        for item in items:
+            market_id = item.get('market_id') if isinstance(item, dict) else None
+            outcome = item.get('outcome') if isinstance(item, dict) else None
+            market = get_market_by_id(market_id) if market_id else None
+            if not market:
+                errors.append({'market_id': market_id, 'error': 'Market not found'})
+            elif market_id in seen:
+                errors.append({'market_id': market_id, 'error': 'Market appears more than once'})
+            elif outcome not in market['outcomes']:
+                errors.append({'market_id': market_id, 'error': f"Outcome must be one of: {', '.join(market['outcomes'])}"})
+            elif market['status'] == 'resolved':
+                errors.append({'market_id': market_id, 'error': 'Market is already resolved'})
+            else:
+                seen.add(market_id)
+                resolutions.append((market_id, outcome))
+        if errors:
+            return jsonify({'error': 'Invalid resolutions', 'errors': errors}), 400
+
+        start = time.perf_counter()
+        result = resolve_markets(resolutions)
+        elapsed = time.perf_counter() - start
+
+        bets_settled = sum(result['bets_settled'].values())
+        transactions = result['transactions']
+        bets_per_sec = bets_settled / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Resolved {len(result['resolved'])} markets, settled {bets_settled} bets "
+                    f"in {elapsed * 1000:.1f} ms ({bets_per_sec:,.0f} bets/sec)")
+
+        return jsonify({
+            'success': True,
+            'markets': [
+                {'market_id': market_id, 'outcome': outcome,
+                 'bets_settled': result['bets_settled'].get(market_id, 0)}
+                for market_id, outcome in result['resolved']
+            ],
+            'markets_resolved': len(result['resolved']),
+            'bets_settled': bets_settled,
+            'users_paid': len({t['user_id'] for t in transactions}),
+            'payout_transactions': len(transactions),
+            'total_paid': to_dollars(sum(t['amount'] for t in transactions)),
+            'elapsed_ms': elapsed * 1000,
+            'bets_per_sec': bets_per_sec
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Bulk resolve error: {e}")
+        return jsonify({'error': 'Failed to resolve markets'}), 500
+
+@app.route('/api/admin/exposure', methods=['GET'])
+@require_auth
+def get_exposure_admin():
+    """
+    Get the house's worst-case loss across open markets (admin only for POC)
+
+    Query params:
+        market_id: optionally include one market's exposure entry
+    """
+    try:
+        # TODO: Add admin check
+        result = {'exposure': exposure.summary()}
+
+        market_id = request.args.get('market_id')
+        if market_id:
+            entry = exposure.market(market_id)
+            if not entry:
+                return jsonify({'error': 'Market not found'}), 404
+            result['market'] = entry
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        logger.error(f"Exposure error: {e}")
+        return jsonify({'error': 'Failed to get exposure'}), 500
+
 # ========== LEADERBOARD & SOCIAL ==========
 
 @app.route('/api/leaderboard', methods=['GET'])
@@ -1092,10 +1586,9 @@ def get_leaderboard_route():
 
         users = get_leaderboard(community, limit)
 
-        # Convert to JSON-serializable
+        # Convert to JSON-serializable copies, leaving credentials out
+        users = [User.json_copy(UserView(user)) for user in users]
         for user in users:
-            user['balance'] = float(user['balance'])
-            user['total_winnings'] = float(user['total_winnings'])
             user['win_rate'] = float(user['win_rate'])
 
         return jsonify({
@@ -1107,6 +1600,34 @@ def get_leaderboard_route():
         logger.error(f"Leaderboard error: {e}")
         return jsonify({'error': 'Failed to get leaderboard'}), 500
 
+@app.route('/api/leaderboard/rank/<user_id>', methods=['GET'])
+def get_leaderboard_rank(user_id):
+    """
+    Get a user's leaderboard position
+
+    Query params:
+        community: rank within this community's board (default global)
+    """
+    try:
+        user = get_user_by_id(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        community = request.args.get('community')
+        rank, total = get_user_rank(user_id, community)
+
+        return jsonify({
+            'user_id': user_id,
+            'community': community,
+            'rank': rank,
+            'total': total,
+            'balance': to_dollars(user['balance'])
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Leaderboard rank error: {e}")
+        return jsonify({'error': 'Failed to get leaderboard rank'}), 500
+
 @app.route('/api/users/<user_id>', methods=['GET'])
 def get_user_profile(user_id):
     """Get public user profile"""
@@ -1124,9 +1645,9 @@ def get_user_profile(user_id):
                 'display_name': user['display_name'],
                 'avatar_url': user['avatar_url'],
                 'bio': user['bio'],
-                'balance': float(user['balance']),
+                'balance': to_dollars(user['balance']),
                 'total_bets': user['total_bets'],
-                'total_winnings': float(user['total_winnings']),
+                'total_winnings': to_dollars(user['total_winnings']),
                 'win_rate': float(user['win_rate']),
                 'is_creator': user['is_creator'],
                 'creator_bio': user['creator_bio']
@@ -1147,12 +1668,11 @@ def get_my_transactions():
         user = get_current_user()
         limit = int(request.args.get('limit', 50))
 
-        transactions = get_user_transactions(user['id'], limit)
+        # Copies, so converting below leaves the stored records intact
+        transactions = [Transaction.json_copy(tx) for tx in get_user_transactions(user['id'], limit)]
 
         # Convert to JSON-serializable
         for tx in transactions:
-            tx['amount'] = float(tx['amount'])
-            tx['balance_after'] = float(tx['balance_after'])
             tx['created_at'] = tx['created_at'].isoformat() if tx.get('created_at') else None
 
         return jsonify({
@@ -1441,6 +1961,7 @@ if __name__ == '__main__':
 ║  Endpoints:                                               ║
 ║    POST /api/auth/register                                ║
 ║    POST /api/auth/login                                   ║
+║    POST /api/auth/logout                                  ║
 ║    GET  /api/markets                                      ║
 ║    POST /api/markets                                      ║
 ║    POST /api/bets/place                                   ║
@@ -1,43 +1,130 @@
 """
 Authentication module for Bettit API
+
+Tokens come in two kinds. By default they are random strings remembered in
+the process's token store (see tokens.py). With BETTIT_TOKEN_MODE=signed
+they are HMAC-signed and carry the user ID and expiry themselves, so any
+worker holding BETTIT_TOKEN_SECRET verifies them without a lookup; logout
+adds the token's ID to a small revocation set that lasts until it expires.
 """
+import base64
+import hmac
+import json
+import logging
+import os
+import time
 import uuid
 import hashlib
 import secrets
 from functools import wraps
 from flask import request, jsonify, g
 from datetime import datetime, timedelta
-from decimal import Decimal
 from . import db
+from .money import to_micros
+from .passwords import HasherBusy, hasher
+from .records import UserView
+from .tokens import TOKEN_TTL
+
+logger = logging.getLogger(__name__)
 
-# In-memory token storage
-_tokens = {}  # token -> user_id
+# 'signed' issues self-contained signed tokens; 'store' keeps random ones
+SIGNED_TOKENS = os.getenv('BETTIT_TOKEN_MODE', 'store') == 'signed'
+# Key tokens are signed with; every worker must share it
+TOKEN_SECRET = os.getenv('BETTIT_TOKEN_SECRET', '').encode()
+if not TOKEN_SECRET:
+    TOKEN_SECRET = secrets.token_bytes(32)
+    if SIGNED_TOKENS:
+        logger.warning("BETTIT_TOKEN_SECRET is not set; signed tokens only verify in this process")
 
 def hash_password(password):
-    """Hash a password"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """
+    Hash a password into a salted, versioned record (see passwords.py)
+
+    Raises:
+        HasherBusy: if the hashing pool is saturated
+    """
+    return hasher.hash(password)
 
-def generate_token():
-    """Generate a secure random token"""
+def generate_token(user_id=None):
+    """
+    Generate an auth token
+
+    Args:
+        user_id: User the token is for; in signed mode the token is then
+            signed and carries the user and its expiry
+
+    Returns:
+        A signed token, or a secure random one that only authenticates
+        once saved with db.save_token
+    """
+    if SIGNED_TOKENS and user_id is not None:
+        return sign_token(user_id)
     return secrets.token_urlsafe(32)
 
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def _signature(payload):
+    return _b64encode(hmac.new(TOKEN_SECRET, payload.encode(), hashlib.sha256).digest())
+
+def sign_token(user_id, expires_at=None):
+    """
+    Issue a signed token
+
+    Args:
+        user_id: User the token authenticates
+        expires_at: Epoch seconds it expires at (default: now + TOKEN_TTL)
+
+    Returns:
+        '<payload>.<signature>', both URL-safe base64
+    """
+    expires_at = int(time.time() + TOKEN_TTL if expires_at is None else expires_at)
+    claims = [user_id, expires_at, secrets.token_urlsafe(12)]  # the last is the token ID
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{payload}.{_signature(payload)}"
+
+def is_signed_token(token):
+    """True for signed tokens (random ones never contain a '.')"""
+    return '.' in token
+
+def read_signed_token(token):
+    """
+    Check a signed token's signature and expiry
+
+    Returns:
+        (user_id, expires_at, token_id), or None if the token is forged,
+        malformed or expired
+    """
+    payload, _, signature = token.partition('.')
+    if not hmac.compare_digest(signature.encode(), _signature(payload).encode()):
+        return None
+    try:
+        user_id, expires_at, token_id = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if expires_at <= time.time():
+        return None
+    return user_id, expires_at, token_id
+
 def register_user(username, email, password, display_name=None):
     """
     Register a new user
 
     Returns:
         (success, user_data, error_message)
+
+    Raises:
+        HasherBusy: if the hashing pool is saturated
     """
     # Check if user exists
-    for user in db._users.values():
-        if user['email'] == email:
-            return False, None, 'Email already registered'
-        if user['username'] == username:
-            return False, None, 'Username already taken'
+    if db.get_user_by_email(email):
+        return False, None, 'Email already registered'
+    if db.get_user_by_username(username):
+        return False, None, 'Username already taken'
 
     # Create user
     user_id = str(uuid.uuid4())
-    token = generate_token()
+    token = generate_token(user_id)
 
     user_data = {
         'id': user_id,
@@ -47,18 +134,23 @@ def register_user(username, email, password, display_name=None):
         'display_name': display_name or username,
         'avatar_url': None,
         'bio': '',
-        'balance': Decimal('1000'),  # Starting balance
+        'balance': to_micros(1000),  # Starting balance
         'total_bets': 0,
-        'total_winnings': Decimal('0'),
-        'win_rate': Decimal('0'),
+        'total_winnings': 0,
+        'win_rate': 0.0,
         'is_creator': False,
         'creator_bio': None,
         'created_at': datetime.utcnow(),
         'token': token
     }
 
-    db.add_user(user_data)
-    _tokens[token] = user_id
+    try:
+        db.add_user(user_data)
+    except ValueError as e:
+        # Lost a race with a concurrent signup for the same email or username
+        return False, None, str(e)
+    if not SIGNED_TOKENS:
+        db.save_token(token, user_id)
 
     # Return user data without password hash
     return_data = {k: v for k, v in user_data.items() if k != 'password_hash'}
@@ -69,27 +161,37 @@ def login_user(email, password):
     """
     Login user with email and password
 
+    A password hash made with an older scheme or cost (including the
+    unsalted SHA-256 ones) is replaced with a current one on success. If
+    the hashing pool is too busy for that, the old hash stays and the
+    login still succeeds; a later login retries.
+
     Returns:
         (success, user_data, error_message)
+
+    Raises:
+        HasherBusy: if the hashing pool is saturated
     """
     # Find user by email
-    user = None
-    for u in db._users.values():
-        if u['email'] == email:
-            user = u
-            break
-
-    if not user:
+    user = db.get_user_by_email(email)
+    if not user or not user['password_hash']:
         return False, None, 'Invalid email or password'
 
     # Check password
-    if user['password_hash'] != hash_password(password):
+    matches, needs_rehash = hasher.verify(password, user['password_hash'])
+    if not matches:
         return False, None, 'Invalid email or password'
+    if needs_rehash:
+        try:
+            db.update_user_password_hash(user['id'], hasher.hash(password))
+        except HasherBusy:
+            logger.warning(f"Hashing pool busy; kept the old password hash of user {user['id']}")
 
     # Generate new token
-    token = generate_token()
+    token = generate_token(user['id'])
     user['token'] = token
-    _tokens[token] = user['id']
+    if not SIGNED_TOKENS:
+        db.save_token(token, user['id'])
 
     # Return user data without password hash
     return_data = {k: v for k, v in user.items() if k != 'password_hash'}
@@ -98,23 +200,43 @@ def login_user(email, password):
 
 def validate_token(token):
     """
-    Validate a JWT token
+    Validate a token of either kind
 
     Returns:
-        (valid, user_data, error_message)
+        (valid, user_view, error_message): user_view is a read-only
+        UserView over the stored user, without its credentials
     """
-    user_id = _tokens.get(token)
+    if is_signed_token(token):
+        claims = read_signed_token(token)
+        user_id = claims[0] if claims and not db.is_token_revoked(claims[2]) else None
+    else:
+        user_id = db.get_token_user(token)
     if not user_id:
         return False, None, 'Invalid token'
 
-    user = db._users.get(user_id)
+    user = db.get_user_by_id(user_id)
     if not user:
         return False, None, 'User not found'
 
-    # Return user data without password hash
-    return_data = {k: v for k, v in user.items() if k != 'password_hash'}
+    return True, UserView(user), None
 
-    return True, return_data, None
+def logout_user(token):
+    """
+    Stop a token from authenticating
+
+    Stored tokens are forgotten; signed ones are revoked until they expire.
+
+    Returns:
+        (success, error_message)
+    """
+    if is_signed_token(token):
+        claims = read_signed_token(token)
+        if claims is None:
+            return False, 'Invalid token'
+        db.revoke_token(claims[2], claims[1])
+    elif not db.delete_token(token):
+        return False, 'Invalid token'
+    return True, None
 
 def require_auth(f):
     """Decorator to require authentication"""
@@ -137,8 +259,9 @@ def require_auth(f):
         if not valid:
             return jsonify({'error': error}), 401
 
-        # Store user in Flask g object
+        # Store user and token in Flask g object
         g.current_user = user_data
+        g.current_token = token
 
         return f(*args, **kwargs)
 
@@ -147,3 +270,7 @@ def require_auth(f):
 def get_current_user():
     """Get the current authenticated user from Flask g"""
     return g.current_user
+
+def get_current_token():
+    """Get the token the current request authenticated with from Flask g"""
+    return g.current_token
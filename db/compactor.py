@@ -0,0 +1,13 @@
+"""
+Builds a snapshot of the in-memory store in a process of its own
+
+Started by db.snapshot() after it begins a new journal segment:
+
+    python -m db.compactor <journal directory> <first segment not covered>
+"""
+import sys
+
+from . import db
+
+if __name__ == '__main__':
+    db.build_snapshot(sys.argv[1], int(sys.argv[2]))
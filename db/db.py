@@ -1,9 +1,52 @@
 """
 In-memory database implementation for testing
+
+Markets, bets, users and transactions are held as the slotted records in
+records.py, which read like dicts but take a fraction of the memory. Every
+balance, amount, payout and share count is an int in micro-units (see
+money.py); the API converts to and from dollars at its edges.
+
+Set BETTIT_JOURNAL_DIR to journal every mutation and snapshot the store
+there, so a restart picks up where it left off. Set BETTIT_DB_BACKEND=sqlite
+to persist to SQLite instead; the functions in sqlite_db then replace the
+in-memory ones below.
 """
+import base64
+import gc
+import heapq
+import json
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
 import uuid
-from datetime import datetime
-from decimal import Decimal
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .exposure import exposure
+from .journal import Journal, gc_paused
+from .leaderboard import leaderboard
+from .ledger import ledger
+from .locks import locks
+from .market_maker import market_makers
+from .money import to_dollars
+from .records import Bet, Market, Position, Transaction, User
+from .scheduler import scheduler
+from .skiplist import IndexableSkipList
+from .tokens import tokens
+
+logger = logging.getLogger(__name__)
+
+# Outcome labels of a plain binary market
+BINARY_OUTCOMES = ['YES', 'NO']
+
+# Journal and snapshot location (empty: keep nothing across restarts)
+JOURNAL_DIR = os.getenv('BETTIT_JOURNAL_DIR', '')
+JOURNAL_FSYNC = os.getenv('BETTIT_JOURNAL_FSYNC', '0') == '1'
+SNAPSHOT_EVERY = int(os.getenv('BETTIT_SNAPSHOT_EVERY', '100000'))  # journal records
 
 # In-memory storage
 _pool_initialized = False
@@ -11,10 +54,45 @@ _markets = {}
 _users = {}
 _bets = {}
 _transactions = {}
+_positions = {}  # (user_id, market_id) -> Position
+
+# Secondary indexes; each list holds records in created_at (insertion) order
+_bets_by_user = {}          # user_id -> [bet]
+_bets_by_market = {}        # market_id -> [bet]
+_bets_by_user_market = {}   # (user_id, market_id) -> [bet]
+_transactions_by_user = {}  # user_id -> [transaction]
+_positions_by_user = {}     # user_id -> [position], first trade order
+_users_by_email = {}        # normalized email -> user (unique)
+_users_by_username = {}     # username -> user (unique)
+_revoked = {}               # revoked signed-token ID -> its expiry
+_revoked_expiry = []        # min-heap of (expiry, token ID) for pruning _revoked
+
+# Ordered market index: one skip list per (status, community) filter, with
+# None standing for "any", each sorted newest first by (-created_at, id)
+_market_index = {}       # (status, community) -> IndexableSkipList of sort keys
+_market_sort_keys = {}   # market_id -> sort key
+
+# Mutations apply and journal under one lock so the journal order matches
+# the store, and snapshots see a consistent store
+_store_lock = threading.RLock()
+_journal = None
+_snapshot_running = False
 
 def init_pool(minconn=2, maxconn=10):
-    """Initialize database connection pool"""
-    global _pool_initialized
+    """
+    Initialize database connection pool
+
+    With a journal directory configured, the first call also restores the
+    store from its latest snapshot plus the journal written since.
+    """
+    global _pool_initialized, _journal
+    if JOURNAL_DIR and _journal is None:
+        # Absolute, so the compactor process started from the package root finds it
+        _journal = Journal(os.path.abspath(JOURNAL_DIR), fsync=JOURNAL_FSYNC)
+        _restore()
+        _journal.open()
+    scheduler.start(close_markets)
+    tokens.start()
     _pool_initialized = True
     return True
 
@@ -22,152 +100,499 @@ def health_check():
     """Check database health"""
     return _pool_initialized
 
+@contextmanager
+def write_transaction():
+    """
+    Make the store calls in a block one unit against other writers
+
+    A no-op here: only this process writes the in-memory store, and callers
+    already hold the locks of what they change. The SQLite backend opens one
+    write transaction, which also shuts out other processes on the file.
+    """
+    yield
+
 # ========== MARKETS ==========
 
 def get_market_by_id(market_id):
     """Get a market by ID"""
     return _markets.get(market_id)
 
-def list_markets(status='open', community=None, limit=50, offset=0):
-    """List markets with filters"""
-    markets = list(_markets.values())
-
-    # Filter by status
-    if status:
-        markets = [m for m in markets if m['status'] == status]
-
-    # Filter by community
-    if community:
-        markets = [m for m in markets if m.get('community') == community]
-
-    # Sort by created_at descending
-    markets.sort(key=lambda m: m['created_at'], reverse=True)
-
-    # Apply pagination
-    return markets[offset:offset+limit]
+def is_categorical(market):
+    """True for k-outcome markets (share totals kept in 'outcome_shares')"""
+    return market.get('outcome_shares') is not None
+
+def _market_buckets(status, community):
+    """Index buckets a market with this status and community belongs to"""
+    return [(status, community), (status, None), (None, community), (None, None)]
+
+def _index_market(market):
+    """Add a market to every index bucket it matches"""
+    key = _market_sort_keys[market['id']]
+    for bucket in _market_buckets(market['status'], market.get('community')):
+        _market_index.setdefault(bucket, IndexableSkipList()).insert(key)
+
+def _unindex_market(market):
+    """Remove a market from the buckets for its current status"""
+    key = _market_sort_keys[market['id']]
+    for bucket in _market_buckets(market['status'], market.get('community')):
+        _market_index[bucket].remove(key)
+
+def market_cursor(market_id):
+    """Opaque pagination cursor pointing just past a market"""
+    neg_created, market_id = _market_sort_keys[market_id]
+    raw = json.dumps([neg_created, market_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_market_cursor(cursor):
+    """Sort key encoded in a cursor; raises ValueError if it is malformed"""
+    try:
+        neg_created, market_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (float(neg_created), str(market_id))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def list_markets(status='open', community=None, limit=50, offset=0, cursor=None):
+    """
+    List markets with filters, newest first
+
+    Reads the ordered index for the (status, community) filter, so a page
+    costs O(log n + limit) however deep it is.
+
+    Args:
+        status: Market status to match (None or '' for any)
+        community: Community to match (None or '' for any)
+        limit: Page size
+        offset: Markets to skip (ignored when cursor is given)
+        cursor: Cursor from market_cursor(); the page starts after it
+
+    Returns:
+        List of Market records
+    """
+    index = _market_index.get((status or None, community or None))
+    if index is None:
+        return []
+
+    if cursor:
+        keys = index.iter_after(_decode_market_cursor(cursor))
+    else:
+        keys = index.iter_from(offset)
+
+    markets = []
+    for _, market_id in keys:
+        if len(markets) >= limit:
+            break
+        markets.append(_markets[market_id])
+    return markets
 
 def create_market(question, description, resolution_criteria, resolution_date,
                  created_by, source_article_url=None, source_article_title=None,
                  community='general', image_url=None, market_type='article_prediction',
-                 source_metadata=None):
-    """Create a new market"""
-    market_id = str(uuid.uuid4())
+                 source_metadata=None, outcomes=None):
+    """
+    Create a new market
 
-    market = {
-        'id': market_id,
-        'question': question,
-        'description': description,
-        'resolution_criteria': resolution_criteria,
-        'resolution_date': datetime.fromisoformat(resolution_date.replace('Z', '+00:00')) if isinstance(resolution_date, str) else resolution_date,
-        'created_by': created_by,
-        'source_article_url': source_article_url,
-        'source_article_title': source_article_title,
-        'community': community,
-        'image_url': image_url,
-        'market_type': market_type,
-        'source_metadata': source_metadata or {},
-        'status': 'open',
-        'yes_odds': 0.5,
-        'no_odds': 0.5,
-        'total_pool': Decimal('0'),
-        'total_yes_shares': Decimal('0'),
-        'total_no_shares': Decimal('0'),
-        'created_at': datetime.utcnow(),
-        'resolved_at': None,
-        'outcome': None
-    }
+    Markets are binary YES/NO unless outcomes lists other labels, in which
+    case they get a k-outcome share vector and per-outcome odds.
+    """
+    market_id = str(uuid.uuid4())
+    categorical = outcomes is not None and list(outcomes) != BINARY_OUTCOMES
+    outcomes = list(outcomes) if categorical else list(BINARY_OUTCOMES)
+
+    market = Market(
+        id=market_id,
+        question=question,
+        description=description,
+        resolution_criteria=resolution_criteria,
+        resolution_date=datetime.fromisoformat(resolution_date.replace('Z', '+00:00')) if isinstance(resolution_date, str) else resolution_date,
+        created_by=created_by,
+        source_article_url=source_article_url,
+        source_article_title=source_article_title,
+        community=community,
+        image_url=image_url,
+        market_type=market_type,
+        source_metadata=source_metadata or {},
+        status='open',
+        outcomes=outcomes,
+        yes_odds=None if categorical else 0.5,
+        no_odds=None if categorical else 0.5,
+        outcome_odds=[1 / len(outcomes)] * len(outcomes) if categorical else None,
+        total_pool=0,
+        total_yes_shares=0,
+        total_no_shares=0,
+        outcome_shares=[0] * len(outcomes) if categorical else None,
+        created_at=datetime.utcnow(),
+        resolved_at=None,
+        outcome=None
+    )
+
+    with _store_lock:
+        _insert_market(market)
+        _log('create_market', market)
+    return market
 
+def _insert_market(market):
+    """Store a market and add it to the market index, scheduler and exposure tracker"""
+    market_id = market['id']
     _markets[market_id] = market
-    return market
+    _market_sort_keys[market_id] = (-market['created_at'].timestamp(), market_id)
+    _index_market(market)
+    exposure.open_market(market_id, market_makers.liquidity, len(market['outcomes']))
+    deadline = resolution_deadline(market)
+    if market['status'] == 'open' and deadline is not None:
+        scheduler.schedule(market_id, deadline)
+
+def resolution_deadline(market):
+    """Epoch seconds at which a market closes to betting (None if undated)"""
+    when = market['resolution_date']
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)  # stored dates are UTC
+    return when.timestamp()
+
+def market_status(market):
+    """
+    A market's status, closing it first if its resolution date has passed
+
+    The scheduler closes markets as they expire; checking here as well
+    means no bet slips in between the deadline and the scheduler waking.
+    """
+    if market['status'] == 'open':
+        deadline = resolution_deadline(market)
+        if deadline is not None and deadline <= time.time():
+            close_markets([market['id']])
+    return market['status']
+
+def close_markets(market_ids):
+    """
+    Close open markets to betting, leaving them queued for resolution
+
+    Closed markets stay in the 'closed' bucket of the market index
+    (list_markets(status='closed')) until they are resolved.
+
+    Returns:
+        Number of markets closed
+    """
+    closed = 0
+    with locks.hold(market_ids=market_ids), _store_lock:
+        for market_id in market_ids:
+            if _apply_close_market(market_id):
+                _log('close_market', market_id)
+                closed += 1
+    return closed
+
+def _apply_close_market(market_id):
+    market = _markets.get(market_id)
+    if not market or market['status'] != 'open':
+        return False
+    _unindex_market(market)
+    market['status'] = 'closed'
+    _index_market(market)
+    return True
 
 def update_market_odds(market_id, new_odds, new_pool, yes_shares, no_shares):
-    """Update market odds after a bet"""
+    """Update market odds after a bet (pool and share totals in micro-units)"""
+    with _store_lock:
+        if not _apply_market_odds(market_id, new_odds, new_pool, yes_shares, no_shares):
+            return False
+        _log('update_market_odds', market_id, new_odds, new_pool, yes_shares, no_shares)
+    return True
+
+def _apply_market_odds(market_id, new_odds, new_pool, yes_shares, no_shares):
     market = _markets.get(market_id)
     if not market:
         return False
 
     market['yes_odds'] = new_odds['YES']
     market['no_odds'] = new_odds['NO']
-    market['total_pool'] = Decimal(str(new_pool))
-    market['total_yes_shares'] = Decimal(str(yes_shares))
-    market['total_no_shares'] = Decimal(str(no_shares))
+    market['total_pool'] = new_pool
+    market['total_yes_shares'] = yes_shares
+    market['total_no_shares'] = no_shares
+
+    # Keep a live market maker in step with the stored totals
+    market_makers.sync(market_id, yes_shares, no_shares)
+    exposure.record_trade(market_id, to_dollars(new_pool), to_dollars(max(yes_shares, no_shares)))
+
+    return True
+
+def update_market_outcome_shares(market_id, new_odds, new_pool, outcome_shares):
+    """Update a k-outcome market's odds and share vector after a bet"""
+    with _store_lock:
+        if not _apply_market_outcome_shares(market_id, new_odds, new_pool, outcome_shares):
+            return False
+        _log('update_market_outcome_shares', market_id, new_odds, new_pool, outcome_shares)
+    return True
+
+def _apply_market_outcome_shares(market_id, new_odds, new_pool, outcome_shares):
+    market = _markets.get(market_id)
+    if not market:
+        return False
+
+    market['outcome_odds'] = [new_odds[o] for o in market['outcomes']]
+    market['total_pool'] = new_pool
+    market['outcome_shares'] = list(outcome_shares)
+
+    market_makers.sync_outcomes(market_id, outcome_shares)
+    exposure.record_trade(market_id, to_dollars(new_pool), to_dollars(max(outcome_shares)))
 
     return True
 
 def resolve_market(market_id, outcome):
-    """Resolve a market with YES or NO outcome"""
+    """Resolve a market with the winning outcome label"""
+    resolved_at = datetime.utcnow()
+    with _store_lock:
+        if not _apply_resolve_market(market_id, outcome, resolved_at):
+            return False
+        _log('resolve_market', market_id, outcome, resolved_at)
+    return True
+
+def _apply_resolve_market(market_id, outcome, resolved_at):
     market = _markets.get(market_id)
     if not market:
         return False
 
+    _unindex_market(market)
     market['status'] = 'resolved'
+    _index_market(market)
     market['outcome'] = outcome
-    market['resolved_at'] = datetime.utcnow()
+    market['resolved_at'] = resolved_at
+
+    market_makers.evict(market_id)
+    exposure.resolve(market_id, to_dollars(_winning_shares(market, outcome)))
 
     return True
 
+def _winning_shares(market, outcome):
+    """Total shares outstanding on a market's winning outcome"""
+    if is_categorical(market):
+        return market['outcome_shares'][market['outcomes'].index(outcome)]
+    return market['total_yes_shares'] if outcome == 'YES' else market['total_no_shares']
+
 def settle_bets_for_market(market_id, outcome):
     """Settle all bets for a resolved market"""
-    market_bets = [b for b in _bets.values() if b['market_id'] == market_id]
-
-    settled_count = 0
-    for bet in market_bets:
-        if bet['status'] == 'active':
-            bet['status'] = 'settled'
-            bet['settled_at'] = datetime.utcnow()
-
-            # If bet won, update payout
-            if bet['outcome'] == outcome:
-                bet['actual_payout'] = bet['potential_payout']
-                # Update user balance
-                user = _users.get(bet['user_id'])
-                if user:
-                    user['balance'] = Decimal(user['balance']) + Decimal(bet['actual_payout'])
-                    user['total_winnings'] = Decimal(user['total_winnings']) + Decimal(bet['actual_payout'])
-            else:
-                bet['actual_payout'] = Decimal('0')
-
-            settled_count += 1
+    settled_at = datetime.utcnow()
+    # Settling allocates enough to set off full collections over the store
+    with _store_lock, gc_paused():
+        settled_count = _apply_settle_bets(market_id, outcome, settled_at)
+        _log('settle_bets_for_market', market_id, outcome, settled_at)
+    return settled_count
 
+def _apply_settle_bets(market_id, outcome, settled_at):
+    # Per-user payouts come from one pass over the ledger's columns; the
+    # Bet records only need their status fields stamped
+    settled_count, payouts = ledger.settle(market_id, outcome)
+    _stamp_settled_bets(market_id, outcome, settled_at)
+    with leaderboard.deferred():
+        for user_id, payout in payouts.items():
+            _credit_winnings(user_id, payout)
+            _realize_payout(user_id, market_id, payout)
     return settled_count
 
+def _stamp_settled_bets(market_id, outcome, settled_at):
+    """Mark a market's active Bet records settled with their payouts"""
+    for bet in _bets_by_market.get(market_id, ()):
+        if bet.status == 'active':
+            bet.status = 'settled'
+            bet.settled_at = settled_at
+            bet.actual_payout = bet.potential_payout if bet.outcome == outcome else 0
+
+def _credit_winnings(user_id, payout):
+    """Add a payout to a user's balance and winnings; returns the new balance"""
+    user = _users.get(user_id)
+    if not user:
+        return None
+    user['balance'] += payout
+    user['total_winnings'] += payout
+    leaderboard.update(user_id, user['balance'])
+    return user['balance']
+
+def resolve_markets(resolutions):
+    """
+    Resolve many markets and settle all their bets together
+
+    Payouts for every market come out of one pass over the bet ledger,
+    each winner's balance moves once, and the payout transactions are
+    written and journaled as one batch.
+
+    Args:
+        resolutions: (market_id, outcome) pairs; unknown markets, markets
+            already resolved and outcomes a market does not offer are skipped
+
+    Returns:
+        Dict with the resolved (market_id, outcome) pairs, bets settled per
+        market, and the payout transactions created
+
+    Raises:
+        ValueError: if a market appears more than once
+    """
+    resolved_at = datetime.utcnow()
+    resolutions = list(resolutions)
+    if len({market_id for market_id, _ in resolutions}) != len(resolutions):
+        raise ValueError('Each market may be resolved only once')
+    # Market locks keep bets from filling on a market while it settles
+    with locks.hold(market_ids=[market_id for market_id, _ in resolutions]), _store_lock, gc_paused():
+        pending = {}
+        for market_id, outcome in resolutions:
+            market = _markets.get(market_id)
+            if market and market['status'] != 'resolved' and outcome in market['outcomes']:
+                pending[market_id] = outcome
+        resolutions = list(pending.items())
+
+        settled, credits = _apply_resolve_markets(resolutions, resolved_at)
+        _log('resolve_markets', resolutions, resolved_at)
+
+        # Positional construction keeps building tens of thousands cheap
+        transactions = [
+            Transaction.from_values(str(uuid.uuid4()), user_id, 'payout', payout, balance_after,
+                                    market_id, None, f"Payout on {pending[market_id]}", resolved_at)
+            for user_id, market_id, payout, balance_after in credits
+        ]
+        _insert_transactions(transactions)
+        _log('create_transactions', transactions)
+
+    return {
+        'resolved': resolutions,
+        'bets_settled': settled,
+        'transactions': transactions
+    }
+
+def _apply_resolve_markets(resolutions, resolved_at):
+    """
+    Resolve and settle a batch of markets
+
+    Returns:
+        ({market_id: bets settled}, [(user_id, market_id, payout,
+        balance after)]) with each user's credits listed together
+    """
+    for market_id, outcome in resolutions:
+        _apply_resolve_market(market_id, outcome, resolved_at)
+    settled, payouts = ledger.settle_many(resolutions)
+    for market_id, outcome in resolutions:
+        _stamp_settled_bets(market_id, outcome, resolved_at)
+
+    # Payouts arrive grouped by user; credit each user's total once
+    by_user = {}
+    for (user_id, market_id), payout in payouts.items():
+        by_user.setdefault(user_id, []).append((market_id, payout))
+        _realize_payout(user_id, market_id, payout)
+
+    credits = []
+    with leaderboard.deferred():
+        for user_id, user_payouts in by_user.items():
+            total = sum(payout for _, payout in user_payouts)
+            balance = _credit_winnings(user_id, total)
+            if balance is None:
+                continue
+            balance -= total
+            for market_id, payout in user_payouts:
+                balance += payout
+                credits.append((user_id, market_id, payout, balance))
+
+    return settled, credits
+
 # ========== BETS ==========
 
-def create_bet(user_id, market_id, outcome, amount, shares, odds, potential_payout):
-    """Create a new bet"""
-    bet_id = str(uuid.uuid4())
+def create_bet(user_id, market_id, outcome, amount, shares, odds, potential_payout, side='buy'):
+    """
+    Create a new bet
 
-    bet = {
-        'id': bet_id,
-        'user_id': user_id,
-        'market_id': market_id,
-        'outcome': outcome,
-        'amount': Decimal(str(amount)),
-        'shares': Decimal(str(shares)),
-        'odds': odds,
-        'potential_payout': Decimal(str(potential_payout)),
-        'status': 'active',
-        'created_at': datetime.utcnow(),
-        'settled_at': None,
-        'actual_payout': None
-    }
+    Amount, shares and potential payout are micro-units. Sales back to the
+    market maker are recorded as side='sell' bets with negative amount,
+    shares and potential payout, so settlement nets them against the
+    shares they close.
+    """
+    bet_id = str(uuid.uuid4())
 
-    _bets[bet_id] = bet
+    bet = Bet(
+        id=bet_id,
+        user_id=user_id,
+        market_id=market_id,
+        outcome=outcome,
+        side=side,
+        amount=amount,
+        shares=shares,
+        odds=odds,
+        potential_payout=potential_payout,
+        status='active',
+        created_at=datetime.utcnow(),
+        settled_at=None,
+        actual_payout=None
+    )
+
+    with _store_lock:
+        _insert_bet(bet)
+        _log('create_bet', bet)
     return bet
 
+def _insert_bet(bet):
+    """Store a bet and fold it into the indexes, ledger, position and leaderboards"""
+    user_id, market_id = bet['user_id'], bet['market_id']
+    _bets[bet['id']] = bet
+    _bets_by_user.setdefault(user_id, []).append(bet)
+    _bets_by_market.setdefault(market_id, []).append(bet)
+    _bets_by_user_market.setdefault((user_id, market_id), []).append(bet)
+    ledger.append(market_id, user_id, bet['outcome'], bet['amount'], bet['shares'],
+                  bet['potential_payout'], bet['created_at'])
+    _update_position(bet)
+
+    market = _markets.get(market_id)
+    if market:
+        leaderboard.join(user_id, market.get('community'))
+
+def _update_position(bet):
+    """Apply a bet's shares and cost to the user's position in its market"""
+    key = (bet['user_id'], bet['market_id'])
+    position = _positions.get(key)
+    if position is None:
+        position = _positions[key] = Position(
+            user_id=bet['user_id'],
+            market_id=bet['market_id'],
+            shares={},
+            cost_basis=0,
+            realized_payout=0,
+            bet_count=0
+        )
+        _positions_by_user.setdefault(bet['user_id'], []).append(position)
+
+    shares = position.shares
+    shares[bet['outcome']] = shares.get(bet['outcome'], 0) + bet['shares']
+    position.cost_basis += bet['amount']  # sales carry negative amounts
+    position.bet_count += 1
+
+def _realize_payout(user_id, market_id, payout):
+    """Record a settlement payout on the user's position"""
+    position = _positions.get((user_id, market_id))
+    if position is not None:
+        position.realized_payout += payout
+
+def get_user_position(user_id, market_id):
+    """
+    Get a user's position in a market
+
+    Returns:
+        Position with net shares per outcome, cost basis (net amount paid
+        in) and realized payout, or None if the user never traded it
+    """
+    return _positions.get((user_id, market_id))
+
+def get_user_positions(user_id, limit=50):
+    """Get a user's positions, most recently opened first"""
+    positions = _positions_by_user.get(user_id, [])
+    return positions[:-limit - 1:-1] if limit > 0 else []
+
 def get_user_bets_on_market(user_id, market_id):
     """Get user's bets on a specific market"""
-    return [b for b in _bets.values()
-            if b['user_id'] == user_id and b['market_id'] == market_id]
+    return list(_bets_by_user_market.get((user_id, market_id), ()))
 
 def get_user_active_bets(user_id, limit=50):
     """Get user's active bets with market info"""
-    user_bets = [b for b in _bets.values() if b['user_id'] == user_id]
-    user_bets.sort(key=lambda b: b['created_at'], reverse=True)
+    # Newest first, straight off the per-user index
+    user_bets = _bets_by_user.get(user_id, [])
+    latest = user_bets[:-limit - 1:-1] if limit > 0 else []
 
     # Enrich with market info
     result = []
-    for bet in user_bets[:limit]:
+    for bet in latest:
         market = _markets.get(bet['market_id'])
         if market:
             enriched_bet = {**bet}
@@ -184,17 +609,81 @@ def get_user_by_id(user_id):
     """Get user by ID"""
     return _users.get(user_id)
 
+def normalize_email(email):
+    """Form an email address is indexed and matched in (case-insensitive)"""
+    lowered = email.lower()
+    # Reuse the caller's string when it is already lower-case
+    return email if lowered == email else lowered
+
+def get_user_by_email(email):
+    """Get user by email address, ignoring case"""
+    return _users_by_email.get(normalize_email(email)) if email else None
+
+def get_user_by_username(username):
+    """Get user by username"""
+    return _users_by_username.get(username)
+
+def adjust_user_balance(user_id, delta):
+    """
+    Add delta (micro-units) to a user's balance as one atomic step
+
+    Unlike update_user_balance, this cannot overwrite a change another
+    thread made since the balance was read.
+
+    Returns:
+        The new balance, or None if the user does not exist
+    """
+    with _store_lock:
+        user = _users.get(user_id)
+        if not user:
+            return None
+        new_balance = user['balance'] + delta
+        _apply_user_balance(user_id, new_balance)
+        _log('update_user_balance', user_id, new_balance)
+    return new_balance
+
 def update_user_balance(user_id, new_balance):
-    """Update user balance"""
+    """Update user balance (micro-units)"""
+    with _store_lock:
+        if not _apply_user_balance(user_id, new_balance):
+            return False
+        _log('update_user_balance', user_id, new_balance)
+    return True
+
+def _apply_user_balance(user_id, new_balance):
     user = _users.get(user_id)
     if not user:
         return False
 
-    user['balance'] = Decimal(str(new_balance))
+    user['balance'] = new_balance
+    leaderboard.update(user_id, user['balance'])
+    return True
+
+def update_user_password_hash(user_id, password_hash):
+    """Replace a user's stored password hash record"""
+    with _store_lock:
+        if not _apply_user_password_hash(user_id, password_hash):
+            return False
+        _log('update_user_password_hash', user_id, password_hash)
+    return True
+
+def _apply_user_password_hash(user_id, password_hash):
+    user = _users.get(user_id)
+    if not user:
+        return False
+
+    user['password_hash'] = password_hash
     return True
 
 def increment_user_total_bets(user_id):
     """Increment user's total bet count"""
+    with _store_lock:
+        if not _apply_increment_total_bets(user_id):
+            return False
+        _log('increment_user_total_bets', user_id)
+    return True
+
+def _apply_increment_total_bets(user_id):
     user = _users.get(user_id)
     if not user:
         return False
@@ -203,47 +692,321 @@ def increment_user_total_bets(user_id):
     return True
 
 def get_leaderboard(community=None, limit=100):
-    """Get top users by balance"""
-    users = list(_users.values())
+    """
+    Get top users by balance
+
+    Args:
+        community: Only rank users who have bet in this community
+        limit: Maximum number of users
 
-    # Filter by community if specified (for now, ignore this filter)
+    Returns:
+        List of User records, highest balance first
+    """
+    return [_users[user_id] for user_id in leaderboard.top(community or None, limit)]
 
-    # Sort by balance descending
-    users.sort(key=lambda u: u['balance'], reverse=True)
+def get_user_rank(user_id, community=None):
+    """
+    Get a user's leaderboard position
 
-    return users[:limit]
+    Returns:
+        (rank, board size); rank is 1-based, None if the user is unranked
+    """
+    return leaderboard.rank(user_id, community or None)
 
 # ========== TRANSACTIONS ==========
 
 def create_transaction(user_id, tx_type, amount, balance_after,
                       market_id=None, bet_id=None, description=''):
-    """Create a transaction record"""
+    """Create a transaction record (amount and balance_after in micro-units)"""
     tx_id = str(uuid.uuid4())
 
-    transaction = {
-        'id': tx_id,
-        'user_id': user_id,
-        'type': tx_type,
-        'amount': Decimal(str(amount)),
-        'balance_after': Decimal(str(balance_after)),
-        'market_id': market_id,
-        'bet_id': bet_id,
-        'description': description,
-        'created_at': datetime.utcnow()
-    }
-
-    _transactions[tx_id] = transaction
+    transaction = Transaction(
+        id=tx_id,
+        user_id=user_id,
+        type=tx_type,
+        amount=amount,
+        balance_after=balance_after,
+        market_id=market_id,
+        bet_id=bet_id,
+        description=description,
+        created_at=datetime.utcnow()
+    )
+
+    with _store_lock:
+        _insert_transaction(transaction)
+        _log('create_transaction', transaction)
     return transaction
 
+def _insert_transaction(transaction):
+    _transactions[transaction['id']] = transaction
+    _transactions_by_user.setdefault(transaction['user_id'], []).append(transaction)
+
+def _insert_transactions(transactions):
+    for transaction in transactions:
+        _insert_transaction(transaction)
+
 def get_user_transactions(user_id, limit=50):
     """Get user's transaction history"""
-    txs = [t for t in _transactions.values() if t['user_id'] == user_id]
-    txs.sort(key=lambda t: t['created_at'], reverse=True)
-    return txs[:limit]
+    txs = _transactions_by_user.get(user_id, [])
+    return txs[:-limit - 1:-1] if limit > 0 else []
 
 # ========== HELPER: Add user to storage (called by auth module) ==========
 
 def add_user(user_data):
-    """Add user to storage (internal use)"""
+    """
+    Add user to storage (internal use)
+
+    Emails (ignoring case) and usernames are unique; the check and the
+    insert happen under one lock, so concurrent signups cannot both win.
+
+    Returns:
+        The stored User record
+
+    Raises:
+        ValueError: if the email or username is already taken
+    """
+    user = user_data if isinstance(user_data, User) else User.from_dict(user_data)
+    with _store_lock:
+        if user['email'] and normalize_email(user['email']) in _users_by_email:
+            raise ValueError('Email already registered')
+        if user['username'] in _users_by_username:
+            raise ValueError('Username already taken')
+        _insert_user(user)
+        _log('add_user', user)
+    return user
+
+def _insert_user(user_data):
     _users[user_data['id']] = user_data
-    return user_data
+    if user_data['email']:
+        _users_by_email[normalize_email(user_data['email'])] = user_data
+    _users_by_username[user_data['username']] = user_data
+    leaderboard.update(user_data['id'], user_data['balance'])
+
+# ========== AUTH TOKENS ==========
+
+def save_token(token, user_id):
+    """
+    Remember an issued auth token until it expires
+
+    Issuing past the per-user cap drops that user's oldest token (see
+    tokens.py).
+
+    Returns:
+        Epoch seconds the token expires at
+    """
+    with _store_lock:
+        expires_at = tokens.add(token, user_id)
+        _log('save_token', token, user_id, expires_at)
+    return expires_at
+
+def _apply_save_token(token, user_id, expires_at=None):
+    # Journals written before tokens expired carry no expiry
+    if expires_at is None or expires_at > time.time():
+        tokens.add(token, user_id, expires_at)
+
+def get_token_user(token):
+    """User ID a live auth token was issued to (None if unknown or expired)"""
+    return tokens.get(token)
+
+def delete_token(token):
+    """
+    Forget a stored auth token (logout)
+
+    Returns:
+        False if the token was not held
+    """
+    with _store_lock:
+        if not tokens.discard(token):
+            return False
+        _log('delete_token', token)
+    return True
+
+def revoke_token(token_id, expires_at):
+    """
+    Refuse a signed token from now until it expires on its own
+
+    Args:
+        token_id: ID carried in the signed token
+        expires_at: Epoch seconds the token expires at
+    """
+    with _store_lock:
+        _apply_revoke_token(token_id, expires_at)
+        _log('revoke_token', token_id, expires_at)
+
+def _apply_revoke_token(token_id, expires_at):
+    now = time.time()
+    # Entries whose tokens have expired guard nothing; drop them as we go
+    while _revoked_expiry and _revoked_expiry[0][0] <= now:
+        _revoked.pop(heapq.heappop(_revoked_expiry)[1], None)
+    if expires_at > now:
+        _revoked[token_id] = expires_at
+        heapq.heappush(_revoked_expiry, (expires_at, token_id))
+
+def is_token_revoked(token_id):
+    """True if a signed token was revoked before its expiry"""
+    return token_id in _revoked
+
+# ========== JOURNAL AND SNAPSHOTS ==========
+
+# Journal op -> function that re-applies it during replay
+_REPLAY = {
+    'create_market': _insert_market,
+    'update_market_odds': _apply_market_odds,
+    'update_market_outcome_shares': _apply_market_outcome_shares,
+    'resolve_market': _apply_resolve_market,
+    'settle_bets_for_market': _apply_settle_bets,
+    'resolve_markets': _apply_resolve_markets,
+    'close_market': _apply_close_market,
+    'create_bet': _insert_bet,
+    'update_user_balance': _apply_user_balance,
+    'update_user_password_hash': _apply_user_password_hash,
+    'increment_user_total_bets': _apply_increment_total_bets,
+    'create_transaction': _insert_transaction,
+    'create_transactions': _insert_transactions,
+    'add_user': _insert_user,
+    'save_token': _apply_save_token,
+    'delete_token': tokens.discard,
+    'revoke_token': _apply_revoke_token,
+}
+
+def _log(op, *args):
+    """Journal a mutation that has just been applied (caller holds _store_lock)"""
+    global _snapshot_running
+    if _journal is None:
+        return
+    _journal.append(op, *args)
+    if SNAPSHOT_EVERY and _journal.records_since_snapshot >= SNAPSHOT_EVERY and not _snapshot_running:
+        _snapshot_running = True
+        threading.Thread(target=_snapshot_in_background, daemon=True).start()
+
+def _snapshot_in_background():
+    try:
+        snapshot()
+    except Exception:
+        # The journal still holds everything; the next threshold retries
+        logger.exception("Writing a snapshot failed")
+
+def snapshot():
+    """
+    Write a snapshot of the store and drop the journal it supersedes
+
+    Writes pause only while a new journal segment is started. The snapshot
+    itself is built by a separate process (db.compactor) from the previous
+    snapshot plus the segments before the new one, so this process never
+    pickles the store and bets, logins and balance changes carry on while
+    it runs. That process holds a second copy of the store until it exits.
+
+    Returns:
+        False if journaling is off, else True once the snapshot is written
+    """
+    global _snapshot_running
+    try:
+        if _journal is None:
+            return False
+        with _store_lock:
+            segment = _journal.rotate()
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run(
+            [sys.executable, '-m', 'db.compactor', _journal.directory, str(segment)],
+            cwd=package_root, env={**os.environ, 'BETTIT_DB_BACKEND': 'memory'}, check=True
+        )
+        return True
+    finally:
+        _snapshot_running = False
+
+def build_snapshot(directory, end_segment):
+    """
+    Rebuild the store from a journal directory and write it as the snapshot
+
+    Meant for a process of its own (see db.compactor): loads the latest
+    snapshot into this process's empty store, replays the segments before
+    end_segment on top, then writes the result and drops those segments.
+
+    Args:
+        directory: Journal directory
+        end_segment: First segment the new snapshot does not cover
+    """
+    journal = Journal(directory)
+    state, first_segment = journal.load_snapshot()
+    with _store_lock, gc_paused(), leaderboard.deferred():
+        if state is not None:
+            _load_state(state)
+        for op, args in journal.replay(first_segment, end_segment):
+            _REPLAY[op](*args)
+        state = pickle.dumps({
+            'markets': _markets,
+            'users': _users,
+            'bets': _bets,
+            'transactions': _transactions,
+            'tokens': tokens.entries(),
+            'revoked': _revoked,
+            'positions': _positions,
+            'bets_by_user': _bets_by_user,
+            'bets_by_market': _bets_by_market,
+            'bets_by_user_market': _bets_by_user_market,
+            'transactions_by_user': _transactions_by_user,
+            'ledger': ledger,
+            'communities': leaderboard.memberships()
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+    journal.write_snapshot(state, end_segment)
+
+def _restore():
+    """Load the latest snapshot, then replay the journal written after it"""
+    state, segment = _journal.load_snapshot()
+    with _store_lock, gc_paused(), leaderboard.deferred():
+        if state is not None:
+            _load_state(state)
+        for op, args in _journal.replay(segment):
+            _REPLAY[op](*args)
+
+    # The restored records live as long as the process; keep them out of
+    # every later full collection
+    gc.freeze()
+
+def _load_state(state):
+    """
+    Install a snapshot's records and rebuild what it does not carry
+
+    Bet and transaction indexes come back with the records (pickle keeps
+    them pointing at the same objects), as does the bet ledger, so only the per-market and per-user
+    structures are rebuilt.
+    """
+    _bets.update(state['bets'])
+    _transactions.update(state['transactions'])
+    entries = state['tokens']
+    if isinstance(entries, dict):
+        # Snapshots written before tokens expired: token -> user_id
+        entries = [(token, user_id, None) for token, user_id in entries.items()]
+    for token, user_id, expires_at in entries:
+        _apply_save_token(token, user_id, expires_at)
+    for token_id, expires_at in state.get('revoked', {}).items():
+        _apply_revoke_token(token_id, expires_at)
+    _positions.update(state['positions'])
+    for position in state['positions'].values():
+        _positions_by_user.setdefault(position['user_id'], []).append(position)
+    _bets_by_user.update(state['bets_by_user'])
+    _bets_by_market.update(state['bets_by_market'])
+    _bets_by_user_market.update(state['bets_by_user_market'])
+    _transactions_by_user.update(state['transactions_by_user'])
+    ledger.load(state['ledger'])
+
+    for user in state['users'].values():
+        _insert_user(user)
+    for user_id, communities in state['communities'].items():
+        for community in communities:
+            leaderboard.join(user_id, community)
+
+    for market in state['markets'].values():
+        _insert_market(market)
+        if is_categorical(market):
+            shares = market['outcome_shares']
+        else:
+            shares = [market['total_yes_shares'], market['total_no_shares']]
+        exposure.record_trade(market['id'], to_dollars(market['total_pool']), to_dollars(max(shares)))
+        if market['status'] == 'resolved':
+            exposure.resolve(market['id'], to_dollars(_winning_shares(market, market['outcome'])))
+
+# ========== BACKEND SELECTION ==========
+
+if os.getenv('BETTIT_DB_BACKEND', 'memory') == 'sqlite':
+    from .sqlite_db import *  # noqa: E402,F401,F403
@@ -0,0 +1,117 @@
+"""
+House exposure tracking across open markets
+"""
+import math
+import threading
+
+
+class ExposureTracker:
+    """
+    Incrementally maintained worst-case loss of the house
+
+    The house collects the net amount traded into an LMSR market (its pool)
+    and pays $1 per winning share, so if outcome i wins it loses
+    q_i - pool. The worst case, max_i q_i - pool, can never exceed the
+    market's subsidy bound b * ln(k). Each trade and resolution touches one
+    market's entry and adjusts the platform totals by the difference, so
+    every update and every summary is O(1) however many markets exist.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._markets = {}  # market_id -> exposure entry
+        self.open_markets = 0
+        self.total_pool = 0.0
+        self.total_worst_case_loss = 0.0
+        self.total_subsidy_bound = 0.0
+        self.realized_loss = 0.0
+
+    def open_market(self, market_id, liquidity, outcome_count):
+        """
+        Start tracking a new market
+
+        Args:
+            market_id: Market ID
+            liquidity: LMSR liquidity parameter b
+            outcome_count: Number of outcomes k
+        """
+        bound = liquidity * math.log(outcome_count)
+        with self._lock:
+            self._markets[market_id] = {
+                'market_id': market_id,
+                'pool': 0.0,
+                'max_shares': 0.0,
+                'worst_case_loss': 0.0,
+                'subsidy_bound': bound,
+                'realized_loss': None
+            }
+            self.open_markets += 1
+            self.total_subsidy_bound += bound
+
+    def record_trade(self, market_id, pool, max_shares):
+        """
+        Update a market after a trade
+
+        Args:
+            market_id: Market ID
+            pool: Net amount traded into the market
+            max_shares: Largest share total across its outcomes
+        """
+        with self._lock:
+            entry = self._markets.get(market_id)
+            if entry is None or entry['realized_loss'] is not None:
+                return
+
+            worst = max_shares - pool
+            self.total_pool += pool - entry['pool']
+            self.total_worst_case_loss += worst - entry['worst_case_loss']
+            entry['pool'] = pool
+            entry['max_shares'] = max_shares
+            entry['worst_case_loss'] = worst
+
+    def resolve(self, market_id, payout):
+        """
+        Close a market's exposure once its outcome is known
+
+        Args:
+            market_id: Market ID
+            payout: Total paid to winning shares
+        """
+        with self._lock:
+            entry = self._markets.get(market_id)
+            if entry is None or entry['realized_loss'] is not None:
+                return
+
+            entry['realized_loss'] = payout - entry['pool']
+            self.realized_loss += entry['realized_loss']
+            self.open_markets -= 1
+            self.total_pool -= entry['pool']
+            self.total_worst_case_loss -= entry['worst_case_loss']
+            self.total_subsidy_bound -= entry['subsidy_bound']
+
+    def market(self, market_id):
+        """Exposure entry for one market (None if untracked)"""
+        with self._lock:
+            entry = self._markets.get(market_id)
+            return dict(entry) if entry else None
+
+    def summary(self):
+        """
+        Platform-wide exposure
+
+        Returns:
+            dict with open market count, pooled amount, worst-case loss,
+            subsidy bound and realized loss
+        """
+        with self._lock:
+            return {
+                'open_markets': self.open_markets,
+                'total_pool': self.total_pool,
+                'worst_case_loss': self.total_worst_case_loss,
+                'subsidy_bound': self.total_subsidy_bound,
+                'realized_loss': self.realized_loss
+            }
+
+
+# Process-wide tracker fed by db
+exposure = ExposureTracker()
@@ -0,0 +1,193 @@
+"""
+Append-only journal and snapshots for the in-memory store
+"""
+import gc
+import os
+import pickle
+import re
+import struct
+import threading
+from contextlib import contextmanager
+
+# Length prefix of each journal record
+_RECORD_HEADER = struct.Struct('<I')
+
+# Journal segment number a snapshot's replay starts from
+_SNAPSHOT_HEADER = struct.Struct('<Q')
+
+_SEGMENT_NAME = re.compile(r'^journal-(\d+)\.log$')
+
+SNAPSHOT_FILE = 'snapshot.bin'
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector
+
+    Pickling or unpickling millions of records otherwise triggers a
+    collection every few hundred allocations, each walking everything
+    built so far.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Journal:
+    """
+    Write-ahead log of store mutations, split into numbered segments
+
+    Each record is a length-prefixed pickle of (op, args). Taking a
+    snapshot starts a new segment, writes the whole store next to it and
+    then deletes the segments the snapshot covers, so a restart loads the
+    snapshot and replays only the records written after it. A record torn
+    by a crash mid-write is cut off the end of its segment on replay.
+    """
+
+    def __init__(self, directory, fsync=False):
+        """
+        Initialize journal
+
+        Args:
+            directory: Directory holding the segments and the snapshot
+            fsync: fsync after every record instead of only flushing it
+                to the OS
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.records_since_snapshot = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment = 0
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"journal-{segment:08d}.log")
+
+    def segments(self):
+        """Numbers of the segments on disk, oldest first"""
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_NAME.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def load_snapshot(self):
+        """
+        Read the latest snapshot
+
+        Returns:
+            (state, first segment to replay); state is None without a snapshot
+        """
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return None, 0
+        with open(path, 'rb') as f, gc_paused():
+            (segment,) = _SNAPSHOT_HEADER.unpack(f.read(_SNAPSHOT_HEADER.size))
+            return pickle.load(f), segment
+
+    def replay(self, first_segment=0, end_segment=None):
+        """
+        Read back journaled mutations
+
+        Args:
+            first_segment: Skip segments older than this
+            end_segment: Stop before this segment (default: read them all)
+
+        Yields:
+            (op, args) for every complete record, in write order
+        """
+        for segment in self.segments():
+            if segment < first_segment:
+                continue
+            if end_segment is not None and segment >= end_segment:
+                break
+            path = self._segment_path(segment)
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            pos = 0
+            while pos + _RECORD_HEADER.size <= len(data):
+                (size,) = _RECORD_HEADER.unpack_from(data, pos)
+                end = pos + _RECORD_HEADER.size + size
+                if end > len(data):
+                    break
+                try:
+                    record = pickle.loads(data[pos + _RECORD_HEADER.size:end])
+                except Exception:
+                    break
+                yield record
+                pos = end
+
+            if pos < len(data):
+                with open(path, 'r+b') as f:
+                    f.truncate(pos)
+
+    def open(self):
+        """Start appending to a new segment after the existing ones"""
+        segments = self.segments()
+        with self._lock:
+            self._open_segment(segments[-1] + 1 if segments else 1)
+
+    def _open_segment(self, segment):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._segment_path(segment), 'ab')
+        self._segment = segment
+
+    def append(self, op, *args):
+        """Write one mutation record"""
+        payload = pickle.dumps((op, args), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._file.write(_RECORD_HEADER.pack(len(payload)) + payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.records_since_snapshot += 1
+
+    def rotate(self):
+        """
+        Close the current segment and start the next one
+
+        Returns:
+            Number of the new segment, the first one a snapshot taken now
+            does not cover
+        """
+        with self._lock:
+            self._open_segment(self._segment + 1)
+            self.records_since_snapshot = 0
+            return self._segment
+
+    def write_snapshot(self, state, segment):
+        """
+        Atomically replace the snapshot, then drop the segments it covers
+
+        Args:
+            state: Pickled store state (bytes)
+            segment: First segment written after the state was captured
+        """
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER.pack(segment))
+            f.write(state)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        for old in self.segments():
+            if old < segment:
+                os.remove(self._segment_path(old))
+
+    def close(self):
+        """Close the current segment"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
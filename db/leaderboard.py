@@ -0,0 +1,180 @@
+"""
+Live-maintained leaderboards ranked by balance
+"""
+import threading
+from contextlib import contextmanager
+
+from .skiplist import IndexableSkipList
+
+# A deferred flush rebuilds a board outright, instead of moving users one
+# by one, once at least 1/REBUILD_RATIO of its users have moved
+REBUILD_RATIO = 8
+
+
+class Leaderboard:
+    """
+    Global and per-community boards of users ordered by balance
+
+    Each board is a skip list of (-balance, user_id) keys, so the richest
+    user comes first and ties break by user ID. A balance change moves the
+    user's key on the global board and on the board of every community
+    they have bet in: O(c log n) for c communities. Top-N reads cost
+    O(log n + N) and a rank lookup O(log n).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {None: IndexableSkipList()}  # community (None = global) -> board
+        self._keys = {}         # user_id -> current sort key
+        self._communities = {}  # user_id -> communities the user is ranked in
+        self._pending = None    # user_id -> balance while updates are deferred
+        self._deferring = 0     # deferred() blocks currently open
+
+    def update(self, user_id, balance):
+        """
+        Place a user at a new balance, adding them if they are not ranked yet
+
+        Args:
+            user_id: User ID
+            balance: User's current balance
+        """
+        key = (-balance, user_id)
+        with self._lock:
+            if self._pending is not None:
+                self._pending[user_id] = balance
+                return
+            old_key = self._keys.get(user_id)
+            if old_key == key:
+                return
+            for community in self._boards_for(user_id):
+                board = self._boards[community]
+                if old_key is not None:
+                    board.remove(old_key)
+                board.insert(key)
+            self._keys[user_id] = key
+
+    def _update_many(self, balances):
+        """Apply many balances at once (lock held), rebuilding boards most of whose users moved"""
+        old_keys = {}
+        for user_id, balance in balances.items():
+            key = (-balance, user_id)
+            old_key = self._keys.get(user_id)
+            if old_key != key:
+                old_keys[user_id] = old_key
+                self._keys[user_id] = key
+
+        moved = {}  # community -> users moving on its board
+        for user_id in old_keys:
+            for community in self._boards_for(user_id):
+                moved.setdefault(community, []).append(user_id)
+        for community, user_ids in moved.items():
+            board = self._boards[community]
+            if len(user_ids) * REBUILD_RATIO >= len(board):
+                members = [user_id for _, user_id in board]
+                members += [user_id for user_id in user_ids if old_keys[user_id] is None]
+                self._boards[community] = IndexableSkipList.from_sorted(
+                    sorted(self._keys[user_id] for user_id in members))
+                continue
+            for user_id in user_ids:
+                if old_keys[user_id] is not None:
+                    board.remove(old_keys[user_id])
+                board.insert(self._keys[user_id])
+
+    @contextmanager
+    def deferred(self):
+        """
+        Hold balance updates until the block exits
+
+        Only each user's last balance is then applied, so replaying a long
+        run of balance changes costs one board move per user, and a board
+        most of whose users moved is rebuilt in one pass. Blocks nest; the
+        outermost one applies the updates.
+        """
+        with self._lock:
+            if not self._deferring:
+                self._pending = {}
+            self._deferring += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._deferring -= 1
+                if not self._deferring:
+                    pending, self._pending = self._pending, None
+                    self._update_many(pending)
+
+    def join(self, user_id, community):
+        """
+        Rank a user on a community's board (no-op if already there)
+
+        Args:
+            user_id: User ID
+            community: Community the user has bet in
+        """
+        if community is None:
+            return
+        with self._lock:
+            communities = self._communities.setdefault(user_id, set())
+            if community in communities:
+                return
+            communities.add(community)
+            key = self._keys.get(user_id)
+            board = self._boards.get(community)
+            if board is None:
+                board = self._boards[community] = IndexableSkipList()
+            if key is not None:
+                board.insert(key)
+
+    def _boards_for(self, user_id):
+        """Boards a user appears on: the global one plus their communities"""
+        return [None, *self._communities.get(user_id, ())]
+
+    def memberships(self):
+        """Copy of user_id -> communities the user is ranked in"""
+        with self._lock:
+            return {user_id: set(communities) for user_id, communities in self._communities.items()}
+
+    def top(self, community=None, limit=100):
+        """
+        Highest-balance users
+
+        Args:
+            community: Community board to read (None for global)
+            limit: Maximum number of users
+
+        Returns:
+            List of user IDs, best first
+        """
+        with self._lock:
+            board = self._boards.get(community)
+            if board is None:
+                return []
+            user_ids = []
+            for _, user_id in board:
+                if len(user_ids) >= limit:
+                    break
+                user_ids.append(user_id)
+            return user_ids
+
+    def rank(self, user_id, community=None):
+        """
+        A user's 1-based position on a board
+
+        Args:
+            user_id: User ID
+            community: Community board to read (None for global)
+
+        Returns:
+            (rank, board size); rank is None if the user is not on the board
+        """
+        with self._lock:
+            board = self._boards.get(community)
+            if board is None:
+                return None, 0
+            key = self._keys.get(user_id)
+            position = board.rank(key) if key is not None else None
+            return (position + 1 if position is not None else None), len(board)
+
+
+# Process-wide leaderboard fed by db
+leaderboard = Leaderboard()
@@ -0,0 +1,237 @@
+"""
+Columnar bet ledger for settlement and analytics
+"""
+import threading
+
+import numpy as np
+
+# Initial column capacity in rows
+CHUNK_SIZE = 65536
+
+# Bet status codes in the status column
+ACTIVE = 0
+SETTLED = 1
+
+_COLUMNS = (
+    ('market', np.int32),
+    ('user', np.int32),
+    ('outcome', np.int32),
+    ('status', np.int8),
+    ('amount', np.int64),
+    ('shares', np.int64),
+    ('payout', np.int64),
+    ('created_at', np.float64),
+)
+
+
+class BetLedger:
+    """
+    Every bet as one row across parallel NumPy columns
+
+    Market IDs, user IDs and outcome labels are interned to small integers,
+    so a market's settlement, trading volume or a user's open exposure is a
+    boolean mask and a reduction over contiguous arrays instead of a walk
+    over bet records. Rows are appended in bet order; the columns start at
+    CHUNK_SIZE rows and double when full, so appends stay amortized O(1).
+    The bet records remain the source of truth for everything else; the
+    ledger mirrors their money fields as int64 micro-units. Sums go through
+    float64 bincounts, which stay exact below 2**53 micro-units (about
+    nine billion dollars) per total.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._capacity = 0
+        self._columns = {name: np.empty(0, dtype) for name, dtype in _COLUMNS}
+        self._market_ids = []    # market index -> market_id
+        self._market_index = {}  # market_id -> market index
+        self._user_ids = []
+        self._user_index = {}
+        self._outcomes = []
+        self._outcome_index = {}
+
+    def __len__(self):
+        return self._size
+
+    def __getstate__(self):
+        with self._lock:
+            state = {k: v for k, v in self.__dict__.items() if k != '_lock'}
+            state['_columns'] = {name: col[:self._size].copy() for name, col in self._columns.items()}
+            state['_capacity'] = self._size
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def load(self, other):
+        """Replace this ledger's contents with another's (e.g. from a snapshot)"""
+        with self._lock:
+            state = other.__getstate__()
+            self.__dict__.update(state)
+
+    @staticmethod
+    def _intern(value, ids, index):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(ids)
+            ids.append(value)
+        return code
+
+    def _grow(self):
+        capacity = max(self._capacity * 2, CHUNK_SIZE)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        self._capacity = capacity
+
+    def append(self, market_id, user_id, outcome, amount, shares, payout, created_at):
+        """
+        Add a bet row
+
+        Args:
+            market_id: Market the bet is on
+            user_id: User who placed it
+            outcome: Outcome label bet on
+            amount: Micro-units paid (negative for a sale)
+            shares: Micro-shares bought (negative for a sale)
+            payout: Micro-units paid out if the outcome wins
+            created_at: Bet time (datetime)
+
+        Returns:
+            Row number of the bet
+        """
+        with self._lock:
+            if self._size == self._capacity:
+                self._grow()
+            row = self._size
+            cols = self._columns
+            cols['market'][row] = self._intern(market_id, self._market_ids, self._market_index)
+            cols['user'][row] = self._intern(user_id, self._user_ids, self._user_index)
+            cols['outcome'][row] = self._intern(outcome, self._outcomes, self._outcome_index)
+            cols['status'][row] = ACTIVE
+            cols['amount'][row] = amount
+            cols['shares'][row] = shares
+            cols['payout'][row] = payout
+            cols['created_at'][row] = created_at.timestamp()
+            self._size += 1
+            return row
+
+    def _view(self, name):
+        return self._columns[name][:self._size]
+
+    def settle(self, market_id, outcome):
+        """
+        Settle a market's active bets
+
+        Args:
+            market_id: Resolved market
+            outcome: Winning outcome label
+
+        Returns:
+            (number of bets settled, {user_id: total payout}) where only
+            users with a non-zero payout appear
+        """
+        settled, payouts = self.settle_many([(market_id, outcome)])
+        return sum(settled.values()), {user_id: payout for (user_id, _), payout in payouts.items()}
+
+    def settle_many(self, resolutions):
+        """
+        Settle the active bets of many markets in one pass
+
+        Args:
+            resolutions: (market_id, winning outcome label) pairs
+
+        Returns:
+            ({market_id: bets settled}, {(user_id, market_id): payout in
+            micro-units}) where only non-zero payouts appear
+        """
+        with self._lock:
+            # Winning outcome code per market code: -2 leaves the market
+            # alone, -1 settles it with no winners
+            winners = np.full(len(self._market_ids), -2, np.int32)
+            for market_id, outcome in resolutions:
+                market = self._market_index.get(market_id)
+                if market is not None:
+                    winners[market] = self._outcome_index.get(outcome, -1)
+
+            markets = self._view('market')
+            winning = winners[markets]
+            active = (winning != -2) & (self._view('status') == ACTIVE)
+            if not active.any():
+                return {}, {}
+            self._view('status')[active] = SETTLED
+            counts = np.bincount(markets[active], minlength=len(self._market_ids))
+            settled = {self._market_ids[m]: int(counts[m]) for m in np.flatnonzero(counts)}
+
+            won = active & (self._view('outcome') == winning)
+            keys = self._view('user')[won].astype(np.int64) * len(self._market_ids) + markets[won]
+            keys, inverse = np.unique(keys, return_inverse=True)
+            totals = np.bincount(inverse, weights=self._view('payout')[won], minlength=len(keys))
+            totals = np.rint(totals).astype(np.int64)
+            payouts = {}
+            for key, total in zip(keys.tolist(), totals.tolist()):
+                if total:
+                    user, market = divmod(key, len(self._market_ids))
+                    payouts[(self._user_ids[user], self._market_ids[market])] = total
+            return settled, payouts
+
+    def market_volume(self, market_id=None):
+        """
+        Gross amount traded (buys plus sales)
+
+        Args:
+            market_id: Market to total (None for every market)
+
+        Returns:
+            Micro-units for one market, or {market_id: volume} for all
+        """
+        with self._lock:
+            amounts = np.abs(self._view('amount'))
+            if market_id is not None:
+                market = self._market_index.get(market_id)
+                if market is None:
+                    return 0
+                return int(amounts[self._view('market') == market].sum())
+            volumes = np.bincount(self._view('market'), weights=amounts, minlength=len(self._market_ids))
+            return dict(zip(self._market_ids, np.rint(volumes).astype(np.int64).tolist()))
+
+    def user_exposure(self, user_id):
+        """
+        A user's net stake in bets that have not settled yet
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            {market_id: net micro-units paid in} for markets the user has
+            open bets in
+        """
+        with self._lock:
+            user = self._user_index.get(user_id)
+            if user is None:
+                return {}
+            open_bets = (self._view('user') == user) & (self._view('status') == ACTIVE)
+            markets = self._view('market')[open_bets]
+            stakes = np.rint(np.bincount(markets, weights=self._view('amount')[open_bets])).astype(np.int64)
+            return {self._market_ids[m]: int(stakes[m]) for m in np.unique(markets)}
+
+
+    def exposure_by_user(self):
+        """
+        Every user's total net stake in bets that have not settled yet
+
+        Returns:
+            {user_id: net micro-units paid in} for users with open bets
+        """
+        with self._lock:
+            open_bets = self._view('status') == ACTIVE
+            users = self._view('user')[open_bets]
+            stakes = np.rint(np.bincount(users, weights=self._view('amount')[open_bets])).astype(np.int64)
+            return {self._user_ids[u]: int(stakes[u]) for u in np.unique(users)}
+
+
+# Process-wide ledger fed by db
+ledger = BetLedger()
@@ -0,0 +1,56 @@
+"""
+Per-market and per-user locks for multi-threaded serving
+"""
+import threading
+from contextlib import contextmanager
+
+
+class LockManager:
+    """
+    One lock per market and one per user, always taken in a fixed order
+
+    Every caller acquires market locks before user locks, and each kind in
+    sorted ID order, so two threads can never wait on each other in a
+    cycle. Bets on different markets by different users run in parallel;
+    only orders that share a market or a user serialize. The store's own
+    lock in db is always taken last, for single mutations.
+
+    The locks are reentrant, so code already holding a market's lock can
+    call helpers that take it again. Locks are created on first use and
+    kept for the life of the process.
+    """
+
+    def __init__(self):
+        self._market_locks = {}  # market_id -> RLock
+        self._user_locks = {}    # user_id -> RLock
+
+    @staticmethod
+    def _lock(table, key):
+        lock = table.get(key)
+        if lock is None:
+            # setdefault is atomic, so racing first users share one lock
+            lock = table.setdefault(key, threading.RLock())
+        return lock
+
+    @contextmanager
+    def hold(self, market_ids=(), user_ids=()):
+        """
+        Hold the locks of some markets and users for the duration of a block
+
+        Args:
+            market_ids: Markets to lock
+            user_ids: Users to lock
+        """
+        ordered = [self._lock(self._market_locks, market_id) for market_id in sorted(set(market_ids))]
+        ordered += [self._lock(self._user_locks, user_id) for user_id in sorted(set(user_ids))]
+        for lock in ordered:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(ordered):
+                lock.release()
+
+
+# Process-wide locks shared by db and the API
+locks = LockManager()
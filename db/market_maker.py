@@ -1,8 +1,39 @@
 """
 Market Maker using Logarithmic Market Scoring Rule (LMSR)
+
+Pricing runs entirely in floats using log-sum-exp forms, so share totals far
+beyond 710 x liquidity (where e^(q/b) overflows) still price correctly.
+Makers work in dollars; the registry loads and syncs them from the store's
+integer micro-unit share totals, and the API turns each fill into
+micro-units once.
 """
 import math
-from decimal import Decimal
+
+import numpy as np
+
+from .money import MICROS, to_dollars
+
+# Share solvers for simulate_bet. 'closed_form' inverts the LMSR cost function
+# analytically; 'bisection' is the original numeric search, kept as a fallback
+# that can be used to cross-check the analytic fills.
+SOLVERS = ('closed_form', 'bisection')
+DEFAULT_SOLVER = 'closed_form'
+# Relative width at which the bisection solver stops narrowing its bracket
+BISECTION_TOLERANCE = 1e-12
+
+
+def _softplus(x):
+    """Numerically stable ln(1 + e^x)"""
+    return max(x, 0.0) + math.log1p(math.exp(-abs(x)))
+
+
+def _sigmoid(x):
+    """Numerically stable 1 / (1 + e^-x)"""
+    if x >= 0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
+
 
 class MarketMaker:
     """
@@ -11,37 +42,45 @@ class MarketMaker:
     This provides instant liquidity and automatic price discovery
     """
 
-    def __init__(self, liquidity=100):
+    def __init__(self, liquidity=100, solver=DEFAULT_SOLVER):
         """
         Initialize market maker
 
         Args:
             liquidity: Liquidity parameter (higher = more stable prices)
+            solver: Share solver, one of SOLVERS
         """
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver: {solver}")
+
         self.liquidity = liquidity
-        self.yes_shares = Decimal('0')
-        self.no_shares = Decimal('0')
+        self.solver = solver
+        self.yes_shares = 0.0
+        self.no_shares = 0.0
 
     def _cost_function(self, yes_shares, no_shares):
         """
         LMSR cost function: C(q) = b * ln(e^(q_yes/b) + e^(q_no/b))
 
+        Evaluated as max(q) + b * ln(1 + e^(-|q_yes - q_no|/b)).
+
         Args:
             yes_shares: Number of YES shares
             no_shares: Number of NO shares
 
         Returns:
-            Cost in dollars
+            Cost in dollars (float)
         """
         b = self.liquidity
+        return max(yes_shares, no_shares) + b * math.log1p(math.exp(-abs(yes_shares - no_shares) / b))
 
-        # Convert to float for math operations
-        yes_exp = math.exp(float(yes_shares) / b)
-        no_exp = math.exp(float(no_shares) / b)
-
-        cost = b * math.log(yes_exp + no_exp)
-
-        return Decimal(str(cost))
+    def _odds_for(self, yes_shares, no_shares):
+        """YES/NO odds for the given share totals"""
+        yes_odds = _sigmoid((yes_shares - no_shares) / self.liquidity)
+        return {
+            'YES': yes_odds,
+            'NO': 1.0 - yes_odds
+        }
 
     def get_odds(self):
         """
@@ -50,64 +89,95 @@ class MarketMaker:
         Returns:
             dict with 'YES' and 'NO' odds (0 to 1)
         """
-        b = self.liquidity
-
-        yes_exp = math.exp(float(self.yes_shares) / b)
-        no_exp = math.exp(float(self.no_shares) / b)
+        return self._odds_for(self.yes_shares, self.no_shares)
 
-        total = yes_exp + no_exp
+    def _solve_shares_closed_form(self, outcome, amount):
+        """
+        Solve for the shares an amount buys using the analytic LMSR inverse
 
-        yes_odds = yes_exp / total
-        no_odds = no_exp / total
+        Buying s shares of one outcome for amount a means
+        C(q_self + s, q_other) - C(q_self, q_other) = a, which solves to:
 
-        return {
-            'YES': yes_odds,
-            'NO': no_odds
-        }
+            s = a + b * ln(1 + (1 - e^(-a/b)) * e^((q_other - q_self)/b))
 
-    def simulate_bet(self, outcome, amount):
-        """
-        Simulate a bet without changing state
+        The log term is evaluated as a softplus so large share imbalances
+        cannot overflow.
 
         Args:
             outcome: 'YES' or 'NO'
             amount: Bet amount in dollars
 
         Returns:
-            dict with bet details
+            Number of shares (float)
         """
-        # Calculate current cost
-        current_cost = self._cost_function(self.yes_shares, self.no_shares)
+        a = float(amount)
+        if a <= 0:
+            return 0.0
 
-        # Calculate shares to buy
-        # We need to find how many shares can be bought with the given amount
-        # Using binary search to find the right number of shares
+        b = self.liquidity
+        if outcome == 'YES':
+            q_self, q_other = self.yes_shares, self.no_shares
+        else:
+            q_self, q_other = self.no_shares, self.yes_shares
 
-        left, right = 0.0, float(amount) * 10  # Upper bound is generous
-        shares = 0.0
+        x = math.log(-math.expm1(-a / b)) + (q_other - q_self) / b
+        return a + b * _softplus(x)
 
-        for _ in range(100):  # Binary search iterations
-            mid = (left + right) / 2
+    def _solve_shares_bisection(self, outcome, amount):
+        """
+        Solve for the shares an amount buys by binary search on the cost function
 
+        The upper bound starts at the amount (a share never costs more than
+        $1) and doubles until it buys at least the amount, so skewed markets
+        where shares are cheap still bracket the answer. The search then
+        halves the bracket down to a relative tolerance.
+
+        Args:
+            outcome: 'YES' or 'NO'
+            amount: Bet amount in dollars
+
+        Returns:
+            Number of shares (float); positive for any positive amount
+        """
+        a = float(amount)
+        if a <= 0:
+            return 0.0
+
+        current_cost = self._cost_function(self.yes_shares, self.no_shares)
+
+        def cost_of(shares):
             if outcome == 'YES':
-                new_yes = float(self.yes_shares) + mid
-                new_no = float(self.no_shares)
-            else:
-                new_yes = float(self.yes_shares)
-                new_no = float(self.no_shares) + mid
+                return self._cost_function(self.yes_shares + shares, self.no_shares) - current_cost
+            return self._cost_function(self.yes_shares, self.no_shares + shares) - current_cost
 
-            new_cost = self._cost_function(Decimal(str(new_yes)), Decimal(str(new_no)))
-            cost_diff = float(new_cost - current_cost)
+        left, right = 0.0, a
+        while cost_of(right) < a:
+            left, right = right, right * 2
 
-            if abs(cost_diff - float(amount)) < 0.01:
-                shares = mid
-                break
-            elif cost_diff < float(amount):
+        while right - left > BISECTION_TOLERANCE * right:
+            mid = (left + right) / 2
+            if cost_of(mid) < a:
                 left = mid
             else:
                 right = mid
 
-        shares = Decimal(str(shares))
+        return (left + right) / 2
+
+    def simulate_bet(self, outcome, amount):
+        """
+        Simulate a bet without changing state
+
+        Args:
+            outcome: 'YES' or 'NO'
+            amount: Bet amount in dollars
+
+        Returns:
+            dict with bet details
+        """
+        if self.solver == 'closed_form':
+            shares = self._solve_shares_closed_form(outcome, amount)
+        else:
+            shares = self._solve_shares_bisection(outcome, amount)
 
         # Calculate new state
         if outcome == 'YES':
@@ -117,27 +187,95 @@ class MarketMaker:
             new_yes_shares = self.yes_shares
             new_no_shares = self.no_shares + shares
 
-        # Calculate new odds
-        yes_exp = math.exp(float(new_yes_shares) / self.liquidity)
-        no_exp = math.exp(float(new_no_shares) / self.liquidity)
-        total = yes_exp + no_exp
-
-        new_odds = {
-            'YES': yes_exp / total,
-            'NO': no_exp / total
-        }
-
         # Calculate effective price and potential payout
-        effective_price = float(amount) / float(shares) if shares > 0 else 0
-        potential_payout = float(shares)  # Each share pays $1 if wins
+        effective_price = float(amount) / shares if shares > 0 else 0
+        potential_payout = shares  # Each share pays $1 if wins
 
         return {
-            'shares': float(shares),
+            'shares': shares,
             'effective_price': effective_price,
             'potential_payout': potential_payout,
-            'new_odds': new_odds,
-            'yes_shares': float(new_yes_shares),
-            'no_shares': float(new_no_shares)
+            'new_odds': self._odds_for(new_yes_shares, new_no_shares),
+            'yes_shares': new_yes_shares,
+            'no_shares': new_no_shares
+        }
+
+    def simulate_sell(self, outcome, shares):
+        """
+        Simulate selling shares back to the market maker without changing state
+
+        Proceeds are the analytic cost difference C(q) - C(q - s e_i):
+
+            proceeds = -b * ln(1 - p_i * (1 - e^(-s/b)))
+
+        where p_i is the current price of the outcome being sold.
+
+        Args:
+            outcome: 'YES' or 'NO'
+            shares: Number of shares to sell
+
+        Returns:
+            dict with sale details
+        """
+        b = self.liquidity
+        s = float(shares)
+        price = self.get_odds()[outcome]
+        proceeds = -b * math.log1p(price * math.expm1(-s / b)) if s > 0 else 0.0
+
+        if outcome == 'YES':
+            new_yes_shares, new_no_shares = self.yes_shares - s, self.no_shares
+        else:
+            new_yes_shares, new_no_shares = self.yes_shares, self.no_shares - s
+
+        return {
+            'shares': s,
+            'proceeds': proceeds,
+            'effective_price': proceeds / s if s > 0 else 0,
+            'new_odds': self._odds_for(new_yes_shares, new_no_shares),
+            'yes_shares': new_yes_shares,
+            'no_shares': new_no_shares
+        }
+
+    def quote_batch(self, amounts):
+        """
+        Quote many bet amounts for both outcomes in one vectorized pass
+
+        Uses the same analytic inverse as the closed-form solver, broadcast
+        over a (2, N) grid of outcomes by amounts.
+
+        Args:
+            amounts: Sequence of bet amounts in dollars
+
+        Returns:
+            dict keyed by 'YES' and 'NO', each with NumPy arrays 'shares',
+            'effective_price' and 'new_odds' ({'YES': array, 'NO': array})
+        """
+        b = float(self.liquidity)
+        a = np.asarray(amounts, dtype=float)
+        yes, no = self.yes_shares, self.no_shares
+
+        # Row 0 buys YES, row 1 buys NO: (q_other - q_self) / b per row
+        spread = np.array([[no - yes], [yes - no]]) / b
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_spend = np.log(-np.expm1(-a / b))
+            shares = np.where(a > 0, a + b * np.logaddexp(0.0, log_spend + spread), 0.0)
+            effective_price = np.where(shares > 0, a / shares, 0.0)
+
+        # Post-trade probability of the bought outcome: sigmoid((q_self + s - q_other) / b)
+        bought_odds = np.exp(-np.logaddexp(0.0, spread - shares / b))
+        yes_odds = np.vstack([bought_odds[0], 1.0 - bought_odds[1]])
+
+        return {
+            outcome: {
+                'shares': shares[row],
+                'effective_price': effective_price[row],
+                'new_odds': {
+                    'YES': yes_odds[row],
+                    'NO': 1.0 - yes_odds[row]
+                }
+            }
+            for row, outcome in enumerate(('YES', 'NO'))
         }
 
     def execute_bet(self, outcome, amount):
@@ -154,13 +292,241 @@ class MarketMaker:
         result = self.simulate_bet(outcome, amount)
 
         # Update state
-        self.yes_shares = Decimal(str(result['yes_shares']))
-        self.no_shares = Decimal(str(result['no_shares']))
+        self.yes_shares = result['yes_shares']
+        self.no_shares = result['no_shares']
+
+        return result
+
+    def execute_sell(self, outcome, shares):
+        """
+        Sell shares back to the market maker and update state
+
+        Args:
+            outcome: 'YES' or 'NO'
+            shares: Number of shares to sell
+
+        Returns:
+            dict with sale details
+        """
+        result = self.simulate_sell(outcome, shares)
+
+        self.yes_shares = result['yes_shares']
+        self.no_shares = result['no_shares']
 
         return result
 
 
-def restore_market(yes_shares, no_shares, liquidity=100):
+class CategoricalMarketMaker:
+    """
+    k-outcome LMSR market maker
+
+    Share totals are held in a NumPy vector. Prices are softmax(q/b) and the
+    cost function is b * logsumexp(q/b), so every quote is a single
+    vectorized O(k) pass however many outcomes the market has.
+    """
+
+    def __init__(self, outcomes, liquidity=100):
+        """
+        Initialize market maker
+
+        Args:
+            outcomes: List of outcome labels (at least two)
+            liquidity: Liquidity parameter (higher = more stable prices)
+        """
+        if len(outcomes) < 2:
+            raise ValueError("At least two outcomes required")
+
+        self.outcomes = list(outcomes)
+        self.liquidity = liquidity
+        self.shares = np.zeros(len(self.outcomes))
+        self._index = {outcome: i for i, outcome in enumerate(self.outcomes)}
+
+    def _log_prices(self, shares):
+        """Log softmax of shares / b"""
+        x = shares / self.liquidity
+        m = x.max()
+        return x - (m + np.log(np.exp(x - m).sum()))
+
+    def _cost_function(self, shares):
+        """
+        LMSR cost function: C(q) = b * ln(sum_i e^(q_i/b))
+
+        Args:
+            shares: Vector of share totals
+
+        Returns:
+            Cost in dollars (float)
+        """
+        x = shares / self.liquidity
+        m = x.max()
+        return float(self.liquidity * (m + np.log(np.exp(x - m).sum())))
+
+    def _odds_for(self, shares):
+        """Outcome odds for the given share vector"""
+        return dict(zip(self.outcomes, np.exp(self._log_prices(shares)).tolist()))
+
+    def get_odds(self):
+        """
+        Get current odds for every outcome
+
+        Returns:
+            dict mapping outcome label to odds (0 to 1)
+        """
+        return self._odds_for(self.shares)
+
+    def _shares_for(self, log_prices, amounts):
+        """
+        Shares bought for amounts at the given log prices (broadcasting)
+
+        Buying outcome i for amount a solves
+        C(q + s e_i) - C(q) = a, giving:
+
+            s = b * (ln(e^(a/b) - 1 + p_i) - ln p_i)
+        """
+        b = self.liquidity
+        t = np.asarray(amounts, dtype=float) / b
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_expm1 = t + np.log(-np.expm1(-t))
+            shares = b * (np.logaddexp(log_expm1, log_prices) - log_prices)
+        return np.where(t > 0, shares, 0.0)
+
+    def quote_all(self, amount):
+        """
+        Shares an amount buys for each outcome, in one vectorized pass
+
+        Args:
+            amount: Bet amount in dollars
+
+        Returns:
+            NumPy array of shares, aligned with self.outcomes
+        """
+        return self._shares_for(self._log_prices(self.shares), amount)
+
+    def simulate_bet(self, outcome, amount):
+        """
+        Simulate a bet without changing state
+
+        Args:
+            outcome: Outcome label
+            amount: Bet amount in dollars
+
+        Returns:
+            dict with bet details
+        """
+        i = self._index[outcome]
+        log_prices = self._log_prices(self.shares)
+        shares = float(self._shares_for(log_prices[i], amount))
+
+        new_shares = self.shares.copy()
+        new_shares[i] += shares
+
+        # Each share pays $1 if its outcome wins
+        effective_price = float(amount) / shares if shares > 0 else 0
+
+        return {
+            'shares': shares,
+            'effective_price': effective_price,
+            'potential_payout': shares,
+            'new_odds': self._odds_for(new_shares),
+            'outcome_shares': new_shares.tolist()
+        }
+
+    def simulate_sell(self, outcome, shares):
+        """
+        Simulate selling shares back to the market maker without changing state
+
+        Proceeds are the analytic cost difference C(q) - C(q - s e_i):
+
+            proceeds = -b * ln(1 - p_i * (1 - e^(-s/b)))
+
+        Args:
+            outcome: Outcome label
+            shares: Number of shares to sell
+
+        Returns:
+            dict with sale details
+        """
+        i = self._index[outcome]
+        b = self.liquidity
+        s = float(shares)
+        price = float(np.exp(self._log_prices(self.shares)[i]))
+        proceeds = -b * math.log1p(price * math.expm1(-s / b)) if s > 0 else 0.0
+
+        new_shares = self.shares.copy()
+        new_shares[i] -= s
+
+        return {
+            'shares': s,
+            'proceeds': proceeds,
+            'effective_price': proceeds / s if s > 0 else 0,
+            'new_odds': self._odds_for(new_shares),
+            'outcome_shares': new_shares.tolist()
+        }
+
+    def quote_batch(self, amounts):
+        """
+        Quote many bet amounts for every outcome in one vectorized pass
+
+        Args:
+            amounts: Sequence of bet amounts in dollars
+
+        Returns:
+            dict keyed by outcome, each with NumPy arrays 'shares',
+            'effective_price' and 'new_price' (post-trade odds of that outcome)
+        """
+        a = np.asarray(amounts, dtype=float)
+        log_prices = self._log_prices(self.shares)[:, None]
+
+        # (k, N) grid of outcomes by amounts
+        shares = self._shares_for(log_prices, a)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            effective_price = np.where(shares > 0, a / shares, 0.0)
+
+        # Spending a rescales the normalizer by e^(a/b), so every other
+        # outcome's price shrinks by e^(-a/b)
+        new_price = 1.0 - (1.0 - np.exp(log_prices)) * np.exp(-a / self.liquidity)
+
+        return {
+            outcome: {
+                'shares': shares[row],
+                'effective_price': effective_price[row],
+                'new_price': new_price[row]
+            }
+            for row, outcome in enumerate(self.outcomes)
+        }
+
+    def execute_bet(self, outcome, amount):
+        """
+        Execute a bet and update state
+
+        Args:
+            outcome: Outcome label
+            amount: Bet amount in dollars
+
+        Returns:
+            dict with bet details
+        """
+        result = self.simulate_bet(outcome, amount)
+        self.shares = np.asarray(result['outcome_shares'])
+        return result
+
+    def execute_sell(self, outcome, shares):
+        """
+        Sell shares back to the market maker and update state
+
+        Args:
+            outcome: Outcome label
+            shares: Number of shares to sell
+
+        Returns:
+            dict with sale details
+        """
+        result = self.simulate_sell(outcome, shares)
+        self.shares = np.asarray(result['outcome_shares'])
+        return result
+
+
+def restore_market(yes_shares, no_shares, liquidity=100, solver=DEFAULT_SOLVER):
     """
     Restore a market maker from saved state
 
@@ -168,11 +534,146 @@ def restore_market(yes_shares, no_shares, liquidity=100):
         yes_shares: Current YES shares
         no_shares: Current NO shares
         liquidity: Liquidity parameter
+        solver: Share solver, one of SOLVERS
 
     Returns:
         MarketMaker instance
     """
-    mm = MarketMaker(liquidity=liquidity)
-    mm.yes_shares = Decimal(str(yes_shares))
-    mm.no_shares = Decimal(str(no_shares))
+    mm = MarketMaker(liquidity=liquidity, solver=solver)
+    mm.yes_shares = float(yes_shares)
+    mm.no_shares = float(no_shares)
+    return mm
+
+
+def restore_categorical_market(outcomes, outcome_shares, liquidity=100):
+    """
+    Restore a k-outcome market maker from saved state
+
+    Args:
+        outcomes: Outcome labels
+        outcome_shares: Current share totals, aligned with outcomes
+        liquidity: Liquidity parameter
+
+    Returns:
+        CategoricalMarketMaker instance
+    """
+    mm = CategoricalMarketMaker(outcomes, liquidity=liquidity)
+    mm.shares = np.array([float(q) for q in outcome_shares])
     return mm
+
+
+class MarketMakerRegistry:
+    """
+    Live MarketMaker per market, keyed by market ID
+
+    Makers are built lazily from the stored share totals on first use.
+    db.update_market_odds keeps a registered maker in sync with the ledger
+    and db.resolve_market evicts it, so the betting path never has to
+    rebuild a maker from the market record. Share totals come in as the
+    store's micro-units, so a synced maker prices off exactly the shares
+    the bets recorded.
+
+    When other processes write the same store (shared is True), trades
+    they make never reach this process's makers, so get() first checks a
+    maker against the record it is handed and resyncs it if they differ.
+    """
+
+    def __init__(self, liquidity=100, solver=DEFAULT_SOLVER):
+        """
+        Initialize registry
+
+        Args:
+            liquidity: Liquidity parameter for newly built makers
+            solver: Share solver for newly built makers, one of SOLVERS
+        """
+        self.liquidity = liquidity
+        self.solver = solver
+        self.shared = False
+        self._makers = {}
+
+    def get(self, market):
+        """
+        Get the live market maker for a market, building it if needed
+
+        Args:
+            market: Market dict from db
+
+        Returns:
+            MarketMaker, or CategoricalMarketMaker for k-outcome markets
+        """
+        mm = self._makers.get(market['id'])
+        if mm is None:
+            if market.get('outcome_shares') is not None:
+                mm = restore_categorical_market(
+                    market['outcomes'],
+                    [to_dollars(q) for q in market['outcome_shares']],
+                    liquidity=self.liquidity
+                )
+            else:
+                mm = restore_market(
+                    to_dollars(market['total_yes_shares']),
+                    to_dollars(market['total_no_shares']),
+                    liquidity=self.liquidity,
+                    solver=self.solver
+                )
+            self._makers[market['id']] = mm
+        elif self.shared:
+            self._resync(mm, market)
+        return mm
+
+    @staticmethod
+    def _resync(mm, market):
+        """Set a maker's share totals to a market record's if they differ"""
+        if market.get('outcome_shares') is not None:
+            shares = np.array(market['outcome_shares'], dtype=float) / MICROS
+            if not np.array_equal(mm.shares, shares):
+                mm.shares = shares
+        else:
+            shares = (to_dollars(market['total_yes_shares']), to_dollars(market['total_no_shares']))
+            if (mm.yes_shares, mm.no_shares) != shares:
+                mm.yes_shares, mm.no_shares = shares
+
+    def sync(self, market_id, yes_shares, no_shares):
+        """
+        Set a registered maker's share totals (no-op if not registered)
+
+        Args:
+            market_id: Market ID
+            yes_shares: New YES share total (micro-shares)
+            no_shares: New NO share total (micro-shares)
+        """
+        mm = self._makers.get(market_id)
+        if mm is not None:
+            mm.yes_shares = to_dollars(yes_shares)
+            mm.no_shares = to_dollars(no_shares)
+
+    def sync_outcomes(self, market_id, outcome_shares):
+        """
+        Set a registered k-outcome maker's share vector (no-op if not registered)
+
+        Args:
+            market_id: Market ID
+            outcome_shares: New share totals in micro-shares, aligned with
+                the market's outcomes
+        """
+        mm = self._makers.get(market_id)
+        if mm is not None:
+            mm.shares = np.array(outcome_shares, dtype=float) / MICROS
+
+    def evict(self, market_id):
+        """Drop the maker for a market"""
+        self._makers.pop(market_id, None)
+
+    def clear(self):
+        """Drop all makers"""
+        self._makers.clear()
+
+    def __contains__(self, market_id):
+        return market_id in self._makers
+
+    def __len__(self):
+        return len(self._makers)
+
+
+# Process-wide registry used by db and the API
+market_makers = MarketMakerRegistry()
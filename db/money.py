@@ -0,0 +1,53 @@
+"""
+Fixed-point money: integer micro-units
+
+Balances, amounts, payouts and share counts are stored as whole
+millionths of a dollar (or of a share) in plain ints, so sums are exact
+and cheap and records carry no Decimal objects. Values become dollars
+only at the edges: request parsing goes through to_micros and JSON
+responses through to_dollars.
+"""
+from decimal import ROUND_HALF_EVEN, Decimal
+
+# Micro-units per dollar (and per share)
+MICROS = 1_000_000
+
+
+def to_micros(value):
+    """
+    Convert a dollar (or share) amount to integer micro-units
+
+    Floats round to the nearest micro-unit; strings and Decimals convert
+    exactly, rounding half to even past the sixth decimal place.
+
+    Args:
+        value: int, float, str or Decimal amount
+
+    Returns:
+        int micro-units
+    """
+    if isinstance(value, int):
+        return value * MICROS
+    if isinstance(value, float):
+        return round(value * MICROS)
+    return int((Decimal(value) * MICROS).to_integral_value(ROUND_HALF_EVEN))
+
+
+def to_dollars(micros):
+    """
+    Convert integer micro-units to a float amount for JSON or pricing
+
+    Args:
+        micros: int micro-units (None passes through)
+
+    Returns:
+        float dollars (or shares), or None
+    """
+    if micros is None:
+        return None
+    return micros / MICROS
+
+
+def format_dollars(micros):
+    """Micro-units as a '$12.34' display string"""
+    return f"${micros / MICROS:,.2f}"
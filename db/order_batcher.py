@@ -0,0 +1,113 @@
+"""
+Micro-batched order execution per market
+"""
+import threading
+import time
+from collections import Counter
+
+
+class _PendingOrder:
+    """An order waiting in a batch, plus the slot its result is published to"""
+
+    __slots__ = ('order', 'result', 'error', 'done')
+
+    def __init__(self, order):
+        self.order = order
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class OrderBatcher:
+    """
+    Coalesces orders for the same market that arrive within a short window
+
+    The first order for a market becomes the batch leader: it waits
+    `window` seconds, takes every order queued for that market and runs the
+    batch executor once with them in arrival order. The other callers block
+    until the leader publishes their individual results. Batches for the
+    same market never run concurrently.
+    """
+
+    def __init__(self, execute_batch, window=0.005):
+        """
+        Initialize batcher
+
+        Args:
+            execute_batch: Callable (market_id, orders) -> list of results,
+                one per order, in the same order
+            window: Seconds the leader waits for more orders
+        """
+        self.execute_batch = execute_batch
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = {}        # market_id -> [_PendingOrder]
+        self._market_locks = {}   # market_id -> Lock held while a batch runs
+        self._orders = Counter()
+        self._batches = Counter()
+
+    def submit(self, market_id, order):
+        """
+        Queue an order and wait for its fill
+
+        Args:
+            market_id: Market the order trades on
+            order: Order payload passed through to execute_batch
+
+        Returns:
+            This order's result from execute_batch
+        """
+        entry = _PendingOrder(order)
+
+        with self._lock:
+            queue = self._pending.get(market_id)
+            is_leader = queue is None
+            if is_leader:
+                queue = self._pending[market_id] = []
+                market_lock = self._market_locks.setdefault(market_id, threading.Lock())
+            queue.append(entry)
+
+        if is_leader:
+            time.sleep(self.window)
+            with market_lock:
+                with self._lock:
+                    batch = self._pending.pop(market_id)
+                self._run(market_id, batch)
+
+        entry.done.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.result
+
+    def _run(self, market_id, batch):
+        """Execute one batch and publish each order's result"""
+        try:
+            results = self.execute_batch(market_id, [entry.order for entry in batch])
+            for entry, result in zip(batch, results):
+                entry.result = result
+        except Exception as e:
+            for entry in batch:
+                entry.error = e
+        finally:
+            with self._lock:
+                self._orders[market_id] += len(batch)
+                self._batches[market_id] += 1
+            for entry in batch:
+                entry.done.set()
+
+    def stats(self):
+        """
+        Orders and batches executed per market
+
+        Returns:
+            dict of market_id -> {'orders', 'batches', 'avg_batch_size'}
+        """
+        with self._lock:
+            return {
+                market_id: {
+                    'orders': self._orders[market_id],
+                    'batches': batches,
+                    'avg_batch_size': self._orders[market_id] / batches
+                }
+                for market_id, batches in self._batches.items()
+            }
@@ -0,0 +1,166 @@
+"""
+Salted, tunable-cost password hashing on a bounded worker pool
+
+Hashes are stored as self-describing records, so the scheme and cost can
+change without invalidating existing passwords:
+
+    $scrypt$ln=14,r=8,p=1$<salt>$<hash>
+    $pbkdf2-sha256$i=19$<salt>$<hash>
+
+(salt and hash in unpadded URL-safe base64; ln and i are log2 of the
+scrypt N and PBKDF2 iteration count). Bare 64-digit hex strings are the
+unsalted SHA-256 hashes written before these records existed; they still
+verify, and verify() flags them, like records at an older cost, for
+rehashing.
+
+The key derivation functions release the GIL, so a small thread pool runs
+them in parallel. A request thread waits for its own hash, but only a
+bounded number of hashes may be running or queued at once; past that,
+calls fail fast with HasherBusy rather than piling up behind a login burst.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 'scrypt' or 'pbkdf2-sha256'
+PASSWORD_SCHEME = os.getenv('BETTIT_PASSWORD_SCHEME', 'scrypt')
+# log2 of the work factor (scrypt N, or PBKDF2 iterations); empty: the scheme's default
+PASSWORD_COST = os.getenv('BETTIT_PASSWORD_COST', '')
+# Hashes running at once, and hashes allowed to wait for a worker
+HASH_WORKERS = int(os.getenv('BETTIT_HASH_WORKERS', str(os.cpu_count() or 1)))
+HASH_QUEUE_DEPTH = int(os.getenv('BETTIT_HASH_QUEUE_DEPTH', '32'))
+
+# Default log2 cost per scheme: scrypt N = 2**14 (16 MiB at r=8),
+# PBKDF2-SHA256 at 2**19 (~524k) iterations
+DEFAULT_COST = {'scrypt': 14, 'pbkdf2-sha256': 19}
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+class HasherBusy(RuntimeError):
+    """Raised when the hashing pool's queue is full"""
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _derive(scheme, params, password, salt):
+    """Raw key for a password under a scheme and its parsed parameters"""
+    if scheme == 'scrypt':
+        n = 1 << params['ln']
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=params['r'], p=params['p'],
+                              maxmem=256 * n * params['r'] + (1 << 20), dklen=HASH_BYTES)
+    if scheme == 'pbkdf2-sha256':
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 1 << params['i'], HASH_BYTES)
+    raise ValueError(f"Unknown password scheme {scheme!r}")
+
+
+def _parse(record):
+    """(scheme, params, salt, hash) of a record; raises ValueError if malformed"""
+    try:
+        _, scheme, params, salt, digest = record.split('$')
+        params = {key: int(value) for key, value in (item.split('=') for item in params.split(','))}
+        return scheme, params, _b64decode(salt), _b64decode(digest)
+    except (ValueError, TypeError):
+        raise ValueError('Malformed password hash')
+
+
+def is_legacy_hash(record):
+    """True for an unsalted SHA-256 hex digest from before hash records"""
+    return len(record) == 64 and not record.startswith('$')
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a bounded thread pool
+
+    scheme and cost are read when each hash is made, so changing them
+    takes effect for new hashes and marks older records for rehashing.
+    """
+
+    def __init__(self, scheme=PASSWORD_SCHEME, cost=None, workers=HASH_WORKERS, queue_depth=HASH_QUEUE_DEPTH):
+        if scheme not in DEFAULT_COST:
+            raise ValueError(f"Unknown password scheme {scheme!r}")
+        self.scheme = scheme
+        self.cost = DEFAULT_COST[scheme] if cost is None else cost
+        self.workers = workers
+        # Permits for hashes running or waiting; none left means busy
+        self._permits = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _params(self):
+        if self.scheme == 'scrypt':
+            return {'ln': self.cost, 'r': SCRYPT_R, 'p': SCRYPT_P}
+        return {'i': self.cost}
+
+    def _submit(self, fn, *args):
+        """Run fn on the pool and wait for its result"""
+        if not self._permits.acquire(blocking=False):
+            raise HasherBusy('Too many password checks in progress')
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hasher')
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._permits.release()
+            raise
+        future.add_done_callback(lambda _: self._permits.release())
+        return future.result()
+
+    def _hash(self, password):
+        scheme, params = self.scheme, self._params()
+        salt = secrets.token_bytes(SALT_BYTES)
+        digest = _derive(scheme, params, password, salt)
+        encoded = ','.join(f"{key}={value}" for key, value in params.items())
+        return f"${scheme}${encoded}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def _verify(self, password, record):
+        if is_legacy_hash(record):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, record), True
+        scheme, params, salt, digest = _parse(record)
+        ok = hmac.compare_digest(_derive(scheme, params, password, salt), digest)
+        return ok, (scheme, params) != (self.scheme, self._params())
+
+    def hash(self, password):
+        """
+        Hash a password under the current scheme and cost
+
+        Returns:
+            Hash record string
+
+        Raises:
+            HasherBusy: if the pool's queue is full
+        """
+        return self._submit(self._hash, password)
+
+    def verify(self, password, record):
+        """
+        Check a password against a stored record
+
+        Returns:
+            (matches, needs_rehash): needs_rehash is True when the record
+            is legacy or uses another scheme or cost than the current one
+
+        Raises:
+            HasherBusy: if the pool's queue is full
+            ValueError: if the record is malformed
+        """
+        return self._submit(self._verify, password, record)
+
+
+# Process-wide hasher used by auth
+hasher = PasswordHasher(cost=int(PASSWORD_COST) if PASSWORD_COST else None)
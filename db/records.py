@@ -0,0 +1,226 @@
+"""
+Compact record types for the in-memory store
+"""
+from .money import to_dollars
+
+
+class Record:
+    """
+    Fixed-field record with __slots__ storage and dict-style access
+
+    Records read and write like the dicts the store used to hold
+    (record['balance'], record.get('community'), dict(record), {**record}),
+    but without a per-instance __dict__ or hash table. Only the declared
+    fields exist; use to_dict() where a real dict is needed, and to_json()
+    for responses, which also turns the money fields (integer micro-units,
+    see money.py) into dollars.
+    """
+
+    __slots__ = ()
+    _fields = frozenset()
+    _money = ()  # fields holding micro-units (ints, or lists/dicts of them)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = frozenset(cls.__slots__)
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise KeyError(f"{type(self).__name__} has no field {next(iter(fields))!r}")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a mapping; missing fields default to None"""
+        return cls(**data)
+
+    @classmethod
+    def from_values(cls, *values):
+        """Build a record from values given in field order"""
+        record = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(record, name, value)
+        return record
+
+    def __reduce__(self):
+        # Positional values pickle far smaller and faster than slot state
+        return (type(self).from_values, tuple(getattr(self, name) for name in self.__slots__))
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.values() == other.values()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            return getattr(self, key)
+        return default
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def values(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.__slots__]
+
+    def to_dict(self):
+        """Plain dict copy of the record"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_json(self):
+        """Dict copy of the record with money fields in dollars"""
+        return self.json_copy(self)
+
+    @classmethod
+    def json_copy(cls, data):
+        """
+        Dict copy of a record, or of a mapping with this record's fields,
+        with the money fields it has converted to dollars
+        """
+        result = data.to_dict() if isinstance(data, (Record, UserView)) else dict(data)
+        for name in cls._money:
+            value = result.get(name)
+            if isinstance(value, list):
+                result[name] = [to_dollars(v) for v in value]
+            elif isinstance(value, dict):
+                result[name] = {k: to_dollars(v) for k, v in value.items()}
+            elif name in result:
+                result[name] = to_dollars(value)
+        return result
+
+
+class Market(Record):
+    """A prediction market (binary, or k-outcome when outcome_shares is set)"""
+
+    __slots__ = (
+        'id', 'question', 'description', 'resolution_criteria', 'resolution_date',
+        'created_by', 'source_article_url', 'source_article_title', 'community',
+        'image_url', 'market_type', 'source_metadata', 'status', 'outcomes',
+        'yes_odds', 'no_odds', 'outcome_odds', 'total_pool', 'total_yes_shares',
+        'total_no_shares', 'outcome_shares', 'created_at', 'resolved_at', 'outcome'
+    )
+    _money = ('total_pool', 'total_yes_shares', 'total_no_shares', 'outcome_shares')
+
+
+class Bet(Record):
+    """A buy, or a sell recorded with negative amount and shares"""
+
+    __slots__ = (
+        'id', 'user_id', 'market_id', 'outcome', 'side', 'amount', 'shares', 'odds',
+        'potential_payout', 'status', 'created_at', 'settled_at', 'actual_payout'
+    )
+    _money = ('amount', 'shares', 'potential_payout', 'actual_payout')
+
+
+class User(Record):
+    """A user account, including its credentials"""
+
+    __slots__ = (
+        'id', 'username', 'email', 'password_hash', 'display_name', 'avatar_url', 'bio',
+        'balance', 'total_bets', 'total_winnings', 'win_rate', 'is_creator', 'creator_bio',
+        'created_at', 'token'
+    )
+    _money = ('balance', 'total_winnings')
+
+
+class UserView:
+    """
+    Read-only window onto a stored user that leaves out its credentials
+
+    Reads go through to the record it wraps, so they see the user as it is
+    now (a balance changed mid-request included) and nothing is copied;
+    there is no way to write through it.
+    """
+
+    __slots__ = ('_user',)
+    # Every User field but the credentials, in field order
+    _visible = tuple(name for name in User.__slots__ if name not in ('password_hash', 'token'))
+    _fields = frozenset(_visible)
+
+    def __init__(self, user):
+        self._user = user
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return self._user[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._visible)
+
+    def __len__(self):
+        return len(self._visible)
+
+    def __repr__(self):
+        return f"UserView({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            return self._user[key]
+        return default
+
+    def keys(self):
+        return list(self._visible)
+
+    def values(self):
+        return [self._user[name] for name in self._visible]
+
+    def items(self):
+        return [(name, self._user[name]) for name in self._visible]
+
+    def to_dict(self):
+        """Plain dict copy of the visible fields"""
+        return {name: self._user[name] for name in self._visible}
+
+    def to_json(self):
+        """Dict copy of the visible fields with money fields in dollars"""
+        return User.json_copy(self)
+
+
+class Transaction(Record):
+    """A balance movement"""
+
+    __slots__ = (
+        'id', 'user_id', 'type', 'amount', 'balance_after', 'market_id', 'bet_id',
+        'description', 'created_at'
+    )
+    _money = ('amount', 'balance_after')
+
+
+class Position(Record):
+    """A user's standing in one market, kept current as they trade"""
+
+    __slots__ = (
+        'user_id', 'market_id', 'shares', 'cost_basis', 'realized_payout', 'bet_count'
+    )
+    _money = ('shares', 'cost_basis', 'realized_payout')
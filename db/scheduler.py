@@ -0,0 +1,95 @@
+"""
+Closes markets to betting when their resolution date passes
+"""
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ResolutionScheduler:
+    """
+    Min-heap of open markets keyed by resolution deadline
+
+    A background thread sleeps until the earliest deadline, pops every
+    market that is due and hands them to a callback that closes them.
+    Scheduling and popping cost O(log n); nothing ever scans all markets.
+    Entries are never removed early: a market resolved before its deadline
+    is simply skipped by the callback when its entry comes due.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []  # (deadline in epoch seconds, market_id)
+        self._thread = None
+        self._on_expire = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, market_id, deadline):
+        """
+        Queue a market to close at a deadline
+
+        Args:
+            market_id: Market ID
+            deadline: Epoch seconds at which betting closes
+        """
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, market_id))
+            # Only a new earliest deadline changes how long the thread sleeps
+            if self._heap[0][1] == market_id:
+                self._cond.notify()
+
+    def pop_due(self, now=None):
+        """
+        Remove and return every market whose deadline has passed
+
+        Args:
+            now: Epoch seconds to compare against (default: current time)
+
+        Returns:
+            List of market IDs, earliest deadline first
+        """
+        now = time.time() if now is None else now
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def start(self, on_expire):
+        """
+        Start the background thread (no-op if already running)
+
+        Args:
+            on_expire: Called with a list of market IDs whenever deadlines pass
+        """
+        with self._cond:
+            self._on_expire = on_expire
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='resolution-scheduler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            due = self.pop_due()
+            if due:
+                try:
+                    self._on_expire(due)
+                except Exception:
+                    # Keep the thread alive; bets still hit the lazy expiry check
+                    logger.exception("Closing expired markets failed")
+
+
+# Process-wide scheduler fed by db
+scheduler = ResolutionScheduler()
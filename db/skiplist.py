@@ -0,0 +1,179 @@
+"""
+Indexable skip list: a sorted collection with O(log n) rank operations
+"""
+import random
+
+MAX_LEVELS = 32
+
+
+def _random_levels():
+    """Levels for a new node: 1, then one more with probability 1/2 each"""
+    levels = 1
+    while levels < MAX_LEVELS and random.random() < 0.5:
+        levels += 1
+    return levels
+
+
+class _Node:
+    """Skip list node; width[i] is the number of positions next[i] jumps"""
+
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """
+    Sorted collection of unique, mutually comparable keys
+
+    Insert, remove, rank lookup and positional access are all expected
+    O(log n); iterating k keys from any position costs O(log n + k).
+    Every link stores how many positions it skips, which is what makes
+    rank queries logarithmic.
+    """
+
+    def __init__(self):
+        self._nil = _Node(None, 0)
+        self._head = _Node(None, MAX_LEVELS)
+        self._head.next = [self._nil] * MAX_LEVELS
+        self._size = 0
+        self._height = 0  # levels in use; higher head links point at nil
+
+    @classmethod
+    def from_sorted(cls, keys):
+        """Build a skip list in O(n) from unique keys already in ascending order"""
+        skiplist = cls()
+        last = [skiplist._head] * MAX_LEVELS  # last node linked on each level
+        last_position = [0] * MAX_LEVELS
+        position = height = 0
+        for position, key in enumerate(keys, 1):
+            levels = _random_levels()
+            node = _Node(key, levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level], last_position[level] = node, position
+            height = max(height, levels)
+        for level in range(height):
+            last[level].next[level] = skiplist._nil
+            last[level].width[level] = position + 1 - last_position[level]
+        skiplist._size, skiplist._height = position, height
+        return skiplist
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        node = self._find_before(key)[0][0].next[0]
+        return node is not self._nil and node.key == key
+
+    def __iter__(self):
+        return self._iter_from_node(self._head.next[0])
+
+    def _find_before(self, key):
+        """Last node on each level whose key is < key, and ranks crossed per level"""
+        node = self._head
+        chain = [node] * MAX_LEVELS
+        steps = [0] * MAX_LEVELS
+        nil = self._nil
+        for level in range(self._height - 1, -1, -1):
+            nxt = node.next[level]
+            while nxt is not nil and nxt.key < key:
+                steps[level] += node.width[level]
+                node = nxt
+                nxt = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key):
+        """Insert a key (must not already be present)"""
+        chain, steps_at_level = self._find_before(key)
+
+        levels = _random_levels()
+        if levels > self._height:
+            for level in range(self._height, levels):
+                self._head.width[level] = self._size + 1
+            self._height = levels
+
+        new = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self._height):
+            chain[level].width[level] += 1
+
+        self._size += 1
+
+    def remove(self, key):
+        """Remove a key, raising KeyError if absent"""
+        chain, _ = self._find_before(key)
+        node = chain[0].next[0]
+        if node is self._nil or node.key != key:
+            raise KeyError(key)
+
+        levels = len(node.next)
+        for level in range(levels):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(levels, self._height):
+            chain[level].width[level] -= 1
+
+        self._size -= 1
+
+    def bisect_left(self, key):
+        """Number of keys < key"""
+        _, steps = self._find_before(key)
+        return sum(steps)
+
+    def rank(self, key):
+        """Zero-based position of key, or None if absent"""
+        chain, steps = self._find_before(key)
+        node = chain[0].next[0]
+        if node is self._nil or node.key != key:
+            return None
+        return sum(steps)
+
+    def _node_at(self, index):
+        """Node at zero-based position index (nil if past the end)"""
+        if index >= self._size:
+            return self._nil
+        node = self._head
+        remaining = index + 1
+        for level in range(self._height - 1, -1, -1):
+            while node.next[level] is not self._nil and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('skip list index out of range')
+        return self._node_at(index).key
+
+    def _iter_from_node(self, node):
+        nil = self._nil
+        while node is not nil:
+            yield node.key
+            node = node.next[0]
+
+    def iter_from(self, index):
+        """Iterate keys starting at zero-based position index"""
+        return self._iter_from_node(self._node_at(max(index, 0)))
+
+    def iter_after(self, key):
+        """Iterate keys strictly greater than key"""
+        node = self._find_before(key)[0][0].next[0]
+        if node is not self._nil and node.key == key:
+            node = node.next[0]
+        return self._iter_from_node(node)
@@ -0,0 +1,1185 @@
+"""
+SQLite database implementation
+
+Same public functions as the in-memory store in db.py, persisted to a
+SQLite file in WAL mode. db.py swaps these in when BETTIT_DB_BACKEND=sqlite;
+the file location comes from BETTIT_SQLITE_PATH. Money and share columns
+hold integer micro-units (see money.py); databases written with REAL dollar
+columns are converted in place on first open, and older token tables gain
+an expiry column.
+
+Several processes may serve from one file. A bet fill runs as a single
+write transaction (write_transaction), and cached market makers are
+checked against the market row before they price anything.
+"""
+import base64
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from .db import BINARY_OUTCOMES, is_categorical, resolution_deadline
+from .exposure import exposure
+from .locks import locks
+from .market_maker import market_makers
+from .money import MICROS, to_dollars, to_micros
+from .scheduler import scheduler
+from .tokens import MAX_TOKENS_PER_USER, TOKEN_TTL
+
+__all__ = [
+    'init_pool', 'health_check', 'write_transaction',
+    'get_market_by_id', 'list_markets', 'market_cursor', 'market_status', 'close_markets',
+    'create_market',
+    'update_market_odds', 'update_market_outcome_shares', 'resolve_market',
+    'settle_bets_for_market', 'resolve_markets',
+    'create_bet', 'get_user_position', 'get_user_positions', 'get_user_bets_on_market',
+    'get_user_active_bets',
+    'get_user_by_id', 'get_user_by_email', 'get_user_by_username',
+    'adjust_user_balance', 'update_user_balance', 'update_user_password_hash', 'increment_user_total_bets',
+    'get_leaderboard', 'get_user_rank',
+    'create_transaction', 'get_user_transactions',
+    'add_user', 'save_token', 'get_token_user', 'delete_token', 'revoke_token', 'is_token_revoked',
+]
+
+SQLITE_PATH = os.getenv('BETTIT_SQLITE_PATH', 'bettit.db')
+
+# Seconds to wait for a free pooled connection or a database lock
+POOL_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT,
+    display_name TEXT,
+    avatar_url TEXT,
+    bio TEXT,
+    balance INTEGER NOT NULL,
+    total_bets INTEGER NOT NULL DEFAULT 0,
+    total_winnings INTEGER NOT NULL DEFAULT 0,
+    win_rate REAL NOT NULL DEFAULT 0,
+    is_creator INTEGER NOT NULL DEFAULT 0,
+    creator_bio TEXT,
+    created_at TEXT,
+    token TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_balance ON users (balance, id);
+CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS markets (
+    id TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    description TEXT,
+    resolution_criteria TEXT,
+    resolution_date TEXT,
+    created_by TEXT,
+    source_article_url TEXT,
+    source_article_title TEXT,
+    community TEXT,
+    image_url TEXT,
+    market_type TEXT,
+    source_metadata TEXT,
+    status TEXT NOT NULL,
+    outcomes TEXT NOT NULL,
+    yes_odds REAL,
+    no_odds REAL,
+    outcome_odds TEXT,
+    total_pool INTEGER NOT NULL DEFAULT 0,
+    total_yes_shares INTEGER NOT NULL DEFAULT 0,
+    total_no_shares INTEGER NOT NULL DEFAULT 0,
+    outcome_shares TEXT,
+    created_at TEXT NOT NULL,
+    resolved_at TEXT,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_markets_status_community ON markets (status, community, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_markets_community ON markets (community, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_markets_created ON markets (created_at, id);
+
+CREATE TABLE IF NOT EXISTS bets (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    side TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    shares INTEGER NOT NULL,
+    odds REAL,
+    potential_payout INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    settled_at TEXT,
+    actual_payout INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_bets_user ON bets (user_id);
+CREATE INDEX IF NOT EXISTS idx_bets_market_status ON bets (market_id, status);
+CREATE INDEX IF NOT EXISTS idx_bets_user_market ON bets (user_id, market_id);
+
+CREATE TABLE IF NOT EXISTS positions (
+    user_id TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    shares INTEGER NOT NULL,
+    PRIMARY KEY (user_id, market_id, outcome)
+);
+
+CREATE TABLE IF NOT EXISTS position_totals (
+    user_id TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    cost_basis INTEGER NOT NULL DEFAULT 0,
+    realized_payout INTEGER NOT NULL DEFAULT 0,
+    bet_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, market_id)
+);
+-- Databases created before position_totals existed: derive it from their bets once
+INSERT OR IGNORE INTO position_totals (user_id, market_id, cost_basis, realized_payout, bet_count)
+SELECT user_id, market_id, SUM(amount), COALESCE(SUM(actual_payout), 0), COUNT(*) FROM bets
+WHERE NOT EXISTS (SELECT 1 FROM position_totals)
+GROUP BY user_id, market_id;
+
+CREATE TABLE IF NOT EXISTS user_communities (
+    community TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (community, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    balance_after INTEGER NOT NULL,
+    market_id TEXT,
+    bet_id TEXT,
+    description TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (user_id);
+
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    token_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens (expires_at);
+"""
+
+# Columns holding money or share counts, in micro-units since schema version 1
+_MONEY_COLUMNS = {
+    'users': ('balance', 'total_winnings'),
+    'markets': ('total_pool', 'total_yes_shares', 'total_no_shares'),
+    'bets': ('amount', 'shares', 'potential_payout', 'actual_payout'),
+    'positions': ('shares',),
+    'position_totals': ('cost_basis', 'realized_payout'),
+    'transactions': ('amount', 'balance_after'),
+}
+
+# PRAGMA user_version of a database this module has brought up to date
+SCHEMA_VERSION = 3
+
+# Fixed statement text per filter combination, so every query hits the
+# connection's prepared-statement cache
+_LIST_MARKETS_WHERE = {
+    (True, True): "status = ? AND community = ?",
+    (True, False): "status = ?",
+    (False, True): "community = ?",
+    (False, False): "1",
+}
+_LIST_MARKETS_SQL = {
+    (flags, paged): (
+        f"SELECT * FROM markets WHERE {where}"
+        + (" AND (created_at, id) < (?, ?)" if paged else "")
+        + " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+    )
+    for flags, where in _LIST_MARKETS_WHERE.items()
+    for paged in (False, True)
+}
+
+_INSERT_MARKET_SQL = """
+INSERT INTO markets (id, question, description, resolution_criteria, resolution_date, created_by,
+    source_article_url, source_article_title, community, image_url, market_type, source_metadata,
+    status, outcomes, yes_odds, no_odds, outcome_odds, total_pool, total_yes_shares, total_no_shares,
+    outcome_shares, created_at, resolved_at, outcome)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_BET_SQL = """
+INSERT INTO bets (id, user_id, market_id, outcome, side, amount, shares, odds, potential_payout,
+    status, created_at, settled_at, actual_payout)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_POSITION_SQL = """
+INSERT INTO positions (user_id, market_id, outcome, shares) VALUES (?, ?, ?, ?)
+ON CONFLICT (user_id, market_id, outcome) DO UPDATE SET shares = shares + excluded.shares
+"""
+
+_UPSERT_POSITION_TOTALS_SQL = """
+INSERT INTO position_totals (user_id, market_id, cost_basis, bet_count) VALUES (?, ?, ?, 1)
+ON CONFLICT (user_id, market_id) DO UPDATE SET
+    cost_basis = cost_basis + excluded.cost_basis, bet_count = bet_count + 1
+"""
+
+_REALIZE_PAYOUT_SQL = """
+UPDATE position_totals SET realized_payout = realized_payout + ? WHERE user_id = ? AND market_id = ?
+"""
+
+_INSERT_USER_SQL = """
+INSERT INTO users (id, username, email, password_hash, display_name, avatar_url, bio, balance,
+    total_bets, total_winnings, win_rate, is_creator, creator_bio, created_at, token)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_TRANSACTION_SQL = """
+INSERT INTO transactions (id, user_id, type, amount, balance_after, market_id, bet_id,
+    description, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections
+
+    Opens minconn connections up front and more on demand, up to maxconn;
+    once all of those are checked out, callers wait for one to be returned.
+    Connections run in autocommit mode, and writers open their own
+    BEGIN IMMEDIATE transaction so WAL readers are never blocked. While a
+    thread has a transaction open, its reads and nested transactions run
+    on that transaction's connection.
+    """
+
+    def __init__(self, path, minconn=2, maxconn=10, timeout=POOL_TIMEOUT):
+        if not 1 <= minconn <= maxconn:
+            raise ValueError('Pool needs 1 <= minconn <= maxconn')
+        self.path = path
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._local = threading.local()  # conn: the thread's open transaction's connection
+        for _ in range(minconn):
+            self._idle.put(self._open())
+
+    def _open(self):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._opened += 1
+        return conn
+
+    def getconn(self):
+        """Check out a connection, opening one or waiting if none is idle"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.maxconn:
+                return self._open()
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No database connection free after {self.timeout}s")
+
+    def putconn(self, conn):
+        """Return a checked-out connection"""
+        self._idle.put(conn)
+
+    def closeall(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for reads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            # Inside this thread's transaction: read what it has written
+            yield conn
+            return
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Borrow a connection inside a write transaction
+
+        Opened inside another transaction on the same thread, it runs as a
+        savepoint of that one, so a caller can group several writes into a
+        single BEGIN IMMEDIATE.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.execute('SAVEPOINT nested')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK TO nested')
+                conn.execute('RELEASE nested')
+                raise
+            conn.execute('RELEASE nested')
+            return
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._local.conn = conn
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                self._local.conn = None
+            conn.execute('COMMIT')
+
+
+_pool = None
+
+def init_pool(minconn=2, maxconn=10):
+    """Initialize database connection pool"""
+    global _pool
+    try:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = ConnectionPool(SQLITE_PATH, minconn, maxconn)
+        with _pool.connection() as conn:
+            conn.executescript(SCHEMA)
+        with _pool.transaction() as conn:
+            _migrate(conn)
+        _restore_open_markets()
+        # Other processes may trade on the same file
+        market_makers.shared = True
+        scheduler.start(close_markets)
+        return True
+    except (sqlite3.Error, ValueError):
+        _pool = None
+        return False
+
+def _migrate(conn):
+    """Bring a database written by an older version up to SCHEMA_VERSION"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < 1:
+        # REAL dollars -> integer micro-units (a no-op on a new, empty database)
+        for table, columns in _MONEY_COLUMNS.items():
+            assignments = ', '.join(f"{column} = CAST(ROUND({column} * {MICROS}) AS INTEGER)"
+                                    for column in columns)
+            conn.execute(f"UPDATE {table} SET {assignments}")
+        rows = conn.execute('SELECT id, outcome_shares FROM markets WHERE outcome_shares IS NOT NULL').fetchall()
+        conn.executemany('UPDATE markets SET outcome_shares = ? WHERE id = ?', [
+            (json.dumps([to_micros(str(q)) for q in json.loads(row['outcome_shares'])]), row['id'])
+            for row in rows
+        ])
+    if version < 2:
+        # Tokens expire; ones issued before that get a full TTL from now
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(tokens)')}
+        if 'expires_at' not in columns:
+            conn.execute('ALTER TABLE tokens ADD COLUMN expires_at REAL NOT NULL DEFAULT 0')
+            conn.execute('UPDATE tokens SET expires_at = ?', (time.time() + TOKEN_TTL,))
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tokens_expires ON tokens (expires_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tokens_user ON tokens (user_id, expires_at)')
+    if version < 3:
+        # Money columns declared REAL keep reading back as floats; rebuild
+        # those tables with the INTEGER columns SCHEMA declares
+        for table, columns in _MONEY_COLUMNS.items():
+            types = {row['name']: row['type'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if any(types.get(column, 'INTEGER') != 'INTEGER' for column in columns):
+                _rebuild_table(conn, table, types)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+def _rebuild_table(conn, table, old_columns):
+    """Recreate a table and its indexes as SCHEMA declares them, keeping its rows"""
+    create = re.search(rf'CREATE TABLE IF NOT EXISTS {table} \(.*?\n\);', SCHEMA, re.S).group()
+    indexes = re.findall(rf'CREATE INDEX IF NOT EXISTS \w+ ON {table} \(.*?\);', SCHEMA)
+    conn.execute(create.replace(f'EXISTS {table} (', f'EXISTS {table}_rebuilt (', 1))
+    new_columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({table}_rebuilt)')]
+    columns = [column for column in new_columns if column in old_columns]
+    values = [f"CAST(ROUND({column}) AS INTEGER)" if column in _MONEY_COLUMNS[table] else column
+              for column in columns]
+    conn.execute(f"INSERT INTO {table}_rebuilt ({', '.join(columns)}) "
+                 f"SELECT {', '.join(values)} FROM {table}")
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_rebuilt RENAME TO {table}')
+    for index in indexes:
+        conn.execute(index)
+
+def health_check():
+    """Check database health"""
+    if _pool is None:
+        return False
+    try:
+        with _pool.connection() as conn:
+            conn.execute('SELECT 1').fetchone()
+        return True
+    except sqlite3.Error:
+        return False
+
+@contextmanager
+def write_transaction():
+    """
+    Run the store calls in a block as one write transaction
+
+    BEGIN IMMEDIATE takes the database's write lock, so no other thread or
+    process writes the file until the block ends, and reads inside it see
+    the latest committed rows. Nothing is kept if the block raises.
+    """
+    with _pool.transaction():
+        yield
+
+def _restore_open_markets():
+    """
+    Re-register unresolved markets with the exposure tracker after a restart
+
+    Closed markets still carry exposure until they resolve; only open ones
+    go back on the scheduler.
+    """
+    with _pool.connection() as conn:
+        rows = conn.execute("SELECT * FROM markets WHERE status IN ('open', 'closed')").fetchall()
+    for row in rows:
+        market = _market_from_row(row)
+        if exposure.market(market['id']) is not None:
+            continue
+        deadline = resolution_deadline(market)
+        if market['status'] == 'open' and deadline is not None:
+            scheduler.schedule(market['id'], deadline)
+        exposure.open_market(market['id'], market_makers.liquidity, len(market['outcomes']))
+        shares = market['outcome_shares'] if is_categorical(market) else [
+            market['total_yes_shares'], market['total_no_shares']]
+        exposure.record_trade(market['id'], to_dollars(market['total_pool']), to_dollars(max(shares)))
+
+# ========== ROW CONVERSION ==========
+
+def _ts(value):
+    """Datetime -> fixed-width ISO text that sorts chronologically"""
+    return value.isoformat(sep=' ', timespec='microseconds') if value else None
+
+def _dt(text):
+    """ISO text -> datetime"""
+    return datetime.fromisoformat(text) if text else None
+
+def _micros(value):
+    """Money column -> int micro-units (columns of migrated databases keep REAL affinity)"""
+    return int(value) if value is not None else None
+
+def _market_from_row(row):
+    market = dict(row)
+    market['resolution_date'] = _dt(market['resolution_date'])
+    market['created_at'] = _dt(market['created_at'])
+    market['resolved_at'] = _dt(market['resolved_at'])
+    market['source_metadata'] = json.loads(market['source_metadata'] or '{}')
+    market['outcomes'] = json.loads(market['outcomes'])
+    market['outcome_odds'] = json.loads(market['outcome_odds']) if market['outcome_odds'] else None
+    market['outcome_shares'] = json.loads(market['outcome_shares']) if market['outcome_shares'] else None
+    for field in _MONEY_COLUMNS['markets']:
+        market[field] = _micros(market[field])
+    return market
+
+def _bet_from_row(row):
+    bet = dict(row)
+    for field in _MONEY_COLUMNS['bets']:
+        bet[field] = _micros(bet[field])
+    bet['created_at'] = _dt(bet['created_at'])
+    bet['settled_at'] = _dt(bet['settled_at'])
+    return bet
+
+def _user_from_row(row):
+    user = dict(row)
+    for field in _MONEY_COLUMNS['users']:
+        user[field] = _micros(user[field])
+    user['is_creator'] = bool(user['is_creator'])
+    user['created_at'] = _dt(user['created_at'])
+    return user
+
+def _transaction_from_row(row):
+    tx = dict(row)
+    for field in _MONEY_COLUMNS['transactions']:
+        tx[field] = _micros(tx[field])
+    tx['created_at'] = _dt(tx['created_at'])
+    return tx
+
+# ========== MARKETS ==========
+
+def get_market_by_id(market_id):
+    """Get a market by ID"""
+    with _pool.connection() as conn:
+        row = conn.execute('SELECT * FROM markets WHERE id = ?', (market_id,)).fetchone()
+    return _market_from_row(row) if row else None
+
+def market_cursor(market_id):
+    """Opaque pagination cursor pointing just past a market"""
+    with _pool.connection() as conn:
+        row = conn.execute('SELECT created_at, id FROM markets WHERE id = ?', (market_id,)).fetchone()
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_market_cursor(cursor):
+    """(created_at, id) encoded in a cursor; raises ValueError if it is malformed"""
+    try:
+        created_at, market_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(market_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def list_markets(status='open', community=None, limit=50, offset=0, cursor=None):
+    """
+    List markets with filters, newest first
+
+    Each filter combination reads its own (.., created_at, id) index, and a
+    cursor turns into a keyset condition, so deep pages cost the same as
+    the first.
+
+    Args:
+        status: Market status to match (None or '' for any)
+        community: Community to match (None or '' for any)
+        limit: Page size
+        offset: Markets to skip (ignored when cursor is given)
+        cursor: Cursor from market_cursor(); the page starts after it
+
+    Returns:
+        List of market dicts
+    """
+    params = [value for value in (status, community) if value]
+    if cursor:
+        params.extend(_decode_market_cursor(cursor))
+        offset = 0
+    sql = _LIST_MARKETS_SQL[((bool(status), bool(community)), bool(cursor))]
+
+    with _pool.connection() as conn:
+        rows = conn.execute(sql, (*params, limit, offset)).fetchall()
+    return [_market_from_row(row) for row in rows]
+
+def create_market(question, description, resolution_criteria, resolution_date,
+                 created_by, source_article_url=None, source_article_title=None,
+                 community='general', image_url=None, market_type='article_prediction',
+                 source_metadata=None, outcomes=None):
+    """
+    Create a new market
+
+    Markets are binary YES/NO unless outcomes lists other labels, in which
+    case they get a k-outcome share vector and per-outcome odds.
+    """
+    market_id = str(uuid.uuid4())
+    categorical = outcomes is not None and list(outcomes) != BINARY_OUTCOMES
+    outcomes = list(outcomes) if categorical else list(BINARY_OUTCOMES)
+
+    market = {
+        'id': market_id,
+        'question': question,
+        'description': description,
+        'resolution_criteria': resolution_criteria,
+        'resolution_date': datetime.fromisoformat(resolution_date.replace('Z', '+00:00')) if isinstance(resolution_date, str) else resolution_date,
+        'created_by': created_by,
+        'source_article_url': source_article_url,
+        'source_article_title': source_article_title,
+        'community': community,
+        'image_url': image_url,
+        'market_type': market_type,
+        'source_metadata': source_metadata or {},
+        'status': 'open',
+        'outcomes': outcomes,
+        'yes_odds': None if categorical else 0.5,
+        'no_odds': None if categorical else 0.5,
+        'outcome_odds': [1 / len(outcomes)] * len(outcomes) if categorical else None,
+        'total_pool': 0,
+        'total_yes_shares': 0,
+        'total_no_shares': 0,
+        'outcome_shares': [0] * len(outcomes) if categorical else None,
+        'created_at': datetime.utcnow(),
+        'resolved_at': None,
+        'outcome': None
+    }
+
+    with _pool.transaction() as conn:
+        conn.execute(_INSERT_MARKET_SQL, (
+            market_id, question, description, resolution_criteria, _ts(market['resolution_date']),
+            created_by, source_article_url, source_article_title, community, image_url, market_type,
+            json.dumps(market['source_metadata']), 'open', json.dumps(outcomes),
+            market['yes_odds'], market['no_odds'],
+            json.dumps(market['outcome_odds']) if categorical else None,
+            0, 0, 0,
+            json.dumps(market['outcome_shares']) if categorical else None,
+            _ts(market['created_at']), None, None
+        ))
+
+    exposure.open_market(market_id, market_makers.liquidity, len(outcomes))
+    deadline = resolution_deadline(market)
+    if deadline is not None:
+        scheduler.schedule(market_id, deadline)
+    return market
+
+def market_status(market):
+    """
+    A market's status, closing it first if its resolution date has passed
+
+    The scheduler closes markets as they expire; checking here as well
+    means no bet slips in between the deadline and the scheduler waking.
+    """
+    if market['status'] == 'open':
+        deadline = resolution_deadline(market)
+        if deadline is not None and deadline <= time.time():
+            close_markets([market['id']])
+            market['status'] = 'closed'
+    return market['status']
+
+def close_markets(market_ids):
+    """
+    Close open markets to betting, leaving them queued for resolution
+
+    Returns:
+        Number of markets closed
+    """
+    with locks.hold(market_ids=market_ids), _pool.transaction() as conn:
+        return conn.executemany(
+            "UPDATE markets SET status = 'closed' WHERE id = ? AND status = 'open'",
+            [(market_id,) for market_id in market_ids]
+        ).rowcount
+
+def update_market_odds(market_id, new_odds, new_pool, yes_shares, no_shares):
+    """Update market odds after a bet (pool and share totals in micro-units)"""
+    with _pool.transaction() as conn:
+        updated = conn.execute(
+            'UPDATE markets SET yes_odds = ?, no_odds = ?, total_pool = ?, total_yes_shares = ?, '
+            'total_no_shares = ? WHERE id = ?',
+            (new_odds['YES'], new_odds['NO'], new_pool, yes_shares, no_shares, market_id)
+        ).rowcount
+    if not updated:
+        return False
+
+    # Keep a live market maker in step with the stored totals
+    market_makers.sync(market_id, yes_shares, no_shares)
+    exposure.record_trade(market_id, to_dollars(new_pool), to_dollars(max(yes_shares, no_shares)))
+
+    return True
+
+def update_market_outcome_shares(market_id, new_odds, new_pool, outcome_shares):
+    """Update a k-outcome market's odds and share vector after a bet"""
+    with _pool.transaction() as conn:
+        row = conn.execute('SELECT outcomes FROM markets WHERE id = ?', (market_id,)).fetchone()
+        if not row:
+            return False
+        outcomes = json.loads(row['outcomes'])
+        conn.execute(
+            'UPDATE markets SET outcome_odds = ?, total_pool = ?, outcome_shares = ? WHERE id = ?',
+            (json.dumps([new_odds[o] for o in outcomes]), new_pool,
+             json.dumps(list(outcome_shares)), market_id)
+        )
+
+    market_makers.sync_outcomes(market_id, outcome_shares)
+    exposure.record_trade(market_id, to_dollars(new_pool), to_dollars(max(outcome_shares)))
+
+    return True
+
+def resolve_market(market_id, outcome):
+    """Resolve a market with the winning outcome label"""
+    with _pool.transaction() as conn:
+        updated = conn.execute(
+            "UPDATE markets SET status = 'resolved', outcome = ?, resolved_at = ? WHERE id = ?",
+            (outcome, _ts(datetime.utcnow()), market_id)
+        ).rowcount
+        row = conn.execute('SELECT * FROM markets WHERE id = ?', (market_id,)).fetchone()
+    if not updated:
+        return False
+
+    market = _market_from_row(row)
+    if is_categorical(market):
+        winning = market['outcome_shares'][market['outcomes'].index(outcome)]
+    else:
+        winning = market['total_yes_shares'] if outcome == 'YES' else market['total_no_shares']
+
+    market_makers.evict(market_id)
+    exposure.resolve(market_id, to_dollars(winning))
+
+    return True
+
+def settle_bets_for_market(market_id, outcome):
+    """Settle all bets for a resolved market"""
+    with _pool.transaction() as conn:
+        payouts = conn.execute(
+            "SELECT user_id, SUM(potential_payout) AS payout FROM bets "
+            "WHERE market_id = ? AND status = 'active' AND outcome = ? GROUP BY user_id",
+            (market_id, outcome)
+        ).fetchall()
+        conn.executemany(
+            'UPDATE users SET balance = balance + ?, total_winnings = total_winnings + ? WHERE id = ?',
+            [(row['payout'], row['payout'], row['user_id']) for row in payouts]
+        )
+        conn.executemany(_REALIZE_PAYOUT_SQL,
+                         [(row['payout'], row['user_id'], market_id) for row in payouts])
+        return conn.execute(
+            "UPDATE bets SET status = 'settled', settled_at = ?, "
+            "actual_payout = CASE WHEN outcome = ? THEN potential_payout ELSE 0 END "
+            "WHERE market_id = ? AND status = 'active'",
+            (_ts(datetime.utcnow()), outcome, market_id)
+        ).rowcount
+
+def resolve_markets(resolutions):
+    """
+    Resolve many markets and settle all their bets in one transaction
+
+    Args:
+        resolutions: (market_id, outcome) pairs; unknown markets, markets
+            already resolved and outcomes a market does not offer are skipped
+
+    Returns:
+        Dict with the resolved (market_id, outcome) pairs, bets settled per
+        market, and the payout transactions created
+
+    Raises:
+        ValueError: if a market appears more than once
+    """
+    resolved_at = datetime.utcnow()
+    resolutions = list(resolutions)
+    if len({market_id for market_id, _ in resolutions}) != len(resolutions):
+        raise ValueError('Each market may be resolved only once')
+    # Market locks keep bets from filling on a market while it settles
+    with locks.hold(market_ids=[market_id for market_id, _ in resolutions]), _pool.transaction() as conn:
+        pending, markets = {}, {}
+        for market_id, outcome in resolutions:
+            row = conn.execute('SELECT * FROM markets WHERE id = ?', (market_id,)).fetchone()
+            market = _market_from_row(row) if row else None
+            if market and market['status'] != 'resolved' and outcome in market['outcomes']:
+                pending[market_id] = outcome
+                markets[market_id] = market
+        resolutions = list(pending.items())
+
+        conn.executemany(
+            "UPDATE markets SET status = 'resolved', outcome = ?, resolved_at = ? WHERE id = ?",
+            [(outcome, _ts(resolved_at), market_id) for market_id, outcome in resolutions]
+        )
+
+        # Winning stakes per (user, market), then one balance update per user
+        by_user = {}
+        for market_id, outcome in resolutions:
+            for row in conn.execute(
+                "SELECT user_id, SUM(potential_payout) AS payout FROM bets "
+                "WHERE market_id = ? AND status = 'active' AND outcome = ? GROUP BY user_id",
+                (market_id, outcome)
+            ):
+                if row['payout']:
+                    by_user.setdefault(row['user_id'], []).append((market_id, int(row['payout'])))
+        conn.executemany(
+            'UPDATE users SET balance = balance + ?, total_winnings = total_winnings + ? WHERE id = ?',
+            [(sum(p for _, p in payouts), sum(p for _, p in payouts), user_id)
+             for user_id, payouts in by_user.items()]
+        )
+        conn.executemany(_REALIZE_PAYOUT_SQL, [
+            (payout, user_id, market_id)
+            for user_id, payouts in by_user.items() for market_id, payout in payouts
+        ])
+
+        transactions = []
+        for user_id, payouts in by_user.items():
+            row = conn.execute('SELECT balance FROM users WHERE id = ?', (user_id,)).fetchone()
+            if not row:
+                continue
+            balance = int(row['balance']) - sum(p for _, p in payouts)
+            for market_id, payout in payouts:
+                balance += payout
+                transactions.append({
+                    'id': str(uuid.uuid4()),
+                    'user_id': user_id,
+                    'type': 'payout',
+                    'amount': payout,
+                    'balance_after': balance,
+                    'market_id': market_id,
+                    'bet_id': None,
+                    'description': f"Payout on {pending[market_id]}",
+                    'created_at': resolved_at
+                })
+        conn.executemany(_INSERT_TRANSACTION_SQL, [
+            (t['id'], t['user_id'], t['type'], t['amount'], t['balance_after'],
+             t['market_id'], t['bet_id'], t['description'], _ts(t['created_at']))
+            for t in transactions
+        ])
+
+        settled = {}
+        for market_id, outcome in resolutions:
+            settled[market_id] = conn.execute(
+                "UPDATE bets SET status = 'settled', settled_at = ?, "
+                "actual_payout = CASE WHEN outcome = ? THEN potential_payout ELSE 0 END "
+                "WHERE market_id = ? AND status = 'active'",
+                (_ts(resolved_at), outcome, market_id)
+            ).rowcount
+
+    for market_id, outcome in resolutions:
+        market = markets[market_id]
+        if is_categorical(market):
+            winning = market['outcome_shares'][market['outcomes'].index(outcome)]
+        else:
+            winning = market['total_yes_shares'] if outcome == 'YES' else market['total_no_shares']
+        market_makers.evict(market_id)
+        exposure.resolve(market_id, to_dollars(winning))
+
+    return {
+        'resolved': resolutions,
+        'bets_settled': {market_id: count for market_id, count in settled.items() if count},
+        'transactions': transactions
+    }
+
+# ========== BETS ==========
+
+def create_bet(user_id, market_id, outcome, amount, shares, odds, potential_payout, side='buy'):
+    """
+    Create a new bet
+
+    Amount, shares and potential payout are micro-units. Sales back to the
+    market maker are recorded as side='sell' bets with negative amount,
+    shares and potential payout, so settlement nets them against the
+    shares they close.
+    """
+    bet = {
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'market_id': market_id,
+        'outcome': outcome,
+        'side': side,
+        'amount': amount,
+        'shares': shares,
+        'odds': odds,
+        'potential_payout': potential_payout,
+        'status': 'active',
+        'created_at': datetime.utcnow(),
+        'settled_at': None,
+        'actual_payout': None
+    }
+
+    with _pool.transaction() as conn:
+        conn.execute(_INSERT_BET_SQL, (
+            bet['id'], user_id, market_id, outcome, side, amount, shares, odds,
+            potential_payout, 'active', _ts(bet['created_at']), None, None
+        ))
+        conn.execute(_UPSERT_POSITION_SQL, (user_id, market_id, outcome, shares))
+        conn.execute(_UPSERT_POSITION_TOTALS_SQL, (user_id, market_id, amount))
+        conn.execute(
+            'INSERT OR IGNORE INTO user_communities (community, user_id) '
+            'SELECT community, ? FROM markets WHERE id = ? AND community IS NOT NULL',
+            (user_id, market_id)
+        )
+    return bet
+
+def get_user_position(user_id, market_id):
+    """
+    Get a user's position in a market
+
+    Returns:
+        Dict with net shares per outcome, cost basis (net amount paid in)
+        and realized payout, or None if the user never traded it
+    """
+    with _pool.connection() as conn:
+        totals = conn.execute(
+            'SELECT * FROM position_totals WHERE user_id = ? AND market_id = ?', (user_id, market_id)
+        ).fetchone()
+        if not totals:
+            return None
+        rows = conn.execute(
+            'SELECT outcome, shares FROM positions WHERE user_id = ? AND market_id = ?',
+            (user_id, market_id)
+        ).fetchall()
+    return _position_from_rows(totals, rows)
+
+def get_user_positions(user_id, limit=50):
+    """Get a user's positions, most recently opened first"""
+    with _pool.connection() as conn:
+        totals = conn.execute(
+            'SELECT * FROM position_totals WHERE user_id = ? ORDER BY rowid DESC LIMIT ?',
+            (user_id, max(limit, 0))
+        ).fetchall()
+        rows = conn.execute(
+            'SELECT market_id, outcome, shares FROM positions WHERE user_id = ?', (user_id,)
+        ).fetchall()
+    shares = {}
+    for row in rows:
+        shares.setdefault(row['market_id'], []).append(row)
+    return [_position_from_rows(t, shares.get(t['market_id'], ())) for t in totals]
+
+def _position_from_rows(totals, share_rows):
+    return {
+        'user_id': totals['user_id'],
+        'market_id': totals['market_id'],
+        'shares': {row['outcome']: _micros(row['shares']) for row in share_rows},
+        'cost_basis': _micros(totals['cost_basis']),
+        'realized_payout': _micros(totals['realized_payout']),
+        'bet_count': totals['bet_count']
+    }
+
+def get_user_bets_on_market(user_id, market_id):
+    """Get user's bets on a specific market"""
+    with _pool.connection() as conn:
+        rows = conn.execute(
+            'SELECT * FROM bets WHERE user_id = ? AND market_id = ? ORDER BY rowid',
+            (user_id, market_id)
+        ).fetchall()
+    return [_bet_from_row(row) for row in rows]
+
+def get_user_active_bets(user_id, limit=50):
+    """Get user's active bets with market info"""
+    with _pool.connection() as conn:
+        rows = conn.execute(
+            'SELECT b.*, m.question AS question, m.status AS market_status, '
+            'm.resolution_date AS resolution_date '
+            'FROM bets b JOIN markets m ON m.id = b.market_id '
+            'WHERE b.user_id = ? ORDER BY b.rowid DESC LIMIT ?',
+            (user_id, max(limit, 0))
+        ).fetchall()
+
+    result = []
+    for row in rows:
+        bet = _bet_from_row(row)
+        bet['resolution_date'] = _dt(bet['resolution_date'])
+        result.append(bet)
+    return result
+
+# ========== USERS ==========
+
+def get_user_by_id(user_id):
+    """Get user by ID"""
+    with _pool.connection() as conn:
+        row = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+    return _user_from_row(row) if row else None
+
+def get_user_by_email(email):
+    """Get user by email address, ignoring case"""
+    with _pool.connection() as conn:
+        row = conn.execute('SELECT * FROM users WHERE email = ? COLLATE NOCASE', (email,)).fetchone()
+    return _user_from_row(row) if row else None
+
+def get_user_by_username(username):
+    """Get user by username"""
+    with _pool.connection() as conn:
+        row = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+    return _user_from_row(row) if row else None
+
+def adjust_user_balance(user_id, delta):
+    """
+    Add delta (micro-units) to a user's balance as one atomic step
+
+    Returns:
+        The new balance, or None if the user does not exist
+    """
+    with _pool.transaction() as conn:
+        row = conn.execute('UPDATE users SET balance = balance + ? WHERE id = ? RETURNING balance',
+                           (delta, user_id)).fetchone()
+    return _micros(row['balance']) if row else None
+
+def update_user_balance(user_id, new_balance):
+    """Update user balance (micro-units)"""
+    with _pool.transaction() as conn:
+        return conn.execute('UPDATE users SET balance = ? WHERE id = ?',
+                            (new_balance, user_id)).rowcount > 0
+
+def update_user_password_hash(user_id, password_hash):
+    """Replace a user's stored password hash record"""
+    with _pool.transaction() as conn:
+        return conn.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                            (password_hash, user_id)).rowcount > 0
+
+def increment_user_total_bets(user_id):
+    """Increment user's total bet count"""
+    with _pool.transaction() as conn:
+        return conn.execute('UPDATE users SET total_bets = total_bets + 1 WHERE id = ?',
+                            (user_id,)).rowcount > 0
+
+def get_leaderboard(community=None, limit=100):
+    """
+    Get top users by balance
+
+    Args:
+        community: Only rank users who have bet in this community
+        limit: Maximum number of users
+
+    Returns:
+        List of user dicts, highest balance first
+    """
+    with _pool.connection() as conn:
+        if community:
+            rows = conn.execute(
+                'SELECT u.* FROM user_communities c JOIN users u ON u.id = c.user_id '
+                'WHERE c.community = ? ORDER BY u.balance DESC, u.id LIMIT ?',
+                (community, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute('SELECT * FROM users ORDER BY balance DESC, id LIMIT ?',
+                                (limit,)).fetchall()
+    return [_user_from_row(row) for row in rows]
+
+def get_user_rank(user_id, community=None):
+    """
+    Get a user's leaderboard position
+
+    Counts the users ahead of them along the balance index; SQLite B-trees
+    keep no order statistics, so this is linear in the rank.
+
+    Returns:
+        (rank, board size); rank is 1-based, None if the user is unranked
+    """
+    with _pool.connection() as conn:
+        user = conn.execute('SELECT balance FROM users WHERE id = ?', (user_id,)).fetchone()
+        if community:
+            total = conn.execute('SELECT COUNT(*) FROM user_communities WHERE community = ?',
+                                 (community,)).fetchone()[0]
+            member = conn.execute('SELECT 1 FROM user_communities WHERE community = ? AND user_id = ?',
+                                  (community, user_id)).fetchone()
+            if not user or not member:
+                return None, total
+            ahead = conn.execute(
+                'SELECT COUNT(*) FROM user_communities c JOIN users u ON u.id = c.user_id '
+                'WHERE c.community = ? AND (u.balance > ? OR (u.balance = ? AND u.id < ?))',
+                (community, user['balance'], user['balance'], user_id)
+            ).fetchone()[0]
+        else:
+            total = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+            if not user:
+                return None, total
+            ahead = conn.execute(
+                'SELECT COUNT(*) FROM users WHERE balance > ? OR (balance = ? AND id < ?)',
+                (user['balance'], user['balance'], user_id)
+            ).fetchone()[0]
+    return ahead + 1, total
+
+# ========== TRANSACTIONS ==========
+
+def create_transaction(user_id, tx_type, amount, balance_after,
+                      market_id=None, bet_id=None, description=''):
+    """Create a transaction record (amount and balance_after in micro-units)"""
+    transaction = {
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'type': tx_type,
+        'amount': amount,
+        'balance_after': balance_after,
+        'market_id': market_id,
+        'bet_id': bet_id,
+        'description': description,
+        'created_at': datetime.utcnow()
+    }
+
+    with _pool.transaction() as conn:
+        conn.execute(_INSERT_TRANSACTION_SQL, (
+            transaction['id'], user_id, tx_type, amount, balance_after,
+            market_id, bet_id, description, _ts(transaction['created_at'])
+        ))
+    return transaction
+
+def get_user_transactions(user_id, limit=50):
+    """Get user's transaction history"""
+    with _pool.connection() as conn:
+        rows = conn.execute(
+            'SELECT * FROM transactions WHERE user_id = ? ORDER BY rowid DESC LIMIT ?',
+            (user_id, max(limit, 0))
+        ).fetchall()
+    return [_transaction_from_row(row) for row in rows]
+
+# ========== HELPER: Add user to storage (called by auth module) ==========
+
+def add_user(user_data):
+    """
+    Add user to storage (internal use)
+
+    Raises:
+        ValueError: if the email (ignoring case) or username is already taken
+    """
+    with _pool.transaction() as conn:
+        if user_data.get('email') and conn.execute(
+            'SELECT 1 FROM users WHERE email = ? COLLATE NOCASE', (user_data['email'],)
+        ).fetchone():
+            raise ValueError('Email already registered')
+        if conn.execute('SELECT 1 FROM users WHERE username = ?', (user_data['username'],)).fetchone():
+            raise ValueError('Username already taken')
+        conn.execute(_INSERT_USER_SQL, (
+            user_data['id'], user_data['username'], user_data.get('email'),
+            user_data.get('password_hash'), user_data.get('display_name'),
+            user_data.get('avatar_url'), user_data.get('bio', ''),
+            user_data['balance'], user_data.get('total_bets', 0),
+            user_data.get('total_winnings', 0), float(user_data.get('win_rate', 0)),
+            int(bool(user_data.get('is_creator'))), user_data.get('creator_bio'),
+            _ts(user_data.get('created_at')), user_data.get('token')
+        ))
+    return user_data
+
+# ========== AUTH TOKENS ==========
+
+def save_token(token, user_id):
+    """
+    Remember an issued auth token until it expires
+
+    Also drops the user's oldest tokens past the per-user cap and every
+    expired token, each found through an index, so the table stays bounded.
+
+    Returns:
+        Epoch seconds the token expires at
+    """
+    now = time.time()
+    expires_at = now + TOKEN_TTL
+    with _pool.transaction() as conn:
+        conn.execute('INSERT OR REPLACE INTO tokens (token, user_id, expires_at) VALUES (?, ?, ?)',
+                     (token, user_id, expires_at))
+        conn.execute(
+            'DELETE FROM tokens WHERE user_id = ? AND token NOT IN '
+            '(SELECT token FROM tokens WHERE user_id = ? ORDER BY expires_at DESC LIMIT ?)',
+            (user_id, user_id, MAX_TOKENS_PER_USER)
+        )
+        conn.execute('DELETE FROM tokens WHERE expires_at <= ?', (now,))
+    return expires_at
+
+def get_token_user(token):
+    """User ID a live auth token was issued to (None if unknown or expired)"""
+    with _pool.connection() as conn:
+        row = conn.execute('SELECT user_id FROM tokens WHERE token = ? AND expires_at > ?',
+                           (token, time.time())).fetchone()
+    return row['user_id'] if row else None
+
+def delete_token(token):
+    """
+    Forget a stored auth token (logout)
+
+    Returns:
+        False if the token was not held
+    """
+    with _pool.transaction() as conn:
+        return conn.execute('DELETE FROM tokens WHERE token = ?', (token,)).rowcount > 0
+
+def revoke_token(token_id, expires_at):
+    """
+    Refuse a signed token from now until it expires on its own
+
+    Rows for tokens that have since expired are dropped as new ones arrive.
+
+    Args:
+        token_id: ID carried in the signed token
+        expires_at: Epoch seconds the token expires at
+    """
+    with _pool.transaction() as conn:
+        conn.execute('DELETE FROM revoked_tokens WHERE expires_at <= ?', (time.time(),))
+        conn.execute('INSERT OR REPLACE INTO revoked_tokens (token_id, expires_at) VALUES (?, ?)',
+                     (token_id, expires_at))
+
+def is_token_revoked(token_id):
+    """True if a signed token was revoked before its expiry"""
+    with _pool.connection() as conn:
+        return conn.execute('SELECT 1 FROM revoked_tokens WHERE token_id = ?', (token_id,)).fetchone() is not None
@@ -0,0 +1,167 @@
+"""
+Auth tokens with expiry and a per-user cap
+"""
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds an issued token stays valid
+TOKEN_TTL = int(os.getenv('BETTIT_TOKEN_TTL', str(7 * 24 * 3600)))
+# Live tokens kept per user; issuing another drops that user's oldest
+MAX_TOKENS_PER_USER = int(os.getenv('BETTIT_MAX_TOKENS_PER_USER', '10'))
+# Seconds between sweeps of the expiry wheel
+SWEEP_INTERVAL = 60
+
+
+class TokenStore:
+    """
+    Token -> user map that forgets tokens once they expire
+
+    Lookups are one dict read; a token found past its expiry is dropped on
+    the spot. Tokens nobody presents again are dropped by a timer wheel: a
+    ring of slots, one per sweep interval, each holding the tokens that
+    expire during it. A sweep empties only the slots whose time has come,
+    so its cost follows the number of tokens expiring, not the number held.
+    Each user keeps at most max_per_user tokens, so memory tracks active
+    users rather than how many logins there have ever been.
+    """
+
+    def __init__(self, ttl=TOKEN_TTL, max_per_user=MAX_TOKENS_PER_USER, tick=SWEEP_INTERVAL):
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self._tick = tick
+        self._lock = threading.Lock()
+        self._tokens = {}   # token -> (user_id, expires_at), oldest first
+        self._by_user = {}  # user_id -> [token], oldest first
+        # One revolution spans a full TTL, so a fresh token's slot comes up
+        # only once it is due; longer-lived tokens stay put for another lap
+        self._wheel = [set() for _ in range(math.ceil(ttl / tick) + 1)]
+        self._swept = int(time.time() // tick) - 1  # last tick swept
+        self._thread = None
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _slot(self, expires_at):
+        return self._wheel[int(expires_at // self._tick) % len(self._wheel)]
+
+    def add(self, token, user_id, expires_at=None):
+        """
+        Remember an issued token, evicting the user's oldest past the cap
+
+        Args:
+            token: Token string
+            user_id: User the token was issued to
+            expires_at: Epoch seconds it expires at (default: now + ttl)
+
+        Returns:
+            The expiry time used
+        """
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            if token in self._tokens:
+                self._remove(token)
+            self._tokens[token] = (user_id, expires_at)
+            self._slot(expires_at).add(token)
+            user_tokens = self._by_user.setdefault(user_id, [])
+            user_tokens.append(token)
+            while len(user_tokens) > self.max_per_user:
+                self._remove(user_tokens[0])
+        return expires_at
+
+    def get(self, token, now=None):
+        """
+        User a live token was issued to
+
+        Args:
+            token: Token string
+            now: Epoch seconds to check expiry against (default: current time)
+
+        Returns:
+            user_id, or None if the token is unknown or has expired
+        """
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        if entry[1] > (time.time() if now is None else now):
+            return entry[0]
+        with self._lock:
+            if self._tokens.get(token) is entry:
+                self._remove(token)
+        return None
+
+    def discard(self, token):
+        """Forget a token; returns False if it was not held"""
+        with self._lock:
+            if token not in self._tokens:
+                return False
+            self._remove(token)
+            return True
+
+    def user_tokens(self, user_id):
+        """A user's held tokens, oldest first (expired ones linger until swept)"""
+        return list(self._by_user.get(user_id, ()))
+
+    def _remove(self, token):
+        """Drop a held token from every structure (caller holds _lock)"""
+        user_id, expires_at = self._tokens.pop(token)
+        self._slot(expires_at).discard(token)
+        user_tokens = self._by_user[user_id]
+        user_tokens.remove(token)
+        if not user_tokens:
+            del self._by_user[user_id]
+
+    def sweep(self, now=None):
+        """
+        Evict expired tokens from the wheel slots that have come due
+
+        Args:
+            now: Epoch seconds to sweep up to (default: current time)
+
+        Returns:
+            Number of tokens evicted
+        """
+        now = time.time() if now is None else now
+        # Only ticks that have fully elapsed, so no slot is left half-swept
+        current = int(now // self._tick) - 1
+        evicted = 0
+        with self._lock:
+            # Past a full revolution every slot is due once
+            first = max(self._swept + 1, current - len(self._wheel) + 1)
+            for tick in range(first, current + 1):
+                slot = self._wheel[tick % len(self._wheel)]
+                for token in [t for t in slot if self._tokens[t][1] <= now]:
+                    self._remove(token)
+                    evicted += 1
+            self._swept = max(self._swept, current)
+        return evicted
+
+    def entries(self):
+        """(token, user_id, expires_at) for every held token, oldest first"""
+        with self._lock:
+            return [(token, user_id, expires_at) for token, (user_id, expires_at) in self._tokens.items()]
+
+    def start(self):
+        """Start the background sweeper thread (no-op if already running)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='token-sweeper', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self._tick)
+            try:
+                self.sweep()
+            except Exception:
+                # Keep the thread alive; lookups still drop expired tokens
+                logger.exception("Sweeping expired tokens failed")
+
+
+# Process-wide token store used by db
+tokens = TokenStore()
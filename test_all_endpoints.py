@@ -176,6 +176,32 @@ def test_list_markets():
         print_error(f"List markets exception: {e}")
         return False
 
+def test_market_pagination():
+    """Test paging through markets with a cursor"""
+    print_test("Market Pagination")
+    try:
+        resp = requests.get(f"{API_BASE}/api/markets?status=&limit=1")
+        data = resp.json()
+        if resp.status_code != 200:
+            print_error(f"First page failed: {data}")
+            return False
+        if not data['next_cursor']:
+            print_success("Only one page of markets")
+            return True
+
+        first_id = data['markets'][0]['id']
+        resp = requests.get(f"{API_BASE}/api/markets?status=&limit=1&cursor={data['next_cursor']}")
+        data = resp.json()
+        if resp.status_code == 200 and all(m['id'] != first_id for m in data['markets']):
+            print_success(f"Second page has {data['count']} market(s), next cursor: {data['next_cursor']}")
+            return True
+        else:
+            print_error(f"Second page failed: {data}")
+            return False
+    except Exception as e:
+        print_error(f"Market pagination exception: {e}")
+        return False
+
 def test_get_market():
     """Test getting specific market"""
     print_test("Get Specific Market")
@@ -221,6 +247,23 @@ def test_simulate_bet():
         print_error(f"Bet simulation exception: {e}")
         return False
 
+def test_quote_ladder():
+    """Test quote ladder"""
+    print_test("Quote Ladder")
+    try:
+        resp = requests.get(f"{API_BASE}/api/markets/{MARKET_ID}/quote-ladder?amounts=10,50,100")
+        data = resp.json()
+        if resp.status_code == 200 and len(data['quotes']['YES']['shares']) == 3:
+            for amount, shares in zip(data['amounts'], data['quotes']['YES']['shares']):
+                print_success(f"  - ${amount} on YES → {shares:.2f} shares")
+            return True
+        else:
+            print_error(f"Quote ladder failed: {data}")
+            return False
+    except Exception as e:
+        print_error(f"Quote ladder exception: {e}")
+        return False
+
 def test_place_bet():
     """Test placing a bet"""
     print_test("Place Bet")
@@ -245,6 +288,117 @@ def test_place_bet():
         print_error(f"Place bet exception: {e}")
         return False
 
+def test_place_invalid_amount():
+    """Test that bets with missing or bad amounts are rejected"""
+    print_test("Place Invalid Amount")
+    try:
+        cases = [("missing", None), ("non-numeric", "abc"), ("NaN", "nan"), ("infinite", "Infinity"),
+                 ("boolean", True), ("zero", 0), ("negative", -5)]
+        for path in ("/api/bets/place", "/api/bets/simulate"):
+            for name, amount in cases:
+                body = {"market_id": MARKET_ID, "outcome": "YES"}
+                if amount is not None:
+                    body["amount"] = amount
+                resp = requests.post(f"{API_BASE}{path}",
+                    headers={"Authorization": f"Bearer {TOKEN}"},
+                    json=body)
+                if resp.status_code != 400:
+                    print_error(f"{path} with {name} amount returned {resp.status_code}: {resp.json()}")
+                    return False
+            print_success(f"{path} rejected {len(cases)} bad amounts with 400")
+        return True
+    except Exception as e:
+        print_error(f"Place invalid amount exception: {e}")
+        return False
+
+def test_sell_shares():
+    """Test selling part of a position back to the market maker"""
+    print_test("Sell Shares")
+    try:
+        resp = requests.post(f"{API_BASE}/api/bets/sell",
+            headers={"Authorization": f"Bearer {TOKEN}"},
+            json={
+                "market_id": MARKET_ID,
+                "outcome": "YES",
+                "shares": 10
+            })
+        data = resp.json()
+        if resp.status_code == 201 and data['success']:
+            print_success(f"Sold 10 YES shares for ${data['proceeds']:.2f}")
+            print_success(f"New balance: ${data['new_balance']}")
+            return True
+        else:
+            print_error(f"Sell shares failed: {data}")
+            return False
+    except Exception as e:
+        print_error(f"Sell shares exception: {e}")
+        return False
+
+def test_sell_invalid_shares():
+    """Test that sells with missing or bad share counts are rejected"""
+    print_test("Sell Invalid Shares")
+    try:
+        cases = [("missing", None), ("non-numeric", "abc"), ("NaN", "nan"), ("infinite", "inf"),
+                 ("zero", 0), ("negative", -5)]
+        for path in ("/api/bets/sell", "/api/bets/sell/simulate"):
+            for name, shares in cases:
+                body = {"market_id": MARKET_ID, "outcome": "YES"}
+                if shares is not None:
+                    body["shares"] = shares
+                resp = requests.post(f"{API_BASE}{path}",
+                    headers={"Authorization": f"Bearer {TOKEN}"},
+                    json=body)
+                if resp.status_code != 400:
+                    print_error(f"{path} with {name} shares returned {resp.status_code}: {resp.json()}")
+                    return False
+            print_success(f"{path} rejected {len(cases)} bad share counts with 400")
+
+            # One micro-share of an outcome the user holds none of
+            resp = requests.post(f"{API_BASE}{path}",
+                headers={"Authorization": f"Bearer {TOKEN}"},
+                json={"market_id": MARKET_ID, "outcome": "NO", "shares": 0.000001})
+            if resp.status_code != 400:
+                print_error(f"{path} sold from an empty position: {resp.status_code} {resp.json()}")
+                return False
+            print_success(f"{path} rejected a sale from an empty position")
+        return True
+    except Exception as e:
+        print_error(f"Sell invalid shares exception: {e}")
+        return False
+
+def test_categorical_market():
+    """Test creating and betting on a k-outcome market"""
+    print_test("Categorical Market")
+    try:
+        resp = requests.post(f"{API_BASE}/api/markets",
+            headers={"Authorization": f"Bearer {TOKEN}"},
+            json={
+                "question": "Which subreddit will this post trend in?",
+                "resolution_criteria": "Subreddit where the post first reaches the front page.",
+                "resolution_hours": 24,
+                "outcomes": ["news", "worldnews", "technology"]
+            })
+        data = resp.json()
+        if resp.status_code != 201:
+            print_error(f"Categorical market creation failed: {data}")
+            return False
+
+        market_id = data['market']['id']
+        resp = requests.post(f"{API_BASE}/api/bets/place",
+            headers={"Authorization": f"Bearer {TOKEN}"},
+            json={"market_id": market_id, "outcome": "technology", "amount": 50})
+        data = resp.json()
+        if resp.status_code == 201 and data['success']:
+            odds = ', '.join(f"{o}={p:.2%}" for o, p in data['new_odds'].items())
+            print_success(f"Bet placed on 'technology', new odds: {odds}")
+            return True
+        else:
+            print_error(f"Categorical bet failed: {data}")
+            return False
+    except Exception as e:
+        print_error(f"Categorical market exception: {e}")
+        return False
+
 def test_my_bets():
     """Test getting user's bets"""
     print_test("Get My Bets")
@@ -264,6 +418,25 @@ def test_my_bets():
         print_error(f"Get bets exception: {e}")
         return False
 
+def test_positions():
+    """Test getting user's positions"""
+    print_test("Get My Positions")
+    try:
+        resp = requests.get(f"{API_BASE}/api/positions",
+            headers={"Authorization": f"Bearer {TOKEN}"})
+        data = resp.json()
+        if resp.status_code == 200:
+            print_success(f"Found {data['count']} positions")
+            for position in data['positions']:
+                print(f"  - {position['shares']} on '{position['question'][:50]}...' | cost ${position['cost_basis']}")
+            return True
+        else:
+            print_error(f"Get positions failed: {data}")
+            return False
+    except Exception as e:
+        print_error(f"Get positions exception: {e}")
+        return False
+
 def test_leaderboard():
     """Test leaderboard"""
     print_test("Leaderboard")
@@ -282,6 +455,22 @@ def test_leaderboard():
         print_error(f"Leaderboard exception: {e}")
         return False
 
+def test_leaderboard_rank():
+    """Test looking up the current user's leaderboard rank"""
+    print_test("Leaderboard Rank")
+    try:
+        resp = requests.get(f"{API_BASE}/api/leaderboard/rank/{USER_ID}")
+        data = resp.json()
+        if resp.status_code == 200 and data['rank']:
+            print_success(f"Rank {data['rank']} of {data['total']} (Balance: ${data['balance']})")
+            return True
+        else:
+            print_error(f"Leaderboard rank failed: {data}")
+            return False
+    except Exception as e:
+        print_error(f"Leaderboard rank exception: {e}")
+        return False
+
 def test_transactions():
     """Test transaction history"""
     print_test("Transaction History")
@@ -301,6 +490,26 @@ def test_transactions():
         print_error(f"Get transactions exception: {e}")
         return False
 
+def test_exposure():
+    """Test platform exposure"""
+    print_test("Platform Exposure")
+    try:
+        resp = requests.get(f"{API_BASE}/api/admin/exposure",
+            headers={"Authorization": f"Bearer {TOKEN}"})
+        data = resp.json()
+        if resp.status_code == 200:
+            exposure = data['exposure']
+            print_success(f"Open markets: {exposure['open_markets']}")
+            print_success(f"Worst-case loss: ${exposure['worst_case_loss']:.2f} "
+                          f"(bound ${exposure['subsidy_bound']:.2f})")
+            return True
+        else:
+            print_error(f"Exposure failed: {data}")
+            return False
+    except Exception as e:
+        print_error(f"Exposure exception: {e}")
+        return False
+
 def test_market_resolution():
     """Test resolving a market"""
     print_test("Market Resolution")
@@ -320,6 +529,29 @@ def test_market_resolution():
         print_error(f"Market resolution exception: {e}")
         return False
 
+def test_logout():
+    """Test logging out a second session"""
+    print_test("Logout")
+    try:
+        resp = requests.post(f"{API_BASE}/api/auth/login", json={
+            "email": "test@example.com",
+            "password": "password123"
+        })
+        token = resp.json()['user']['token']
+        headers = {"Authorization": f"Bearer {token}"}
+        resp = requests.post(f"{API_BASE}/api/auth/logout", headers=headers)
+        data = resp.json()
+        after = requests.get(f"{API_BASE}/api/auth/me", headers=headers)
+        if resp.status_code == 200 and data['success'] and after.status_code == 401:
+            print_success("Logged out; the token no longer authenticates")
+            return True
+        else:
+            print_error(f"Logout failed: {data} (then {after.status_code})")
+            return False
+    except Exception as e:
+        print_error(f"Logout exception: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print(f"{Colors.BOLD}═══════════════════════════════════════════════════════════{Colors.ENDC}")
@@ -334,13 +566,23 @@ def main():
         ("Get Current User", test_get_me),
         ("Create Market", test_create_market),
         ("List Markets", test_list_markets),
+        ("Market Pagination", test_market_pagination),
         ("Get Specific Market", test_get_market),
         ("Simulate Bet", test_simulate_bet),
+        ("Quote Ladder", test_quote_ladder),
         ("Place Bet", test_place_bet),
+        ("Place Invalid Amount", test_place_invalid_amount),
+        ("Sell Shares", test_sell_shares),
+        ("Sell Invalid Shares", test_sell_invalid_shares),
+        ("Categorical Market", test_categorical_market),
         ("Get My Bets", test_my_bets),
+        ("Get My Positions", test_positions),
         ("Leaderboard", test_leaderboard),
+        ("Leaderboard Rank", test_leaderboard_rank),
         ("Transaction History", test_transactions),
+        ("Platform Exposure", test_exposure),
         ("Market Resolution", test_market_resolution),
+        ("Logout", test_logout),
     ]
 
     results = []